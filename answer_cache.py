@@ -0,0 +1,137 @@
+"""
+LLM 回答缓存：进程内 LRU + 可选的 SQLite 磁盘层
+
+缓存 key 由 归一化问题、所选段落内容的哈希、回答模式 组成；
+向量存储重建后（指纹变化）旧条目全部失效。
+"""
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+from cache import LRUCache
+
+
+class AnswerCache:
+    """
+    两级回答缓存
+
+    Args:
+        maxsize: 内存层最多缓存的条目数
+        ttl: 每个条目的过期时间（秒），None 表示永不过期
+        db_path: SQLite 文件路径，None 表示不启用磁盘层
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 86400, db_path: Optional[str] = None):
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.memory = LRUCache(maxsize=maxsize, ttl=self.ttl)
+        self.fingerprint = ''
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.db_path = db_path
+        if db_path:
+            self._open_db()
+            # SQLite 连接不能跨 fork 使用：多进程部署（serve.py）时每个工作进程重新打开自己的连接
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._open_db)
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, answer TEXT NOT NULL, expires_at REAL)"
+        )
+        self._db.commit()
+
+    @staticmethod
+    def make_key(question: str, context_chunks: List[str], mode: str) -> str:
+        """
+        question 应已归一化；段落按检索顺序参与哈希（顺序不同，提示词也不同）
+        """
+        digest = hashlib.sha256()
+        digest.update(mode.encode('utf-8'))
+        digest.update(b'\x1f')
+        digest.update(question.encode('utf-8'))
+        for chunk in context_chunks:
+            digest.update(b'\x1e')
+            digest.update(hashlib.sha1(chunk.encode('utf-8')).digest())
+        return digest.hexdigest()
+
+    def set_fingerprint(self, fingerprint: str):
+        """
+        向量存储加载/重建时调用：清空内存层，删除磁盘层中属于旧存储的条目
+        """
+        if fingerprint == self.fingerprint:
+            return
+        self.fingerprint = fingerprint
+        self.memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM answers WHERE fingerprint != ?", (fingerprint,))
+                self._db.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        answer = self.memory.get(key)
+        if answer is not None:
+            self.hits += 1
+            return answer
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT answer, expires_at FROM answers WHERE key = ? AND fingerprint = ?",
+                    (key, self.fingerprint)
+                ).fetchone()
+            if row is not None:
+                answer, expires_at = row
+                if expires_at is None or expires_at > time.time():
+                    remaining = expires_at - time.time() if expires_at is not None else None
+                    self.memory.set(key, answer, ttl=remaining)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return answer
+
+        self.misses += 1
+        return None
+
+    def set(self, key: str, answer: str):
+        self.memory.set(key, answer)
+        if self._db is not None:
+            expires_at = time.time() + self.ttl if self.ttl else None
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers (key, fingerprint, answer, expires_at) VALUES (?, ?, ?, ?)",
+                    (key, self.fingerprint, answer, expires_at)
+                )
+                self._db.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        异步读取：只有磁盘层才放到线程池执行
+        """
+        if self._db is None:
+            return self.get(key)
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, answer: str):
+        if self._db is None:
+            self.set(key, answer)
+        else:
+            await asyncio.to_thread(self.set, key, answer)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'disk_enabled': self._db is not None,
+            'memory': self.memory.stats(),
+        }
@@ -0,0 +1,99 @@
+"""
+批量问答吞吐评测：逐个调用 /ask（并发） vs 一次 /ask/batch，单位为问题数/秒
+
+使用本地 LLM 桩服务（stub_llm_server.py），不会调用真实的 DeepSeek API。
+问题集中有一部分重复（模拟常见问题），两种方式使用互不重叠的问题集，避免回答缓存影响比较。
+
+用法:
+    python bench_batch.py
+    python bench_batch.py --questions 2000 --duplicates 0.3 --concurrency 16 --llm-concurrency 16
+"""
+import asyncio
+import json
+import os
+import random
+import time
+from fastapi import Response
+from bench_encoder import SAMPLE_QUESTIONS
+
+
+def make_questions(count: int, duplicates: float, tag: str, seed: int = 0):
+    """
+    生成 count 个问题，其中约 duplicates 比例与前面的问题完全相同
+    """
+    rng = random.Random(seed)
+    questions = []
+    for i in range(count):
+        if questions and rng.random() < duplicates:
+            questions.append(rng.choice(questions))
+        else:
+            questions.append(f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} {tag}{i}")
+    return questions
+
+
+async def run_per_request(index, questions, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(question):
+        async with semaphore:
+            await index.ask_question(index.QuestionRequest(question=question), Response())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(question) for question in questions))
+    return time.perf_counter() - start
+
+
+async def run_batch(index, questions) -> tuple:
+    start = time.perf_counter()
+    response = await index.ask_question_batch(
+        index.BatchQuestionRequest(questions=[index.QuestionRequest(question=q) for q in questions])
+    )
+    lines = [line async for line in response.body_iterator]
+    summary = json.loads(lines[-1])['summary']
+    assert summary['questions'] == len(questions) and len(lines) == len(questions) + 1
+    return time.perf_counter() - start, summary
+
+
+async def main(args):
+    from stub_llm_server import start_stub_server
+
+    os.environ['DEEPSEEK_API_KEY'] = 'stub'
+    os.environ['DEEPSEEK_API_BASE'] = start_stub_server(args.port, args.fast_ms, 5.0)
+
+    import index
+    await index.startup_event()
+    index.BATCH_LLM_CONCURRENCY = args.llm_concurrency
+
+    print("=" * 72)
+    print(f"📊 {args.questions} 个问题（重复比例 {args.duplicates:.0%}），LLM 桩延迟 {args.fast_ms} ms")
+    print("=" * 72)
+
+    await run_per_request(index, make_questions(8, 0.0, 'warmup'), 1)  # 预热模型与连接
+
+    elapsed = await run_per_request(index, make_questions(args.questions, args.duplicates, 'single'), args.concurrency)
+    single_qps = args.questions / elapsed
+    print(f"{'逐个 /ask（并发 ' + str(args.concurrency) + '）':<24} | {elapsed:8.2f} s | {single_qps:8.1f} 问题/秒")
+
+    elapsed, summary = await run_batch(index, make_questions(args.questions, args.duplicates, 'batch'))
+    batch_qps = args.questions / elapsed
+    print(f"{'/ask/batch（LLM 并发 ' + str(args.llm_concurrency) + '）':<24} | {elapsed:8.2f} s | {batch_qps:8.1f} 问题/秒")
+    stages = ", ".join(f"{stage['name']} {stage['duration_ms']:.0f}ms" for stage in summary['timings']['stages'])
+    print(f"   LLM 调用 {summary['llm_calls']} 次（去重前 {summary['questions']}）；{stages}")
+    print(f"   吞吐提升: {batch_qps / single_qps:.2f}x")
+
+    await index.shutdown_event()
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='逐个 /ask 与 /ask/batch 的吞吐对比')
+    parser.add_argument('--questions', type=int, default=1000, help='问题数 (默认: 1000)')
+    parser.add_argument('--duplicates', type=float, default=0.3, help='重复问题比例 (默认: 0.3)')
+    parser.add_argument('--concurrency', type=int, default=16, help='逐个请求时的并发数 (默认: 16)')
+    parser.add_argument('--llm-concurrency', type=int, default=16, help='批量问答的 LLM 并发数 (默认: 16)')
+    parser.add_argument('--port', type=int, default=8765, help='桩服务端口 (默认: 8765)')
+    parser.add_argument('--fast-ms', type=float, default=20.0, help='LLM 回答延迟，毫秒 (默认: 20)')
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,166 @@
+"""
+分块评测：原字符串拼接实现 vs 基于偏移量的 iter_chunks
+
+生成指定大小的合成攻略（长短段落混合、中英文句子、连续空行与多余空白），
+分别用两种实现分块，比较耗时、峰值内存并校验输出完全一致。
+
+用法:
+    python bench_chunker.py                    # 100 MB 合成攻略
+    python bench_chunker.py --size-mb 10 --chunk-size 500 --overlap 100
+"""
+import re
+import time
+import random
+import tracemalloc
+from vectorize_guide import iter_chunks, split_text_into_chunks
+
+SENTENCES = [
+    '先去左边的房间拿钥匙', '这里的BOSS会连续释放三次冲击波', '记得提前存档',
+    'Use the railgun against the tank', 'Press F1 to open the console', '水坑下面有隐藏的补给',
+    '第二阶段需要绕到背后攻击', '弹药不够时可以回到起点补充', 'The exit is behind the waterfall',
+    '推荐携带两个医疗包', '打开控制台输入 give railgun', '击败守卫后门会自动打开',
+]
+PUNCTUATION = ['。', '！', '？', '. ', '! ', '? ', '。 ', '']
+
+
+def legacy_split_text_into_chunks(text: str, chunk_size: int = 200, overlap: int = 50) -> list:
+    """
+    原 vectorize_guide.split_text_into_chunks 实现（未改动），作为对照
+    """
+    chunks = []
+    
+    # 按段落分割（保留换行符）
+    paragraphs = text.split('\n\n')
+    
+    current_chunk = ""
+    for para in paragraphs:
+        para = para.strip()
+        if not para:
+            continue
+        
+        # 如果当前 chunk 加上新段落不超过 chunk_size，则添加
+        if len(current_chunk) + len(para) + 2 <= chunk_size:
+            if current_chunk:
+                current_chunk += "\n\n" + para
+            else:
+                current_chunk = para
+        else:
+            # 如果当前 chunk 不为空，保存它
+            if current_chunk:
+                chunks.append(current_chunk)
+            
+            # 如果新段落本身就很长，需要进一步分割
+            if len(para) > chunk_size:
+                # 按句子分割长段落
+                sentences = re.split(r'[。！？.!?]\s*', para)
+                current_chunk = ""
+                for sentence in sentences:
+                    sentence = sentence.strip()
+                    if not sentence:
+                        continue
+                    
+                    if len(current_chunk) + len(sentence) + 1 <= chunk_size:
+                        if current_chunk:
+                            current_chunk += " " + sentence
+                        else:
+                            current_chunk = sentence
+                    else:
+                        if current_chunk:
+                            chunks.append(current_chunk)
+                        current_chunk = sentence
+            else:
+                current_chunk = para
+    
+    # 添加最后一个 chunk
+    if current_chunk:
+        chunks.append(current_chunk)
+    
+    # 应用重叠策略：如果 chunks 之间有重叠，可以保留更多上下文
+    if overlap > 0 and len(chunks) > 1:
+        overlapped_chunks = [chunks[0]]
+        for i in range(1, len(chunks)):
+            prev_chunk = chunks[i-1]
+            current_chunk = chunks[i]
+            
+            # 取前一个 chunk 的最后 overlap 个字符
+            if len(prev_chunk) > overlap:
+                overlap_text = prev_chunk[-overlap:]
+                overlapped_chunk = overlap_text + " " + current_chunk
+            else:
+                overlapped_chunk = current_chunk
+            
+            overlapped_chunks.append(overlapped_chunk)
+        chunks = overlapped_chunks
+    
+    return chunks
+
+
+def make_guide(size: int, seed: int = 0) -> str:
+    """
+    生成约 size 个字符的合成攻略
+    """
+    rng = random.Random(seed)
+    paragraphs = []
+    total = 0
+    game = 0
+    while total < size:
+        if rng.random() < 0.01:
+            game += 1
+            paragraph = f'<<游戏{game}>>'
+        else:
+            # 大部分是短段落，少数是需要按句子拆分的长段落（包括超过 chunk_size 的单句）
+            count = rng.choice([1, 2, 3, 5, 20, 60])
+            paragraph = ''.join(rng.choice(SENTENCES) * rng.choice([1, 1, 1, 12]) + rng.choice(PUNCTUATION)
+                                for _ in range(count))
+            if rng.random() < 0.1:
+                paragraph = '  ' + paragraph + ' \n'
+        paragraphs.append(paragraph)
+        total += len(paragraph) + 2
+    return rng.choice(['\n\n', '\n\n\n', '\n\n\n\n']).join(paragraphs)
+
+
+def measure(func, *args, repeat: int = 3):
+    """
+    返回 (结果, 耗时, 峰值内存)；耗时取 repeat 次运行的最小值，内存另外运行一次测量（tracemalloc 会显著拖慢执行）
+    """
+    elapsed = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = min(elapsed, time.perf_counter() - start)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def count_streaming(text: str, chunk_size: int, overlap: int) -> int:
+    return sum(1 for _ in iter_chunks(text, chunk_size=chunk_size, overlap=overlap))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='分块实现评测')
+    parser.add_argument('--size-mb', type=float, default=100, help='合成攻略大小（百万字符，默认: 100）')
+    parser.add_argument('--chunk-size', type=int, default=200, help='每个 chunk 的字符数 (默认: 200)')
+    parser.add_argument('--overlap', type=int, default=50, help='chunks 之间的重叠字符数 (默认: 50)')
+    parser.add_argument('--repeat', type=int, default=3, help='计时重复次数，取最小值 (默认: 3)')
+    args = parser.parse_args()
+
+    print(f"📄 正在生成 {args.size_mb:g}M 字符的合成攻略...")
+    text = make_guide(int(args.size_mb * 1_000_000))
+
+    legacy, legacy_time, legacy_peak = measure(legacy_split_text_into_chunks, text, args.chunk_size, args.overlap,
+                                               repeat=args.repeat)
+    print(f"   原实现:     {legacy_time:.2f} 秒，峰值内存 {legacy_peak / 2**20:.0f} MB，{len(legacy)} 个 chunks")
+    current, current_time, current_peak = measure(split_text_into_chunks, text, args.chunk_size, args.overlap,
+                                                 repeat=args.repeat)
+    print(f"   偏移量实现: {current_time:.2f} 秒，峰值内存 {current_peak / 2**20:.0f} MB，{len(current)} 个 chunks")
+    same = legacy == current
+    del legacy, current
+    count, streaming_time, streaming_peak = measure(count_streaming, text, args.chunk_size, args.overlap,
+                                                     repeat=args.repeat)
+    print(f"   流式 iter_chunks: {streaming_time:.2f} 秒，峰值内存 {streaming_peak / 2**20:.0f} MB，{count} 个 chunks")
+    print(f"{'✅' if same else '❌'} 输出{'完全一致' if same else '不一致'}，加速 {legacy_time / current_time:.2f}x")
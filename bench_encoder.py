@@ -0,0 +1,84 @@
+"""
+编码吞吐评测：64 个并发客户端下，逐条同步编码 vs 微批量编码器
+
+用法:
+    python bench_encoder.py
+    python bench_encoder.py --clients 64 --requests 20 --batch-size 32 --wait-ms 5
+"""
+import asyncio
+import time
+import numpy as np
+from encoder import BatchEncoder
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+
+SAMPLE_QUESTIONS = [
+    '雷神之锤2 秘籍', '雷神之锤2 怎么无敌', '合金装备 怎么对付闭路电视', '合金装备 水坑怎么过',
+    'give railgun 是什么', 'noclip 怎么用', '合金装备 boss 打法', '雷神之锤2 武器代码',
+]
+
+
+def make_texts(count: int):
+    # 每条文本都不同，避免测到缓存效果
+    return [f"{SAMPLE_QUESTIONS[i % len(SAMPLE_QUESTIONS)]} #{i}" for i in range(count)]
+
+
+async def run_clients(encode, texts, clients: int):
+    """
+    clients 个协程并发地依次编码分配给自己的文本，返回每条请求的延迟（毫秒）
+    """
+    latencies = []
+
+    async def client(client_texts):
+        for text in client_texts:
+            start = time.perf_counter()
+            await encode(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(client(texts[i::clients]) for i in range(clients)))
+    return np.array(latencies)
+
+
+def report(name: str, latencies: np.ndarray, elapsed: float):
+    print(f"{name:<18} | {len(latencies) / elapsed:8.1f} 条/秒 | "
+          f"p50 {np.percentile(latencies, 50):8.2f} ms | p99 {np.percentile(latencies, 99):8.2f} ms")
+
+
+async def main(args):
+    from sentence_transformers import SentenceTransformer
+
+    print(f"🤖 正在加载模型 {MODEL_NAME}...")
+    model = SentenceTransformer(MODEL_NAME)
+    model.encode(['预热'])
+    texts = make_texts(args.clients * args.requests)
+
+    print("=" * 72)
+    print(f"📊 {args.clients} 个并发客户端, 共 {len(texts)} 条文本")
+    print("=" * 72)
+
+    async def encode_inline(text):
+        # 旧实现：在事件循环中同步调用 model.encode，并发请求被逐条串行
+        return model.encode([text])[0]
+
+    start = time.perf_counter()
+    latencies = await run_clients(encode_inline, texts, args.clients)
+    report('逐条同步编码', latencies, time.perf_counter() - start)
+
+    encoder = BatchEncoder(model, max_batch_size=args.batch_size, max_wait_ms=args.wait_ms)
+    start = time.perf_counter()
+    latencies = await run_clients(encoder.encode, texts, args.clients)
+    report('微批量编码', latencies, time.perf_counter() - start)
+    print(f"   批次统计: {encoder.stats()}")
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='微批量编码器吞吐评测')
+    parser.add_argument('--clients', type=int, default=64, help='并发客户端数 (默认: 64)')
+    parser.add_argument('--requests', type=int, default=10, help='每个客户端的请求数 (默认: 10)')
+    parser.add_argument('--batch-size', type=int, default=32, help='单批最多文本数 (默认: 32)')
+    parser.add_argument('--wait-ms', type=float, default=5.0, help='批次等待窗口，毫秒 (默认: 5)')
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,151 @@
+"""
+游戏名称提取评测：原逐关键词扫描实现 vs 预编译 + 字典树 的 GameNameExtractor
+
+用法:
+    python bench_game_extractor.py
+    python bench_game_extractor.py --rounds 200
+    python bench_game_extractor.py --write-golden golden_game_names.json   # 用原实现重新生成黄金用例
+"""
+import re
+import json
+import time
+from typing import List, Optional
+from game_extractor import GameNameExtractor, QUESTION_KEYWORDS
+
+GAMES = ['雷神之锤2', '合金装备', '艾尔登法环', '原神', '王者荣耀', 'Elden Ring', 'Hades', '黑神话 悟空', '塞尔达传说 王国之泪']
+TEMPLATES = [
+    '{game}', '{game}怎么玩', '{game} 怎么打boss', '请问{game}有没有秘籍', '关于{game}的问题',
+    '{game}的攻略', '《{game}》怎么通关', '<<{game}>>', '求{game}的配装思路', '大神们，{game}第三关怎么过？',
+    '{game}是什么游戏', '帮我看看{game}阵容', '{game} BOSS 难度', '想了解 {game} 的任务流程', '听说{game}很难，如何入门',
+    '{game}作弊码是多少', '「{game}」怎样刷段位', '各位 {game} 英雄推荐', '{game}，求技巧！', '{game}能否单人通关',
+    '问下{game}控制台指令', '{game}?', '  {game}  ', '我想玩{game}', '{game}第二章的隐藏角色在哪',
+]
+EXTRA_QUESTIONS = [
+    '', ' ', '怎么玩', '攻略', '如何通关', '有没有秘籍？', '这个游戏怎么样', 'give railgun 是什么',
+    'noclip 怎么用', '水坑怎么过', '闭路电视怎么对付', '武器代码', 'boss', 'a', '1234', '？？？',
+    '关于', '请问，怎么打', '求助：卡关了', '今天天气不错，想玩点游戏。推荐一下？', 'iddqd', 'god mode怎么开',
+    '《》', '<<>>', '《A》', '请教一下各位大神这个boss怎么打啊', '大家好，我是新手；想问合金装备的潜入技巧',
+]
+
+
+def make_questions() -> List[str]:
+    """
+    黄金用例与评测共用的问题集
+    """
+    questions = [template.format(game=game) for game in GAMES for template in TEMPLATES]
+    return questions + EXTRA_QUESTIONS
+
+
+def legacy_extract_game_name(question: str) -> Optional[str]:
+    """
+    原 index.extract_game_name 实现（未改动），作为对照
+    """
+    patterns = [
+        r'<<([^>>]+)>>',
+        r'《([^》]+)》',
+        r'([^，。！？\s]+)(?:的)?攻略',
+        r'关于([^，。！？\s]+)',
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, question)
+        if match:
+            game_name = match.group(1).strip()
+            if len(game_name) > 1:
+                return game_name
+
+    question_keywords = QUESTION_KEYWORDS
+    leading_noise = r'^(关于|请问|求|想了解|帮我看看|问下|听说|求助|大神|各位|大家|请教)\s*'
+    cleaned_question = re.sub(leading_noise, '', question.strip())
+    for keyword in question_keywords:
+        if keyword in cleaned_question:
+            keyword_pos = cleaned_question.find(keyword)
+            if keyword_pos > 0:
+                candidate = cleaned_question[:keyword_pos].strip()
+                candidate = candidate.strip('《》"「」『』，。！？?!；;：: ')
+                if 2 <= len(candidate) <= 30 and not any(qk in candidate for qk in question_keywords):
+                    return candidate
+
+    condensed = question.strip().strip('《》"「」『』')
+    has_question_word = any(kw in condensed for kw in question_keywords)
+    if (
+        1 < len(condensed) <= 20
+        and not re.search(r'[？?！!。，,；;：:\n]', condensed)
+        and re.search(r'[\u4e00-\u9fa5A-Za-z0-9]', condensed)
+        and not has_question_word
+    ):
+        return condensed
+
+    segments = re.split(r'[。！？?!；;，,]', question)
+    for segment in segments:
+        seg = segment.strip()
+        if not seg:
+            continue
+        for keyword in question_keywords:
+            if keyword in seg:
+                candidate = seg.split(keyword)[0]
+                candidate = re.sub(leading_noise, '', candidate).strip('《》"「」『』 ')
+                if len(candidate) >= 2:
+                    return candidate
+
+    fallback_match = re.search(r'([\u4e00-\u9fa5A-Za-z0-9][\u4e00-\u9fa5A-Za-z0-9\s]{1,20})', question)
+    if fallback_match:
+        candidate = fallback_match.group(0).strip()
+        for keyword in question_keywords:
+            if keyword in candidate:
+                keyword_pos = candidate.find(keyword)
+                if keyword_pos > 0:
+                    candidate = candidate[:keyword_pos].strip()
+                    break
+        if len(candidate) >= 2 and not any(kw in candidate for kw in question_keywords):
+            return candidate
+
+    return None
+
+
+def time_per_call(extract, questions: List[str], rounds: int) -> float:
+    """
+    返回每次调用的平均耗时（微秒）
+    """
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for question in questions:
+            extract(question)
+    return (time.perf_counter() - start) / (rounds * len(questions)) * 1e6
+
+
+def main(args):
+    questions = make_questions()
+
+    if args.write_golden:
+        golden = [{'question': q, 'expected': legacy_extract_game_name(q)} for q in questions]
+        with open(args.write_golden, 'w', encoding='utf-8') as f:
+            json.dump(golden, f, ensure_ascii=False, indent=1)
+        print(f"✅ 已写入 {len(golden)} 条黄金用例到 {args.write_golden}")
+        return
+
+    extractor = GameNameExtractor(cache_size=0)
+    mismatches = [q for q in questions if extractor.extract(q) != legacy_extract_game_name(q)]
+
+    print("=" * 64)
+    print(f"📊 {len(questions)} 条问题 × {args.rounds} 轮")
+    print("=" * 64)
+    legacy_us = time_per_call(legacy_extract_game_name, questions, args.rounds)
+    print(f"{'原实现':<20} | {legacy_us:8.2f} µs/次")
+    extractor_us = time_per_call(extractor._extract, questions, args.rounds)
+    print(f"{'字典树':<20} | {extractor_us:8.2f} µs/次 | 加速 {legacy_us / extractor_us:.2f}x")
+    # 同一请求中 plan_answer 与 check_game_match 各调用一次：第二次命中缓存
+    cached = GameNameExtractor()
+    cached_us = time_per_call(lambda q: (cached.extract(q), cached.extract(q)), questions, args.rounds) / 2
+    print(f"{'字典树 + 缓存':<20} | {cached_us:8.2f} µs/次 | 加速 {legacy_us / cached_us:.2f}x")
+    print(f"   输出不一致: {len(mismatches)} 条" + (f" 例如 {mismatches[:3]}" if mismatches else ''))
+    print("=" * 64)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='游戏名称提取评测')
+    parser.add_argument('--rounds', type=int, default=100, help='重复轮数 (默认: 100)')
+    parser.add_argument('--write-golden', default=None, help='用原实现生成黄金用例 JSON 并退出')
+
+    main(parser.parse_args())
@@ -0,0 +1,55 @@
+"""
+BM25 索引评测：构建耗时与单次查询延迟
+
+用法:
+    python bench_lexical.py                          # 合成攻略（默认 20M 字符）
+    python bench_lexical.py --size-mb 100
+    python bench_lexical.py --store guide_vectors.npy  # 使用已生成的向量存储中的 chunks
+"""
+import time
+import numpy as np
+from lexical_index import BM25Index
+from bench_retriever import format_latency
+
+QUERIES = [
+    'give railgun', 'noclip 怎么用', '水坑怎么过', '第二阶段的BOSS怎么打', '推荐携带两个医疗包吗',
+    'Press F1 to open the console', '弹药不够怎么办', '这里的BOSS会连续释放三次冲击波，怎么躲',
+]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='BM25 索引构建与查询延迟评测')
+    parser.add_argument('--store', type=str, default=None, help='向量存储路径（默认使用合成攻略）')
+    parser.add_argument('--size-mb', type=float, default=20, help='合成攻略大小（百万字符，默认: 20）')
+    parser.add_argument('--k', type=int, default=6, help='每次查询返回的段落数 (默认: 6)')
+    parser.add_argument('--rounds', type=int, default=200, help='每个查询的重复次数 (默认: 200)')
+    args = parser.parse_args()
+
+    if args.store:
+        from vector_store import load_vector_store
+        chunks, _, _ = load_vector_store(args.store)
+        source = args.store
+    else:
+        from bench_chunker import make_guide
+        from vectorize_guide import split_text_into_chunks
+        chunks = split_text_into_chunks(make_guide(int(args.size_mb * 1_000_000)))
+        source = f"合成攻略 {args.size_mb:g}M 字符"
+
+    start = time.perf_counter()
+    index = BM25Index(chunks)
+    print(f"📊 {source}: {len(chunks)} 个 chunks，{len(index.vocabulary)} 个词，"
+          f"构建耗时 {time.perf_counter() - start:.2f} 秒")
+
+    latencies = []
+    for query in QUERIES:
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            index.search(query, args.k)
+            latencies.append((time.perf_counter() - start) * 1000)
+    print(f"bm25 | {format_latency(np.array(latencies))}")
+
+
+if __name__ == '__main__':
+    main()
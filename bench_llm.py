@@ -0,0 +1,77 @@
+"""
+异步 /ask 流水线评测：慢速攻略生成进行中时，快速 RAG 请求的 p99 延迟是否保持平稳
+
+使用本地 LLM 桩服务（stub_llm_server.py），不会调用真实的 DeepSeek API。
+
+用法:
+    python bench_llm.py
+    python bench_llm.py --requests 200 --concurrency 16 --slow 8 --slow-s 5
+"""
+import asyncio
+import os
+import time
+import numpy as np
+from fastapi import Response
+
+RAG_QUESTIONS = ['雷神之锤2 秘籍', '雷神之锤2 give railgun 是什么', '合金装备 怎么对付闭路电视', '合金装备 水坑怎么过']
+
+
+async def measure_rag_latency(index, requests: int, concurrency: int) -> np.ndarray:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start = time.perf_counter()
+            await index.ask_question(index.QuestionRequest(question=RAG_QUESTIONS[i % len(RAG_QUESTIONS)]), Response())
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return np.array(latencies)
+
+
+def report(name: str, latencies: np.ndarray):
+    print(f"{name:<24} | p50 {np.percentile(latencies, 50):8.2f} ms | "
+          f"p99 {np.percentile(latencies, 99):8.2f} ms | max {latencies.max():8.2f} ms")
+
+
+async def main(args):
+    from stub_llm_server import start_stub_server
+
+    os.environ['DEEPSEEK_API_KEY'] = 'stub'
+    os.environ['DEEPSEEK_API_BASE'] = start_stub_server(args.port, args.fast_ms, args.slow_s)
+
+    import index
+    await index.startup_event()
+
+    print("=" * 72)
+    print(f"📊 RAG 请求 {args.requests} 个（并发 {args.concurrency}），LLM 快请求 {args.fast_ms} ms，慢请求 {args.slow_s} s")
+    print("=" * 72)
+
+    await measure_rag_latency(index, len(RAG_QUESTIONS), 1)  # 预热缓存与连接
+    report('无慢请求', await measure_rag_latency(index, args.requests, args.concurrency))
+
+    slow_tasks = [
+        asyncio.create_task(index.generate_guide_with_llm(f'测试游戏{i}', '完整攻略'))
+        for i in range(args.slow)
+    ]
+    await asyncio.sleep(0.1)
+    report(f'{args.slow} 个慢生成进行中', await measure_rag_latency(index, args.requests, args.concurrency))
+    print(f"   慢生成完成数: {sum(task.done() for task in slow_tasks)}/{args.slow}")
+    await asyncio.gather(*slow_tasks)
+    await index.shutdown_event()
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='慢速生成对快速 RAG 请求延迟的影响')
+    parser.add_argument('--requests', type=int, default=200, help='RAG 请求数 (默认: 200)')
+    parser.add_argument('--concurrency', type=int, default=16, help='RAG 请求并发数 (默认: 16)')
+    parser.add_argument('--slow', type=int, default=8, help='同时进行的慢生成数 (默认: 8)')
+    parser.add_argument('--port', type=int, default=8765, help='桩服务端口 (默认: 8765)')
+    parser.add_argument('--fast-ms', type=float, default=20.0, help='快请求延迟，毫秒 (默认: 20)')
+    parser.add_argument('--slow-s', type=float, default=5.0, help='慢请求延迟，秒 (默认: 5)')
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,71 @@
+"""
+查询编码吞吐对比：PyTorch vs ONNX Runtime（float32 / 动态 int8），以及与 PyTorch 输出的余弦一致性
+
+先导出模型: python onnx_encoder.py --output onnx_model
+
+用法:
+    python bench_onnx_encoder.py
+    python bench_onnx_encoder.py --model-dir onnx_model --texts 512 --batch-sizes 1,32 --threads 1,2,4,0
+"""
+import time
+import numpy as np
+from embedding_model import MODEL_NAME
+from onnx_encoder import OnnxEncoder, EXPORT_DIR, FP32_FILE, INT8_FILE
+from bench_encoder import make_texts
+
+
+def throughput(model, texts, batch_size: int) -> float:
+    """
+    按 batch_size 分批编码全部文本，返回每秒条数（batch_size=1 对应单条查询的场景）
+    """
+    model.encode(texts[:batch_size], batch_size=batch_size)
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        model.encode(texts[i:i + batch_size], batch_size=batch_size)
+    return len(texts) / (time.perf_counter() - start)
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='PyTorch 与 ONNX Runtime 编码吞吐对比')
+    parser.add_argument('--model-dir', type=str, default=EXPORT_DIR, help=f'导出目录 (默认: {EXPORT_DIR})')
+    parser.add_argument('--texts', type=int, default=512, help='编码的文本数 (默认: 512)')
+    parser.add_argument('--batch-sizes', type=str, default='1,32', help='批大小列表 (默认: 1,32)')
+    parser.add_argument('--threads', type=str, default='0',
+                        help='ONNX Runtime 线程数列表，0 表示自动 (默认: 0)')
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts)
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',') if b]
+    thread_counts = [int(t) for t in args.threads.split(',') if t]
+
+    from sentence_transformers import SentenceTransformer
+
+    print(f"🤖 正在加载模型 {MODEL_NAME}...")
+    reference = SentenceTransformer(MODEL_NAME, device='cpu')
+    expected = reference.encode(texts, batch_size=32)
+
+    candidates = [('pytorch', reference)]
+    for threads in thread_counts:
+        for label, file_name in (('onnx-fp32', FP32_FILE), ('onnx-int8', INT8_FILE)):
+            candidates.append((f"{label} t={threads or 'auto'}", OnnxEncoder(args.model_dir, file_name, threads)))
+
+    print("=" * 84)
+    print(f"📊 {len(texts)} 条查询文本，吞吐单位：条/秒；余弦为与 PyTorch 输出逐条比较")
+    print("=" * 84)
+    for name, model in candidates:
+        rates = " | ".join(f"batch={b:<3} {throughput(model, texts, b):8.1f}" for b in batch_sizes)
+        cosine = cosine_rows(expected, model.encode(texts, batch_size=32))
+        print(f"{name:<18} | {rates} | 余弦 mean {cosine.mean():.5f} min {cosine.min():.5f}")
+    print("=" * 84)
+
+
+if __name__ == '__main__':
+    main()
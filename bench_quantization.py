@@ -0,0 +1,73 @@
+"""
+低精度存储评测：float32 / float16 / int8（可选 float32 精确重排）相对 float64 基准的 recall@k、内存与延迟
+
+基准为 float64 精确检索（即旧版 JSON 存储 np.array 得到的精度）。
+
+用法:
+    python bench_quantization.py                           # 合成语料（默认 100k × 384）
+    python bench_quantization.py --n 1000000 --rerank 2,4,8
+    python bench_quantization.py --store guide_vectors.npy  # 使用已生成的向量存储
+"""
+import numpy as np
+from retriever import ExactRetriever, RerankRetriever, top_k_indices
+from quantization import QuantizedMatrix, quantize_int8
+from vector_store import load_vector_store, ensure_normalized
+from bench_retriever import make_synthetic_corpus, make_queries, run_queries, recall_at_k, format_latency
+
+
+def float64_baseline(embeddings: np.ndarray, queries: np.ndarray, k: int):
+    matrix = np.asarray(embeddings, dtype=np.float64)
+    return [top_k_indices(matrix @ query.astype(np.float64), k) for query in queries]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='低精度存储的 recall@k / 内存 / 延迟对比')
+    parser.add_argument('--store', type=str, default=None, help='向量存储路径（默认使用合成语料）')
+    parser.add_argument('--n', type=int, default=100000, help='合成语料的向量数 (默认: 100000)')
+    parser.add_argument('--dim', type=int, default=384, help='合成语料的向量维度 (默认: 384)')
+    parser.add_argument('--queries', type=int, default=200, help='查询数量 (默认: 200)')
+    parser.add_argument('--k', type=int, default=10, help='recall@k 的 k (默认: 10)')
+    parser.add_argument('--rerank', type=str, default='2,4', help='要评测的重排候选倍数列表 (默认: 2,4)')
+    args = parser.parse_args()
+
+    if args.store:
+        _, raw, meta = load_vector_store(args.store)
+        embeddings = np.asarray(ensure_normalized(raw, meta), dtype=np.float32)
+        source = args.store
+    else:
+        embeddings = make_synthetic_corpus(args.n, args.dim)
+        source = f"合成语料 {args.n} × {args.dim}"
+
+    queries = make_queries(embeddings, args.queries)
+    k = min(args.k, embeddings.shape[0])
+    baseline = float64_baseline(embeddings, queries, k)
+
+    int8_data, scales = quantize_int8(embeddings)
+    matrices = [
+        ('float32', embeddings, embeddings.nbytes),
+        ('float16', QuantizedMatrix(embeddings.astype(np.float16)), embeddings.nbytes // 2),
+        ('int8', QuantizedMatrix(int8_data, scales), int8_data.nbytes + scales.nbytes),
+    ]
+    factors = [int(f) for f in args.rerank.split(',') if f]
+
+    print("=" * 84)
+    print(f"📊 低精度存储评测: {source}, {len(queries)} 个查询, k={k}（基准: float64 精确检索，"
+          f"{embeddings.shape[0] * embeddings.shape[1] * 8 / 2**20:.1f} MB）")
+    print("=" * 84)
+    for name, matrix, nbytes in matrices:
+        retrievers = [(name, ExactRetriever(matrix))]
+        if name != 'float32':
+            retrievers += [(f"{name}+rerank×{factor}", RerankRetriever(ExactRetriever(matrix), embeddings, factor))
+                           for factor in factors]
+        for label, retriever in retrievers:
+            results, latencies = run_queries(retriever, queries, k)
+            recall = recall_at_k(results, baseline, k)
+            print(f"{label:<18} | {nbytes / 2**20:8.1f} MB | recall@{k} {recall:.4f} "
+                  f"(损失 {1 - recall:.4f}) | {format_latency(latencies)}")
+    print("=" * 84)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""
+检索后端评测：比较 IVF 近似检索与精确检索的 recall@k 与延迟
+
+用法:
+    python bench_retriever.py                       # 合成语料（默认 100k × 384）
+    python bench_retriever.py --n 1000000           # 更大的合成语料
+    python bench_retriever.py --store guide_vectors.npy   # 使用已生成的向量存储
+"""
+import time
+import numpy as np
+from retriever import ExactRetriever, IVFRetriever, ann_index_path
+from vector_store import load_vector_store, ensure_normalized, normalize_rows
+
+
+def make_synthetic_corpus(n: int, dim: int, clusters: int = 256, seed: int = 0) -> np.ndarray:
+    """
+    生成带聚类结构的归一化向量（比均匀随机向量更接近真实文本向量的分布）
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    matrix = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32)
+    return normalize_rows(matrix)
+
+
+def make_queries(embeddings: np.ndarray, count: int, noise: float = 0.3, seed: int = 1) -> np.ndarray:
+    """
+    在随机选取的语料向量上加噪声作为查询
+    """
+    rng = np.random.default_rng(seed)
+    base = np.asarray(embeddings[rng.integers(0, embeddings.shape[0], size=count)], dtype=np.float32)
+    return normalize_rows(base + noise * rng.standard_normal(base.shape).astype(np.float32))
+
+
+def run_queries(retriever, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        indices, _ = retriever.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(indices)
+    return results, np.array(latencies)
+
+
+def recall_at_k(approx_results, exact_results, k: int) -> float:
+    hits = sum(len(set(a[:k].tolist()) & set(e[:k].tolist())) for a, e in zip(approx_results, exact_results))
+    return hits / (k * len(exact_results))
+
+
+def format_latency(latencies: np.ndarray) -> str:
+    return (f"p50 {np.percentile(latencies, 50):7.3f} ms | "
+            f"p99 {np.percentile(latencies, 99):7.3f} ms | "
+            f"QPS {1000 / latencies.mean():8.1f}")
+
+
+def main():
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description='IVF 与精确检索的 recall@k / 延迟对比')
+    parser.add_argument('--store', type=str, default=None, help='向量存储路径（默认使用合成语料）')
+    parser.add_argument('--n', type=int, default=100000, help='合成语料的向量数 (默认: 100000)')
+    parser.add_argument('--dim', type=int, default=384, help='合成语料的向量维度 (默认: 384)')
+    parser.add_argument('--queries', type=int, default=200, help='查询数量 (默认: 200)')
+    parser.add_argument('--k', type=int, default=10, help='recall@k 的 k (默认: 10)')
+    parser.add_argument('--nlist', type=int, default=None, help='IVF 聚类数 (默认: sqrt(n))')
+    parser.add_argument('--nprobe', type=str, default='1,4,8,16,32', help='要评测的 nprobe 列表')
+    args = parser.parse_args()
+
+    if args.store:
+        _, raw, meta = load_vector_store(args.store)
+        embeddings = ensure_normalized(raw, meta)
+        store_id = meta['store_id']
+        source = args.store
+    else:
+        embeddings = make_synthetic_corpus(args.n, args.dim)
+        store_id = None
+        source = f"合成语料 {args.n} × {args.dim}"
+
+    queries = make_queries(embeddings, args.queries)
+    k = min(args.k, embeddings.shape[0])
+
+    print("=" * 72)
+    print(f"📊 检索评测: {source}, {len(queries)} 个查询, k={k}")
+    print("=" * 72)
+
+    exact = ExactRetriever(embeddings)
+    exact_results, exact_latencies = run_queries(exact, queries, k)
+    print(f"exact              | recall@{k} 1.0000 | {format_latency(exact_latencies)}")
+
+    index_path = ann_index_path(args.store, 'ivf') if args.store else None
+    start = time.perf_counter()
+    ivf = None
+    if index_path and os.path.exists(index_path):
+        ivf = IVFRetriever.load(index_path, embeddings, store_id=store_id, exact_threshold=0)
+    if ivf is None:
+        ivf = IVFRetriever.build(embeddings, nlist=args.nlist, exact_threshold=0)
+    print(f"ivf 索引就绪: {ivf.centroids.shape[0]} 个聚类, 耗时 {time.perf_counter() - start:.2f} s")
+
+    for nprobe in [int(p) for p in args.nprobe.split(',')]:
+        ivf.nprobe = min(nprobe, ivf.centroids.shape[0])
+        ivf_results, ivf_latencies = run_queries(ivf, queries, k)
+        recall = recall_at_k(ivf_results, exact_results, k)
+        print(f"ivf nprobe={ivf.nprobe:<6} | recall@{k} {recall:.4f} | {format_latency(ivf_latencies)}")
+    print("=" * 72)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""
+启动耗时评测：在全新的子进程中分阶段计时（每次运行都是冷启动的 Python 进程，磁盘缓存是热的）
+
+阶段：
+- import_app: 导入 index（FastAPI、numpy 以及各模块；不包含 sentence_transformers / torch）
+- import_model_lib: 导入 sentence_transformers（及 torch）
+- model: 加载模型权重（后端与路径见 embedding_model.py 的环境变量）
+- vectors: 加载向量存储并构建检索索引（BM25、游戏目录等）
+
+默认启动需要全部阶段完成才开始监听；FAST_START=1 时只需 import_app + vectors，其余在后台完成。
+
+用法:
+    python bench_startup.py
+    python bench_startup.py --runs 5 --vector-file guide_vectors.npy
+    EMBEDDING_BACKEND=onnx EMBEDDING_ONNX_FILE=onnx/model_qint8_avx2.onnx python bench_startup.py
+"""
+import json
+import os
+import subprocess
+import sys
+import numpy as np
+
+PHASES = ('import_app', 'import_model_lib', 'model', 'vectors')
+
+CHILD_SCRIPT = '''
+import json, sys, time
+timings = {}
+start = time.perf_counter()
+import index
+timings['import_app'] = time.perf_counter() - start
+start = time.perf_counter()
+import sentence_transformers
+timings['import_model_lib'] = time.perf_counter() - start
+start = time.perf_counter()
+index.load_model()
+timings['model'] = time.perf_counter() - start
+# 模型已加载，包含游戏目录名称的编码
+start = time.perf_counter()
+index.load_vectors(sys.argv[1])
+timings['vectors'] = time.perf_counter() - start
+print('TIMINGS ' + json.dumps(timings))
+'''
+
+
+def measure_once(vector_file: str) -> dict:
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, vector_file],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    for line in result.stdout.splitlines():
+        if line.startswith('TIMINGS '):
+            return json.loads(line[len('TIMINGS '):])
+    raise RuntimeError(f"子进程失败:\n{result.stderr[-2000:]}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='服务启动各阶段耗时')
+    parser.add_argument('--runs', type=int, default=3, help='运行次数，取中位数 (默认: 3)')
+    parser.add_argument('--vector-file', type=str, default=os.getenv('VECTOR_FILE', 'guide_vectors.npy'),
+                        help='向量存储路径 (默认: guide_vectors.npy)')
+    args = parser.parse_args()
+
+    runs = [measure_once(args.vector_file) for _ in range(args.runs)]
+    medians = {phase: float(np.median([run[phase] for run in runs])) for phase in PHASES}
+    backend = os.getenv('EMBEDDING_BACKEND') or 'torch'
+
+    print("=" * 60)
+    print(f"📊 启动耗时（{args.runs} 次冷启动进程的中位数，模型后端: {backend}）")
+    print("=" * 60)
+    for phase in PHASES:
+        print(f"{phase:<18} | {medians[phase]:8.2f} 秒")
+    print("-" * 60)
+    eager = sum(medians.values())
+    fast = medians['import_app'] + medians['vectors']
+    # 快速启动时模型与向量同时加载，ready 取决于较慢的一路
+    ready = medians['import_app'] + max(medians['import_model_lib'] + medians['model'], medians['vectors'])
+    print(f"{'默认启动':<14} | {eager:8.2f} 秒后开始监听")
+    print(f"{'FAST_START=1':<18} | {fast:8.2f} 秒后开始监听，约 {ready:.2f} 秒后 ready（模型在后台加载）")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,497 @@
+"""
+离线评测套件：在可扩展的合成语料上评测检索、游戏名称提取与完整的 /ask 处理流程，结果保存为 JSON
+
+- 语料：guide.txt 的真实 chunks（用当前模型编码）+ 合成游戏的干扰段落，总数可从 1k 扩展到 1M。
+  干扰段落的文本由真实段落的行打乱得到，向量为真实向量加噪声（默认与原向量余弦约 0.7），
+  分属 “合成游戏 N” 等游戏，因此同时考验向量检索、BM25 与按游戏过滤。
+- 问题集：从 guide.txt 逐行生成带标注的问题（所属游戏 + 回答该问题的原文行），
+  包含该行（长行取行首）的 chunk 都算命中，用于计算 recall@k 与游戏名称提取准确率。
+- 评测项：
+  - extract_game_name：延迟与准确率
+  - find_similar_chunks：按标注游戏过滤 / 不过滤两种情况下的延迟与 recall@1、recall@k（问题向量预先编码）
+  - /ask：完整处理函数（编码、检索、路由、LLM），LLM 为本地桩服务（stub_llm_server.py），
+    逐个请求的延迟分位数，以及并发请求的 QPS
+  - 内存：加载前后的 RSS、峰值 RSS 与存储文件大小
+- 每次运行的结果（含 git 提交、参数与环境）保存为 JSON，--compare 与之前的结果逐项对比。
+
+需要句向量模型（与服务相同，见 embedding_model.py 的环境变量）。
+不会访问 Supabase 或真实的 DeepSeek API，也不会修改 guide_vectors.npy。
+
+用法:
+    python bench_suite.py
+    python bench_suite.py --chunks 1000,100000,1000000 --questions 300
+    python bench_suite.py --chunks 1000000 --no-hybrid          # 不构建 BM25 索引
+    python bench_suite.py --compare bench_results/suite-20260101-120000.json
+"""
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence, Set
+import numpy as np
+from vector_store import StoreAppender, store_paths, normalize_rows
+from vectorize_guide import load_guide_file, split_sections, split_text_into_chunks
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RESULTS_DIR = 'bench_results'
+# 游戏名称标记（合成段落的文本中去掉，避免改变段落所属游戏）
+GAME_MARKER = re.compile(r'<<[^>>]+>>')
+# 秘籍行：“指令 =说明”
+CHEAT_LINE = re.compile(r'^([A-Za-z][\w ’\']*?)\s*=\s*(.+)$')
+# 原文行较长时会被分到多个 chunk，以行首的这么多个字符判断 chunk 是否包含答案
+GOLD_PREFIX = 40
+# 分块时句末标点与换行会被替换为空白，比较前从两边去掉
+UNCOMPARED = re.compile(r'[。！？.!?\s]+')
+
+
+class LabelledQuestion(NamedTuple):
+    question: str
+    game: str          # 问题所属的游戏
+    answer_line: str   # guide.txt 中回答该问题的原文行
+
+
+def build_labelled_questions(guide_text: str, limit: Optional[int] = None, seed: int = 0) -> List[LabelledQuestion]:
+    """
+    从攻略逐行生成问题：秘籍行问“<说明>的秘籍是什么”，其余较长的行取前半句作为问题
+    超过 limit 时随机抽样（保持原文顺序）
+    """
+    questions = []
+    for game, section in split_sections(guide_text):
+        if not game:
+            continue
+        for line in section.splitlines():
+            line = line.strip()
+            if not line or GAME_MARKER.search(line) or set(line) <= set('-= '):
+                continue
+            cheat = CHEAT_LINE.match(line)
+            if cheat:
+                questions.append(LabelledQuestion(f"{game} {cheat.group(2).strip()}的秘籍是什么", game, line))
+            elif len(line) >= 8:
+                questions.append(LabelledQuestion(f"{game} {line[:max(6, len(line) // 2)]}", game, line))
+    if limit and len(questions) > limit:
+        keep = sorted(random.Random(seed).sample(range(len(questions)), limit))
+        questions = [questions[i] for i in keep]
+    return questions
+
+
+def gold_chunks(questions: Sequence[LabelledQuestion], chunks: Sequence[str]) -> List[Set[str]]:
+    """
+    每个问题的标准答案：包含其原文行（较长的行取行首 GOLD_PREFIX 个字符）的 chunk 文本集合
+    可能因重叠而有多个；行首恰好被切断时为空，该问题不参与评测
+    """
+    comparable = [(chunk, UNCOMPARED.sub('', chunk)) for chunk in chunks]
+    gold = []
+    for question in questions:
+        key = UNCOMPARED.sub('', question.answer_line)[:GOLD_PREFIX]
+        gold.append({chunk for chunk, text in comparable if key in text})
+    return gold
+
+
+def synthetic_chunks(real_chunks: Sequence[str], real_vectors: np.ndarray, count: int, chunks_per_game: int,
+                     noise: float, seed: int = 0, block_size: int = 65536):
+    """
+    按块生成 count 个干扰段落，产出 (chunk 文本列表, 归一化向量)
+    每 chunks_per_game 个段落属于一个合成游戏（首个段落带 <<合成游戏 N>> 标记）
+    """
+    rng = np.random.default_rng(seed)
+    sources = [GAME_MARKER.sub('', chunk).strip().splitlines() for chunk in real_chunks]
+    dim = real_vectors.shape[1]
+    for start in range(0, count, block_size):
+        size = min(block_size, count - start)
+        picks = rng.integers(0, len(real_chunks), size=size)
+        noise_vectors = rng.standard_normal((size, dim)).astype(np.float32)
+        noise_vectors /= np.linalg.norm(noise_vectors, axis=1, keepdims=True)
+        vectors = normalize_rows(real_vectors[picks] + noise * noise_vectors)
+        texts = []
+        for offset, source in enumerate(picks):
+            i = start + offset
+            lines = list(sources[source])
+            rng.shuffle(lines)
+            header = f"<<合成游戏 {i // chunks_per_game}>>\n" if i % chunks_per_game == 0 else ""
+            texts.append(f"{header}[合成 {i}] " + " ".join(lines))
+        yield texts, vectors
+
+
+def write_corpus(base_path: str, real_chunks: Sequence[str], real_vectors: np.ndarray, total: int,
+                 chunks_per_game: int, noise: float) -> str:
+    """
+    写出包含真实段落与干扰段落的向量存储（流式写入，不在内存中保留全部向量），返回 .npy 路径
+    """
+    appender = StoreAppender(base_path, real_vectors.shape[1])
+    try:
+        appender.append(list(real_chunks), real_vectors)
+        for texts, vectors in synthetic_chunks(real_chunks, real_vectors, total - len(real_chunks),
+                                               chunks_per_game, noise):
+            appender.append(texts, vectors)
+        npy_path, _ = appender.finalize({'source': 'bench_suite'})
+    except BaseException:
+        appender.close()
+        raise
+    return npy_path
+
+
+def latency_summary(latencies_ms: Sequence[float], wall_seconds: Optional[float] = None) -> dict:
+    """
+    延迟分位数（毫秒）与 QPS；提供 wall_seconds（并发执行的总耗时）时 QPS 按总耗时计算
+    """
+    values = np.asarray(latencies_ms, dtype=np.float64)
+    if values.size == 0:
+        return {'count': 0}
+    seconds = wall_seconds if wall_seconds else values.sum() / 1000
+    return {
+        'count': int(values.size),
+        'mean_ms': round(float(values.mean()), 3),
+        'p50_ms': round(float(np.percentile(values, 50)), 3),
+        'p90_ms': round(float(np.percentile(values, 90)), 3),
+        'p99_ms': round(float(np.percentile(values, 99)), 3),
+        'max_ms': round(float(values.max()), 3),
+        'qps': round(values.size / seconds, 1) if seconds > 0 else None,
+    }
+
+
+def rss_mb() -> Optional[float]:
+    """
+    当前进程的常驻内存（MB），无法获取时返回 None
+    """
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def time_calls(function, items) -> List[float]:
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        function(item)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def bench_extraction(index, snap, questions: Sequence[LabelledQuestion]) -> dict:
+    """
+    exact_accuracy：提取结果与标注游戏名完全一致（归一化后）；
+    accuracy：提取结果经游戏目录的字符串索引解析后是标注游戏（与服务中的用法一致）
+    """
+    found = {}
+    latencies = time_calls(lambda q: found.__setitem__(q, index.extract_game_name(q.question)), questions)
+    exact = resolved = 0
+    for q in questions:
+        name = found[q]
+        if not name:
+            continue
+        expected = index.normalize_game_title(q.game)
+        exact += index.normalize_game_title(name) == expected
+        match = snap.game_catalog.lookup(name) if snap.game_catalog else None
+        resolved += match is not None and index.normalize_game_title(match.title) == expected
+    return {
+        'latency': latency_summary(latencies),
+        'accuracy': round(resolved / len(questions), 4),
+        'exact_accuracy': round(exact / len(questions), 4),
+    }
+
+
+def bench_retrieval(index, snap, questions: Sequence[LabelledQuestion], vectors: np.ndarray,
+                    gold: Sequence[Set[str]], top_k: int, filtered: bool) -> dict:
+    results = []
+
+    def search(i):
+        results.append(index.find_similar_chunks(
+            questions[i].question, top_k,
+            similarity_threshold=index.SIMILARITY_THRESHOLD,
+            target_game_name=questions[i].game if filtered else None,
+            question_embedding=vectors[i],
+            snap=snap
+        )[0])
+
+    latencies = time_calls(search, range(len(questions)))
+    hits_at_1 = sum(1 for chunks, expected in zip(results, gold) if chunks and chunks[0] in expected)
+    hits_at_k = sum(1 for chunks, expected in zip(results, gold) if expected.intersection(chunks))
+    return {
+        'latency': latency_summary(latencies),
+        'recall@1': round(hits_at_1 / len(questions), 4),
+        f'recall@{top_k}': round(hits_at_k / len(questions), 4),
+    }
+
+
+async def bench_ask(index, questions: Sequence[LabelledQuestion], concurrency: int) -> dict:
+    """
+    依次调用 /ask 处理函数测延迟分布，再以 concurrency 个并发请求测 QPS
+    每一轮之前清空问题向量与回答缓存，保证每个请求都完整执行
+    """
+    from fastapi import Response
+
+    def clear_caches():
+        index.embedding_cache.clear()
+        index.answer_cache.memory.clear()
+
+    async def ask(question: str) -> str:
+        response = await index.ask_question(index.QuestionRequest(question=question), Response())
+        return response.source
+
+    clear_caches()
+    latencies, sources = [], {}
+    for question in questions:
+        start = time.perf_counter()
+        source = await ask(question.question)
+        latencies.append((time.perf_counter() - start) * 1000)
+        sources[source] = sources.get(source, 0) + 1
+
+    clear_caches()
+    semaphore = asyncio.Semaphore(concurrency)
+    concurrent_latencies = []
+
+    async def one(question: str):
+        async with semaphore:
+            start = time.perf_counter()
+            await ask(question)
+            concurrent_latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(question.question) for question in questions))
+    wall = time.perf_counter() - start
+    return {
+        'latency': latency_summary(latencies),
+        'concurrent': {'concurrency': concurrency, **latency_summary(concurrent_latencies, wall)},
+        'sources': sources,
+    }
+
+
+async def run_size(index, workdir: str, total: int, real_chunks: List[str], real_vectors: np.ndarray,
+                   questions: List[LabelledQuestion], args) -> dict:
+    total = max(total, len(real_chunks))
+    base_path = os.path.join(workdir, f'corpus_{total}')
+    print(f"\n📦 语料 {total} 个段落（真实 {len(real_chunks)}，合成 {total - len(real_chunks)}）")
+
+    start = time.perf_counter()
+    npy_path = write_corpus(base_path, real_chunks, real_vectors, total, args.chunks_per_game, args.noise)
+    write_seconds = time.perf_counter() - start
+    store_bytes = sum(os.path.getsize(path) for path in store_paths(npy_path))
+
+    index.snapshot = None
+    gc.collect()
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    snap = index.load_vectors(npy_path)
+    load_seconds = time.perf_counter() - start
+    rss_after = rss_mb()
+
+    gold = gold_chunks(questions, real_chunks)
+    labelled = [(question, expected) for question, expected in zip(questions, gold) if expected]
+    questions = [question for question, _ in labelled]
+    gold = [expected for _, expected in labelled]
+
+    start = time.perf_counter()
+    vectors = index.encode_queries([question.question for question in questions])
+    encode_seconds = time.perf_counter() - start
+
+    result = {
+        'chunks': total,
+        'games': len(snap.game_catalog.titles),
+        'questions': len(questions),
+        'store': {
+            'write_seconds': round(write_seconds, 2),
+            'load_seconds': round(load_seconds, 2),
+            'size_mb': round(store_bytes / 2**20, 1),
+            'retriever': snap.retriever.name,
+            'hybrid_retrieval': snap.lexical_index is not None,
+        },
+        'encode_questions': {'seconds': round(encode_seconds, 3),
+                             'qps': round(len(questions) / encode_seconds, 1) if encode_seconds > 0 else None},
+        'extract_game_name': bench_extraction(index, snap, questions),
+        'find_similar_chunks': {
+            'game_filtered': bench_retrieval(index, snap, questions, vectors, gold, args.top_k, filtered=True),
+            'all_chunks': bench_retrieval(index, snap, questions, vectors, gold, args.top_k, filtered=False),
+        },
+        'ask': await bench_ask(index, questions, args.concurrency),
+    }
+    result['memory_mb'] = {
+        'rss_before_load': rss_before,
+        'rss_after_load': rss_after,
+        'load_delta': round(rss_after - rss_before, 1) if rss_before is not None and rss_after is not None else None,
+        'rss_after_bench': rss_mb(),
+        'peak_rss': peak_rss_mb(),
+    }
+    print_result(result, args.top_k)
+    return result
+
+
+def print_result(result: dict, top_k: int):
+    def line(name: str, latency: dict, extra: str = ''):
+        print(f"   {name:<34} | p50 {latency['p50_ms']:9.3f} ms | p99 {latency['p99_ms']:9.3f} ms | "
+              f"QPS {latency['qps']:9.1f}{extra}")
+
+    store, memory = result['store'], result['memory_mb']
+    print(f"   存储 {store['size_mb']} MB，加载 {store['load_seconds']} 秒，{result['games']} 个游戏，"
+          f"{result['questions']} 个问题；RSS 加载增量 {memory['load_delta']} MB，峰值 {memory['peak_rss']} MB")
+    extraction = result['extract_game_name']
+    line('extract_game_name', extraction['latency'],
+         f" | 准确率 {extraction['accuracy']:.1%}（完全一致 {extraction['exact_accuracy']:.1%}）")
+    for mode, stats in result['find_similar_chunks'].items():
+        line(f'find_similar_chunks/{mode}', stats['latency'],
+             f" | recall@1 {stats['recall@1']:.1%} recall@{top_k} {stats[f'recall@{top_k}']:.1%}")
+    ask = result['ask']
+    line('/ask（逐个）', ask['latency'], f" | 来源 {ask['sources']}")
+    line(f"/ask（并发 {ask['concurrent']['concurrency']}）", ask['concurrent'])
+
+
+def flatten_metrics(result: dict, prefix: str = '') -> Dict[str, float]:
+    """
+    把一个语料规模的结果展开为 {"路径": 数值}，用于对比
+    """
+    flat = {}
+    for key, value in result.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten_metrics(value, path + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[path] = value
+    return flat
+
+
+COMPARED_SUFFIXES = ('p50_ms', 'p99_ms', 'qps', 'accuracy', 'exact_accuracy', 'recall@', 'load_delta', 'peak_rss',
+                     'load_seconds')
+
+
+def compare_results(old: dict, new: dict):
+    """
+    按语料规模逐项对比两次运行的延迟、QPS、召回率与内存
+    """
+    old_runs = {run['chunks']: run for run in old['runs']}
+    print(f"\n🔍 与 {old['meta'].get('git_commit') or '之前的结果'}（{old['meta'].get('timestamp')}）对比")
+    for run in new['runs']:
+        previous = old_runs.get(run['chunks'])
+        if previous is None:
+            print(f"   语料 {run['chunks']}：之前的结果中没有该规模")
+            continue
+        print(f"   语料 {run['chunks']}:")
+        before, after = flatten_metrics(previous), flatten_metrics(run)
+        for path, value in after.items():
+            leaf = path.rsplit('.', 1)[-1]
+            if path not in before or not leaf.startswith(COMPARED_SUFFIXES):
+                continue
+            change = f"{(value - before[path]) / before[path]:+.1%}" if before[path] else "n/a"
+            print(f"     {path:<52} {before[path]:>12} → {value:<12} ({change})")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def main(args):
+    from stub_llm_server import start_stub_server
+
+    # 只使用本地桩服务与进程内缓存，不读写 Supabase / 磁盘缓存（.env 中的同名配置不会覆盖这里的值）
+    os.environ['DEEPSEEK_API_KEY'] = 'stub'
+    os.environ['DEEPSEEK_API_BASE'] = start_stub_server(args.port, args.llm_ms, 5.0)
+    for name in ('SUPABASE_URL', 'SUPABASE_KEY', 'ANSWER_CACHE_DB', 'GUIDE_CACHE_DB'):
+        os.environ[name] = ''
+    if args.no_hybrid:
+        os.environ['HYBRID_RETRIEVAL'] = '0'
+
+    import index
+
+    guide_text = load_guide_file(args.guide)
+    real_chunks = split_text_into_chunks(guide_text)
+    questions = build_labelled_questions(guide_text, args.questions)
+
+    start = time.perf_counter()
+    index.load_model()
+    model_seconds = time.perf_counter() - start
+    index.start_batch_encoder()
+    real_vectors = normalize_rows(np.asarray(index.model.encode(real_chunks, batch_size=32), dtype=np.float32))
+
+    sizes = [int(size) for size in args.chunks.split(',') if size]
+    print("=" * 96)
+    print(f"📊 离线评测：{len(real_chunks)} 个真实段落，{len(questions)} 个标注问题，语料规模 {sizes}")
+    print("=" * 96)
+
+    workdir = tempfile.mkdtemp(prefix='bench_suite_', dir=args.workdir)
+    runs = []
+    try:
+        for size in sizes:
+            runs.append(await run_size(index, workdir, size, real_chunks, real_vectors, questions, args))
+            index.snapshot = None
+            for path in os.listdir(workdir):
+                os.remove(os.path.join(workdir, path))
+    finally:
+        await index.shutdown_event()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'embedding_backend': os.getenv('EMBEDDING_BACKEND') or 'torch',
+            'retriever_backend': os.getenv('RETRIEVER_BACKEND', 'exact'),
+            'model_load_seconds': round(model_seconds, 2),
+            'args': vars(args),
+        },
+        'runs': runs,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"suite-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print("\n" + "=" * 96)
+    print(f"💾 结果已保存: {output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare_results(json.load(f), results)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='检索 / 游戏名称提取 / /ask 离线评测')
+    parser.add_argument('--chunks', type=str, default='1000,10000,100000',
+                        help='语料规模列表，逗号分隔 (默认: 1000,10000,100000，最大可到 1000000)')
+    parser.add_argument('--questions', type=int, default=200, help='最多使用的标注问题数 (默认: 200)')
+    parser.add_argument('--top-k', type=int, default=3, help='检索返回的段落数 (默认: 3)')
+    parser.add_argument('--concurrency', type=int, default=16, help='/ask 并发请求数 (默认: 16)')
+    parser.add_argument('--chunks-per-game', type=int, default=200, help='每个合成游戏的段落数 (默认: 200)')
+    parser.add_argument('--noise', type=float, default=1.0,
+                        help='干扰向量的噪声强度，1.0 时与原向量余弦约 0.7 (默认: 1.0)')
+    parser.add_argument('--no-hybrid', action='store_true', help='不构建 BM25 索引（只用向量检索）')
+    parser.add_argument('--guide', type=str, default='guide.txt', help='攻略文件 (默认: guide.txt)')
+    parser.add_argument('--llm-ms', type=float, default=0.0, help='LLM 桩服务的回答延迟，毫秒 (默认: 0)')
+    parser.add_argument('--port', type=int, default=8766, help='LLM 桩服务端口 (默认: 8766)')
+    parser.add_argument('--workdir', type=str, default=None, help='临时语料目录的父目录 (默认: 系统临时目录)')
+    parser.add_argument('--output', type=str, default=None,
+                        help=f'结果 JSON 路径 (默认: {RESULTS_DIR}/suite-<时间>.json)')
+    parser.add_argument('--compare', type=str, default=None, help='与之前保存的结果 JSON 对比')
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+"""
+句向量模型加载
+
+- sentence_transformers（以及它依赖的 torch）在第一次加载模型时才导入，服务进程的导入时间不包含它们
+- ModelLoader 在后台线程中加载模型：服务可以先开始监听，/health 报告加载状态
+- 可以从本地目录加载模型，也可以加载 ONNX 导出：
+  - onnx: sentence-transformers >= 3.2 的 backend='onnx'（需要安装 optimum[onnxruntime]）
+  - onnxruntime: onnx_encoder.py 导出的动态 int8 量化模型，运行时不需要 torch
+
+环境变量：
+- EMBEDDING_MODEL_PATH: 本地模型目录（默认按名称从 Hugging Face 缓存加载 paraphrase-multilingual-MiniLM-L12-v2；
+  onnxruntime 后端默认为 onnx_encoder.py 的导出目录 onnx_model）
+- EMBEDDING_BACKEND: torch（默认）、onnx 或 onnxruntime
+- EMBEDDING_ONNX_FILE: 使用的 ONNX 文件（相对模型目录，例如 onnx/model_qint8_avx2.onnx；onnxruntime 后端默认 model_int8.onnx）
+"""
+import os
+import threading
+import time
+from typing import Callable, Optional
+
+MODEL_NAME = 'paraphrase-multilingual-MiniLM-L12-v2'
+BACKENDS = ('torch', 'onnx', 'onnxruntime')
+
+
+def embedding_backend() -> str:
+    return os.getenv('EMBEDDING_BACKEND') or 'torch'
+
+
+def fork_safe(backend: Optional[str] = None) -> bool:
+    """
+    加载好的模型能否在 fork 出的子进程中继续使用（ONNX Runtime 的线程池不能跨 fork）
+    """
+    return (backend or embedding_backend()) == 'torch'
+
+
+def encoder_metadata(path: Optional[str] = None, backend: Optional[str] = None,
+                     onnx_file: Optional[str] = None) -> dict:
+    """
+    描述 load_embedding_model 将加载的编码器（参数含义相同），写入向量存储元数据
+    后端、模型目录或量化方式不同的编码器输出的向量不能混在同一个存储中，增量更新据此判断能否复用
+    """
+    backend = backend or embedding_backend()
+    onnx_file = onnx_file or os.getenv('EMBEDDING_ONNX_FILE')
+    if backend == 'onnxruntime':
+        from onnx_encoder import EXPORT_DIR, INT8_FILE
+        path = path or os.getenv('EMBEDDING_MODEL_PATH') or EXPORT_DIR
+        onnx_file = onnx_file or INT8_FILE
+    else:
+        path = path or os.getenv('EMBEDDING_MODEL_PATH') or MODEL_NAME
+    return {
+        'backend': backend,
+        'path': path,
+        'onnx_file': onnx_file if backend != 'torch' else None,
+        'quantization': 'int8' if backend != 'torch' and onnx_file and 'int8' in onnx_file.lower() else 'float32',
+    }
+
+
+def load_embedding_model(path: Optional[str] = None, backend: Optional[str] = None,
+                         onnx_file: Optional[str] = None):
+    """
+    加载句向量模型，参数未提供时读取对应的环境变量
+    返回的对象提供 encode(List[str], batch_size=..., ...) 方法
+    """
+    backend = backend or embedding_backend()
+    if backend not in BACKENDS:
+        raise ValueError(f"不支持的模型后端: {backend}（可选: {', '.join(BACKENDS)}）")
+    onnx_file = onnx_file or os.getenv('EMBEDDING_ONNX_FILE')
+
+    if backend == 'onnxruntime':
+        from onnx_encoder import OnnxEncoder, EXPORT_DIR
+        return OnnxEncoder(path or os.getenv('EMBEDDING_MODEL_PATH') or EXPORT_DIR, file_name=onnx_file)
+
+    path = path or os.getenv('EMBEDDING_MODEL_PATH') or MODEL_NAME
+    from sentence_transformers import SentenceTransformer
+
+    if backend == 'torch':
+        return SentenceTransformer(path)
+    return SentenceTransformer(path, backend='onnx', model_kwargs={'file_name': onnx_file} if onnx_file else None)
+
+
+class ModelLoader:
+    """
+    在后台线程中加载模型
+
+    状态：idle → loading → ready / failed
+
+    Args:
+        load: 加载并返回模型的函数
+    """
+
+    def __init__(self, load: Callable[[], object] = load_embedding_model):
+        self.load = load
+        self.state = 'idle'
+        self.model = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread is None:
+            self.state = 'loading'
+            self._thread = threading.Thread(target=self._run, name='model-loader', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.model = self.load()
+            self.state = 'ready'
+        except Exception as e:
+            self.error = str(e)
+            self.state = 'failed'
+            print(f"❌ 模型加载失败: {e}")
+        finally:
+            self.load_seconds = time.perf_counter() - start
+            self._done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待加载结束，加载成功时返回 True
+        """
+        return self._done.wait(timeout) and self.state == 'ready'
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'error': self.error,
+            'load_seconds': round(self.load_seconds, 2) if self.load_seconds is not None else None,
+        }
@@ -0,0 +1,117 @@
+"""
+微批量编码器：把并发请求的待编码文本合并成一批，在工作线程中一次调用 model.encode
+
+SentenceTransformer 对批量输入的吞吐远高于逐条编码；
+同时编码在线程池中执行，不会阻塞事件循环。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+
+
+class BatchEncoder:
+    """
+    收集所有进行中请求的文本，达到 max_batch_size 条或等待超过 max_wait_ms 时统一编码
+
+    Args:
+        model: 提供 encode(List[str]) 方法的模型
+        max_batch_size: 单批最多文本数
+        max_wait_ms: 收到第一条文本后最多等待多久再发出批次（毫秒）
+        executor: 执行编码的线程池，默认单线程（模型内部已多线程计算）
+    """
+
+    def __init__(self, model, max_batch_size: int = 32, max_wait_ms: float = 5.0,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.model = model
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix='encoder')
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._has_pending: Optional[asyncio.Event] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Semaphore] = None
+        self._worker: Optional[asyncio.Task] = None
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._has_pending = asyncio.Event()
+            self._batch_full = asyncio.Event()
+            self._idle = asyncio.Semaphore(1)
+            if self._pending:
+                self._has_pending.set()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """
+        编码单条文本，返回模型输出的原始向量
+        """
+        self._ensure_worker()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        self._has_pending.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+        return await future
+
+    async def encode_many(self, texts: List[str]) -> List[np.ndarray]:
+        return list(await asyncio.gather(*(self.encode(text) for text in texts)))
+
+    async def _run(self):
+        while True:
+            await self._has_pending.wait()
+            if len(self._pending) < self.max_batch_size and self.max_wait > 0:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+
+            # 上一批仍在编码时继续积累文本，编码线程空闲后再取出，使批次尽量大
+            await self._idle.acquire()
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if not batch:
+                self._idle.release()
+                self._has_pending.clear()
+                continue
+            if len(self._pending) < self.max_batch_size:
+                self._batch_full.clear()
+            if not self._pending:
+                self._has_pending.clear()
+
+            asyncio.get_running_loop().create_task(self._dispatch(batch))
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, batch_size=len(texts)), dtype=np.float32)
+
+    async def _dispatch(self, batch: List[Tuple[str, asyncio.Future]]):
+        # 同一批次内的重复文本只编码一次
+        unique_texts = list(dict.fromkeys(text for text, _ in batch))
+        try:
+            vectors = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._encode_batch, unique_texts
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._idle.release()
+
+        self.batches += 1
+        self.items += len(batch)
+        position = {text: i for i, text in enumerate(unique_texts)}
+        for text, future in batch:
+            if not future.done():
+                future.set_result(vectors[position[text]])
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'pending': len(self._pending),
+        }
@@ -0,0 +1,108 @@
+"""
+游戏目录：语料中所有已知游戏名称 + 预先计算好的名称向量
+
+问题中的游戏名按以下顺序解析到目录中的某个游戏：
+1. 精确匹配（归一化后相同）
+2. 包含关系（归一化后一方包含另一方）
+3. 模糊匹配（字符二元组 Dice 系数，经倒排索引只比较有公共二元组的候选）
+4. 向量相似度（与目录中所有名称向量一次矩阵-向量乘法）
+前三步不需要调用模型；只有字符串索引都未命中时才需要问题中游戏名的向量。
+"""
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+import numpy as np
+
+
+class GameMatch(NamedTuple):
+    title: str      # 目录中的游戏名称（与 chunk_game_names 中一致）
+    score: float    # 精确/包含为 1.0，模糊为 Dice 系数，向量为余弦相似度
+    method: str     # exact / contains / fuzzy / embedding
+
+
+def _bigrams(text: str) -> Set[str]:
+    if len(text) < 2:
+        return {text} if text else set()
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class GameCatalog:
+    """
+    Args:
+        titles: 游戏名称（去重，保留首次出现的顺序）
+        vectors: 与 titles 一一对应的 L2 归一化名称向量，None 表示只使用字符串索引
+        key_func: 游戏名归一化函数（与 game_index 使用同一个）
+        fuzzy_threshold: 模糊匹配的最低 Dice 系数
+    """
+
+    def __init__(self, titles: Iterable[str], vectors: Optional[np.ndarray] = None,
+                 key_func: Callable[[str], str] = str.lower, fuzzy_threshold: float = 0.6):
+        self.titles: List[str] = list(dict.fromkeys(title for title in titles if title))
+        self.key_func = key_func
+        self.fuzzy_threshold = fuzzy_threshold
+        self.keys = [key_func(title) for title in self.titles]
+        self.exact: Dict[str, int] = {}
+        for i, key in enumerate(self.keys):
+            self.exact.setdefault(key, i)
+
+        self.key_bigrams = [_bigrams(key) for key in self.keys]
+        self.bigram_index: Dict[str, List[int]] = {}
+        for i, grams in enumerate(self.key_bigrams):
+            for gram in grams:
+                self.bigram_index.setdefault(gram, []).append(i)
+
+        if vectors is not None:
+            vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+            if vectors.shape[0] != len(self.titles):
+                raise ValueError(f"名称向量数量 {vectors.shape[0]} 与游戏数量 {len(self.titles)} 不一致")
+        self.vectors = vectors
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    @property
+    def has_vectors(self) -> bool:
+        return self.vectors is not None and len(self.titles) > 0
+
+    def lookup(self, name: Optional[str]) -> Optional[GameMatch]:
+        """
+        只用字符串索引解析游戏名（精确 → 包含 → 模糊），未命中返回 None
+        """
+        key = self.key_func(name or '')
+        if not key:
+            return None
+        i = self.exact.get(key)
+        if i is not None:
+            return GameMatch(self.titles[i], 1.0, 'exact')
+
+        grams = _bigrams(key)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for i in self.bigram_index.get(gram, ()):
+                shared[i] = shared.get(i, 0) + 1
+        if not shared:
+            return None
+
+        def dice(i: int) -> float:
+            return 2.0 * shared[i] / (len(grams) + len(self.key_bigrams[i]))
+
+        # 包含关系：被包含的一方的二元组必然全部是公共二元组，因此只需检查候选
+        if len(key) >= 2:
+            contained = [i for i in shared if key in self.keys[i] or (len(self.keys[i]) >= 2 and self.keys[i] in key)]
+            if contained:
+                best = max(contained, key=dice)
+                return GameMatch(self.titles[best], 1.0, 'contains')
+
+        best = max(shared, key=dice)
+        score = dice(best)
+        if score >= self.fuzzy_threshold:
+            return GameMatch(self.titles[best], score, 'fuzzy')
+        return None
+
+    def nearest(self, name_vector: np.ndarray) -> Optional[GameMatch]:
+        """
+        名称向量与目录中所有名称向量的余弦相似度（一次矩阵-向量乘法），返回最相似的游戏
+        """
+        if not self.has_vectors:
+            return None
+        scores = self.vectors @ np.asarray(name_vector, dtype=np.float32)
+        best = int(np.argmax(scores))
+        return GameMatch(self.titles[best], float(scores[best]), 'embedding')
@@ -0,0 +1,224 @@
+"""
+游戏名称提取器：预编译正则 + 关键词字典树，一次扫描问题即可得到所有关键词出现位置
+
+规则与原 extract_game_name 完全一致（见 golden_game_names.json 黄金用例），
+区别在于：关键词的所有出现位置只在字典树正则中扫描一次，之后各步骤只做区间判断，
+不再对每个候选串反复执行 `keyword in text` / `text.find(keyword)`。
+"""
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from cache import LRUCache
+
+# 疑问词和关键词列表（顺序即匹配优先级）
+QUESTION_KEYWORDS = [
+    '有没有', '是什么', '怎么', '如何', '怎样', '能否', '可否', '是否',
+    '攻略', '怎么玩', '怎么打', '怎么过', '打法', '技巧', '阵容', '配装',
+    '流程', '任务', '通关', 'boss', 'BOSS', '英雄', '角色', '难度', '段位', '思路',
+    '秘籍', '作弊码', '代码', '指令', '命令'
+]
+
+# 常见模式：<<游戏名称>>、《游戏名称》、游戏名称攻略、关于游戏名称
+NAME_PATTERNS = [
+    re.compile(r'<<([^>>]+)>>'),
+    re.compile(r'《([^》]+)》'),
+    re.compile(r'([^，。！？\s]+)(?:的)?攻略'),
+    re.compile(r'关于([^，。！？\s]+)'),
+]
+
+# 开头的噪音词（不带 ^，配合 pattern.match(text, pos, endpos) 锚定在任意子串开头）
+LEADING_NOISE = re.compile(r'(关于|请问|求|想了解|帮我看看|问下|听说|求助|大神|各位|大家|请教)\s*')
+SHORT_NAME_FORBIDDEN = re.compile(r'[？?！!。，,；;：:\n]')
+HAS_WORD_CHAR = re.compile(r'[\u4e00-\u9fa5A-Za-z0-9]')
+SEGMENT_SEPARATOR = re.compile(r'[。！？?!；;，,]')
+FALLBACK_CANDIDATE = re.compile(r'([\u4e00-\u9fa5A-Za-z0-9][\u4e00-\u9fa5A-Za-z0-9\s]{1,20})')
+
+CANDIDATE_STRIP = '《》"「」『』，。！？?!；;：: '
+QUOTE_STRIP = '《》"「」『』'
+SEGMENT_STRIP = '《》"「」『』 '
+
+
+class KeywordTrie:
+    """
+    多模式串匹配：把所有模式串组织成字典树，再编译成一个正则（公共前缀只比较一次）
+
+    正则在每个位置用前瞻匹配以该位置开头的最长模式串，其余以同一位置开头的模式串
+    必然是它的前缀，查表即可得到，因此能返回所有（可重叠的）出现位置，扫描在正则引擎中完成。
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns = list(patterns)
+        trie: Dict[str, dict] = {}
+        for pattern in self.patterns:
+            if not pattern:
+                continue
+            node = trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        # 最长匹配串 -> 以同一位置开头的所有模式编号（即它的所有前缀中属于模式串的那些）
+        ids = {}
+        for pattern_id, pattern in enumerate(self.patterns):
+            ids.setdefault(pattern, pattern_id)
+        self._prefix_ids: Dict[str, Tuple[int, ...]] = {
+            pattern: tuple(ids[pattern[:size]] for size in range(1, len(pattern) + 1) if pattern[:size] in ids)
+            for pattern in ids if pattern
+        }
+        self._regex = re.compile(f'(?=({self._to_regex(trie)}))') if trie else None
+
+    @classmethod
+    def _to_regex(cls, node: dict) -> str:
+        branches = [re.escape(char) + cls._to_regex(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # 当前节点本身是某个模式串的结尾：后续分支可选（贪婪，优先更长的模式串）
+        return f'(?:{body})?' if '' in node else body
+
+    def find_all(self, text: str) -> List[Tuple[int, int]]:
+        """
+        返回 [(起始位置, 模式编号)]，按起始位置排列
+        """
+        if self._regex is None:
+            return []
+        prefix_ids = self._prefix_ids
+        return [
+            (match.start(), pattern_id)
+            for match in self._regex.finditer(text)
+            for pattern_id in prefix_ids[match.group(1)]
+        ]
+
+
+def _strip_span(text: str, start: int, end: int, chars: Optional[str] = None) -> Tuple[int, int]:
+    """
+    等价于 text[start:end].strip(chars)，但返回的是原串中的区间
+    """
+    piece = text[start:end]
+    stripped = piece.lstrip(chars)
+    start += len(piece) - len(stripped)
+    end -= len(stripped) - len(stripped.rstrip(chars))
+    return start, end
+
+
+class _KeywordHits:
+    """
+    单个问题中所有关键词的出现位置；子串中的 `keyword in s` / `s.find(keyword)` 变为区间查询
+    """
+
+    __slots__ = ('present', 'starts', 'spans')
+
+    def __init__(self, matches: List[Tuple[int, int]], lengths: List[int]):
+        self.starts: Dict[int, List[int]] = {}
+        self.spans: List[Tuple[int, int]] = []
+        for start, keyword_id in matches:
+            self.starts.setdefault(keyword_id, []).append(start)
+            self.spans.append((start, start + lengths[keyword_id]))
+        # 出现过的关键词，按优先级排列；没出现的关键词在任何子串中都找不到，无需逐个检查
+        self.present = sorted(self.starts)
+
+    def find(self, keyword_id: int, length: int, start: int, end: int) -> int:
+        for position in self.starts[keyword_id]:
+            if position >= start and position + length <= end:
+                return position
+        return -1
+
+    def any_within(self, start: int, end: int) -> bool:
+        for span_start, span_end in self.spans:
+            if span_start >= start and span_end <= end:
+                return True
+        return False
+
+
+class GameNameExtractor:
+    """
+    启动时构建一次，之后对每个问题只扫描一次
+    提取结果与已加载的语料无关（已知游戏名的匹配由 GameCatalog 负责），整个服务共用一个实例
+
+    Args:
+        cache_size: 提取结果缓存条目数（同一请求中多次调用只计算一次）
+    """
+
+    def __init__(self, cache_size: int = 4096):
+        self.keywords = list(QUESTION_KEYWORDS)
+        self.keyword_lengths = [len(keyword) for keyword in self.keywords]
+        self.automaton = KeywordTrie(self.keywords)
+        self._cache = LRUCache(maxsize=cache_size)
+
+    def extract(self, question: str) -> Optional[str]:
+        cached = self._cache.get(question)
+        if cached is not None:
+            return cached or None
+        result = self._extract(question)
+        self._cache.set(question, result or '')
+        return result
+
+    def _extract(self, question: str) -> Optional[str]:
+        for pattern in NAME_PATTERNS:
+            match = pattern.search(question)
+            if match:
+                game_name = match.group(1).strip()
+                if len(game_name) > 1:  # 至少2个字符
+                    return game_name
+
+        lengths = self.keyword_lengths
+        hits = _KeywordHits(self.automaton.find_all(question), lengths)
+        keyword_ids = hits.present
+
+        # 提取在疑问词/关键词前出现的游戏名（移除开头的噪音词后）
+        clean_start, clean_end = _strip_span(question, 0, len(question))
+        noise = LEADING_NOISE.match(question, clean_start, clean_end)
+        if noise:
+            clean_start = noise.end()
+        for keyword_id in keyword_ids:
+            keyword_pos = hits.find(keyword_id, lengths[keyword_id], clean_start, clean_end)
+            if keyword_pos > clean_start:
+                start, end = _strip_span(question, clean_start, keyword_pos)
+                start, end = _strip_span(question, start, end, CANDIDATE_STRIP)
+                if 2 <= end - start <= 30 and not hits.any_within(start, end):
+                    return question[start:end]
+
+        # 二次启发式：如果整句较短且不含明显动作词/疑问词，直接视为游戏名
+        start, end = _strip_span(question, 0, len(question))
+        start, end = _strip_span(question, start, end, QUOTE_STRIP)
+        condensed = question[start:end]
+        if (
+            1 < len(condensed) <= 20
+            and not SHORT_NAME_FORBIDDEN.search(condensed)
+            and HAS_WORD_CHAR.search(condensed)
+            and not hits.any_within(start, end)
+        ):
+            return condensed
+
+        # 分句后尝试提取在关键词前出现的游戏名
+        segment_start = 0
+        for separator in [*SEGMENT_SEPARATOR.finditer(question), None]:
+            segment_end = separator.start() if separator else len(question)
+            seg_start, seg_end = _strip_span(question, segment_start, segment_end)
+            segment_start = separator.end() if separator else segment_end
+            if seg_start == seg_end:
+                continue
+            for keyword_id in keyword_ids:
+                keyword_pos = hits.find(keyword_id, lengths[keyword_id], seg_start, seg_end)
+                if keyword_pos < 0:
+                    continue
+                start = seg_start
+                noise = LEADING_NOISE.match(question, start, keyword_pos)
+                if noise:
+                    start = noise.end()
+                start, end = _strip_span(question, start, keyword_pos, SEGMENT_STRIP)
+                if end - start >= 2:
+                    return question[start:end]
+
+        # 兜底：尝试抓取连续的中文/字母词组作为候选（但排除包含疑问词的情况）
+        fallback_match = FALLBACK_CANDIDATE.search(question)
+        if fallback_match:
+            start, end = _strip_span(question, fallback_match.start(), fallback_match.end())
+            for keyword_id in keyword_ids:
+                keyword_pos = hits.find(keyword_id, lengths[keyword_id], start, end)
+                if keyword_pos > start:
+                    start, end = _strip_span(question, start, keyword_pos)
+                    break
+            if end - start >= 2 and not hits.any_within(start, end):
+                return question[start:end]
+
+        return None
@@ -0,0 +1,243 @@
+"""
+游戏攻略读穿透缓存：本地副本（内存 LRU + 可选 SQLite）→ Supabase game_guides → LLM 生成
+
+- 已有攻略的游戏直接返回已保存的内容，不再重复生成
+- 写入为一次 upsert（按 game_name 冲突更新）
+- 单飞（single-flight）：同一新游戏的并发请求只触发一次生成，其余请求等待同一结果
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from cache import LRUCache
+
+logger = logging.getLogger("rag")
+
+
+class GuideStore:
+    """
+    Args:
+        client_provider: 返回 Supabase 客户端（或 None 表示未配置）的函数
+        key_func: 游戏名归一化函数，本地缓存与单飞都以归一化后的名称为 key
+        maxsize: 内存层最多缓存的攻略数
+        ttl: 本地副本过期时间（秒），None 表示永不过期
+        db_path: 本地 SQLite 副本路径，None 表示不启用
+        on_remote_call: 每次 Supabase 请求结束后调用 (操作名 read / write, 耗时秒数)，用于记录延迟指标
+    """
+
+    def __init__(self, client_provider: Callable[[], object], key_func: Callable[[str], str] = str.strip,
+                 maxsize: int = 512, ttl: Optional[float] = None, db_path: Optional[str] = None,
+                 on_remote_call: Optional[Callable[[str, float], None]] = None):
+        self.client_provider = client_provider
+        self.on_remote_call = on_remote_call
+        self.key_func = key_func
+        self.ttl = ttl if ttl and ttl > 0 else None
+        self.memory = LRUCache(maxsize=maxsize, ttl=self.ttl)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.generations = 0
+        self.coalesced = 0
+        self.db_path = db_path
+        if db_path:
+            self._open_db()
+            # fork 出的工作进程各自重新连接（见 AnswerCache）
+            if hasattr(os, 'register_at_fork'):
+                os.register_at_fork(after_in_child=self._open_db)
+
+    def _open_db(self):
+        self._db = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._db_lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS game_guides ("
+            "key TEXT PRIMARY KEY, game_name TEXT NOT NULL, guide_content TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    # ---- 本地副本 ----
+
+    def _get_local(self, key: str) -> Optional[str]:
+        content = self.memory.get(key)
+        if content is not None or self._db is None:
+            return content
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT guide_content, updated_at FROM game_guides WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        content, updated_at = row
+        if self.ttl and updated_at + self.ttl <= time.time():
+            return None
+        self.memory.set(key, content)
+        return content
+
+    def _set_local(self, key: str, game_name: str, content: str):
+        self.memory.set(key, content)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO game_guides (key, game_name, guide_content, updated_at) VALUES (?, ?, ?, ?)",
+                    (key, game_name, content, time.time())
+                )
+                self._db.commit()
+
+    # ---- Supabase ----
+
+    def fetch_remote(self, game_name: str) -> Optional[str]:
+        """
+        从 Supabase 读取已保存的攻略（同步调用）
+        """
+        client = self.client_provider()
+        if client is None:
+            return None
+        start = time.perf_counter()
+        try:
+            result = client.table('game_guides').select('guide_content').eq('game_name', game_name).limit(1).execute()
+        except Exception as e:
+            logger.warning(f"⚠️  从 Supabase 读取攻略时出错: {e}")
+            return None
+        finally:
+            self._record_remote_call('read', start)
+        if result.data:
+            return result.data[0].get('guide_content')
+        return None
+
+    def upsert_remote(self, game_name: str, content: str, question: str) -> bool:
+        """
+        以一次 upsert 保存攻略到 Supabase（同步调用）
+        created_at 只在首次插入时由数据库默认值生成
+        """
+        client = self.client_provider()
+        if client is None:
+            logger.debug("⚠️  Supabase 未初始化，无法保存攻略")
+            return False
+        data = {
+            'game_name': game_name,
+            'guide_content': content,
+            'question': question,
+            'updated_at': datetime.now().isoformat()
+        }
+        start = time.perf_counter()
+        try:
+            client.table('game_guides').upsert(data, on_conflict='game_name').execute()
+        except Exception as e:
+            logger.warning(f"❌ 保存攻略到 Supabase 时出错: {e}")
+            return False
+        finally:
+            self._record_remote_call('write', start)
+        logger.debug(f"✅ 已保存游戏《{game_name}》的攻略到 Supabase")
+        return True
+
+    def _record_remote_call(self, operation: str, start: float):
+        if self.on_remote_call is not None:
+            self.on_remote_call(operation, time.perf_counter() - start)
+
+    # ---- 读穿透 / 写入 ----
+
+    async def get(self, game_name: str) -> Optional[str]:
+        """
+        依次查询本地副本与 Supabase，命中 Supabase 时写回本地副本
+        """
+        key = self.key_func(game_name)
+        content = self._get_local(key)
+        if content is not None:
+            self.local_hits += 1
+            return content
+        content = await asyncio.to_thread(self.fetch_remote, game_name)
+        if content is not None:
+            self.remote_hits += 1
+            self._set_local(key, game_name, content)
+            return content
+        self.misses += 1
+        return None
+
+    async def put(self, game_name: str, content: str, question: str) -> bool:
+        self._set_local(self.key_func(game_name), game_name, content)
+        return await asyncio.to_thread(self.upsert_remote, game_name, content, question)
+
+    # ---- 单飞 ----
+
+    def join_flight(self, game_name: str) -> Optional[asyncio.Future]:
+        """
+        若该游戏已有进行中的生成，返回其 Future（等待即可得到结果）；
+        否则登记当前调用方为生成者并返回 None，生成结束后必须调用 finish_flight
+        """
+        key = self.key_func(game_name)
+        future = self._inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return future
+        self._inflight[key] = asyncio.get_running_loop().create_future()
+        self.generations += 1
+        return None
+
+    async def finish_flight(self, game_name: str, content: str, ok: bool, question: str) -> bool:
+        """
+        结束生成：成功时保存攻略，并把结果交给所有等待者；失败的内容不保存
+        返回是否成功保存到 Supabase
+        """
+        key = self.key_func(game_name)
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(content)
+        if not ok:
+            return False
+        return await self.put(game_name, content, question)
+
+    def fail_flight(self, game_name: str, error: BaseException):
+        """
+        生成过程抛出异常时调用：把异常交给所有等待者
+        """
+        future = self._inflight.pop(self.key_func(game_name), None)
+        if future is not None and not future.done():
+            future.set_exception(error)
+            # 没有等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+
+    async def get_or_create(self, game_name: str, question: str,
+                            create: Callable[[], Awaitable[Tuple[str, bool]]]) -> Tuple[str, str]:
+        """
+        读穿透获取攻略，未命中时调用 create 生成（并发请求只生成一次）
+        create 返回 (内容, 是否成功)；失败的内容会返回给调用方但不会保存
+        返回: (攻略内容, 来源) 来源为 cache / coalesced / generated
+        """
+        content = await self.get(game_name)
+        if content is not None:
+            return content, 'cache'
+
+        flight = self.join_flight(game_name)
+        if flight is not None:
+            return await asyncio.shield(flight), 'coalesced'
+
+        # 成为生成者后再查一次本地副本：上一轮生成可能刚刚完成
+        content = self._get_local(self.key_func(game_name))
+        if content is not None:
+            await self.finish_flight(game_name, content, False, question)
+            return content, 'cache'
+
+        try:
+            content, ok = await create()
+        except BaseException as e:
+            self.fail_flight(game_name, e)
+            raise
+        await self.finish_flight(game_name, content, ok, question)
+        return content, 'generated'
+
+    def stats(self) -> dict:
+        return {
+            'local_hits': self.local_hits,
+            'remote_hits': self.remote_hits,
+            'misses': self.misses,
+            'generations': self.generations,
+            'coalesced': self.coalesced,
+            'inflight': len(self._inflight),
+            'local_enabled': self._db is not None,
+        }
@@ -2,18 +2,36 @@
 FastAPI 应用：实现 RAG 问答系统
 """
 import os
-import json
 import re
+import json
+import time
+import logging
+import asyncio
+import unicodedata
 import numpy as np
-from typing import List, Optional, Tuple
-from fastapi import FastAPI, HTTPException
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, NamedTuple, Optional, Tuple, Union
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from sentence_transformers import SentenceTransformer
-import openai
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from datetime import datetime
+from vector_store import load_vector_store, ensure_normalized, load_rerank_vectors
+from retriever import create_retriever
+from lexical_index import BM25Index, reciprocal_rank_fusion
+from cache import LRUCache
+from encoder import BatchEncoder
+from llm_client import get_llm_client, close_llm_client
+from answer_cache import AnswerCache
+from guide_store import GuideStore
+from game_extractor import GameNameExtractor
+from game_catalog import GameCatalog, GameMatch
+from store_snapshot import VectorSnapshot, StoreWatcher
+from request_timing import StageTimer
+from embedding_model import ModelLoader, load_embedding_model
+from metrics import MetricsRegistry
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 # 加载环境变量（优先加载 .env.local，然后加载 .env）
 load_dotenv('.env.local')  # 先加载 .env.local（如果存在）
@@ -21,6 +39,28 @@ load_dotenv()  # 再加载 .env（.env 中的值会覆盖 .env.local）
 
 app = FastAPI(title="RAG 问答系统")
 
+# 请求处理过程中的日志（检索细节、发送给 LLM 的上下文、回答全文）为 DEBUG 级别，默认不输出
+# LOG_LEVEL=DEBUG 时输出，便于排查；启动与加载信息仍直接打印
+logger = logging.getLogger("rag")
+if not logger.handlers:
+    _log_handler = logging.StreamHandler()
+    _log_handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_log_handler)
+    logger.propagate = False
+logger.setLevel(os.getenv('LOG_LEVEL', 'INFO').upper())
+
+# Prometheus 指标（/metrics）：各阶段耗时与请求总耗时的直方图
+metrics_registry = MetricsRegistry()
+STAGE_SECONDS = metrics_registry.histogram(
+    "rag_stage_duration_seconds", "Duration of each request stage in seconds", ["stage"]
+)
+REQUEST_SECONDS = metrics_registry.histogram(
+    "rag_request_duration_seconds", "End-to-end request duration in seconds", ["endpoint", "source"]
+)
+REQUESTS_TOTAL = metrics_registry.counter(
+    "rag_requests_total", "Number of handled requests", ["endpoint", "source"]
+)
+
 # 配置 CORS，允许前端访问
 app.add_middleware(
     CORSMiddleware,
@@ -32,16 +72,61 @@ app.add_middleware(
 
 # 全局变量
 model = None
-chunks = None
-embeddings = None
-chunk_game_names: Optional[List[Optional[str]]] = None  # 每个 chunk 所属的游戏名称
-supabase: Optional[Client] = None
+model_loader: Optional[ModelLoader] = None  # FAST_START=1 时在后台线程中加载模型
+model_load_task: Optional[asyncio.Task] = None
+batch_encoder: Optional[BatchEncoder] = None  # 合并并发请求的微批量编码器
+# 当前向量存储快照：chunks / 向量 / 每个 chunk 的游戏名 / 游戏索引 / 检索后端 / 游戏目录
+# 热更新时整体替换这一个引用；每个请求开始时取一次快照并全程使用
+snapshot: Optional[VectorSnapshot] = None
+game_extractor = GameNameExtractor()  # 游戏名称提取器（预编译正则 + 关键词字典树，带结果缓存）
+store_watcher: Optional[StoreWatcher] = None  # 向量存储文件监视（VECTOR_WATCH_INTERVAL > 0 时启用）
+reload_lock = asyncio.Lock()  # 同一时间只进行一次热更新
+
+# 文本向量缓存：key 为归一化后的文本，热门问题与游戏名无需重复调用模型
+embedding_cache = LRUCache(
+    maxsize=int(os.getenv('EMBEDDING_CACHE_SIZE', '2048')),
+    ttl=float(os.getenv('EMBEDDING_CACHE_TTL', '3600'))
+)
+supabase: Optional["Client"] = None
+supabase_config_warned = False  # 缺少 Supabase 配置的警告只输出一次
 current_game_name: Optional[str] = None  # 当前攻略的游戏名称
 
+# RAG 相似度阈值
+SIMILARITY_THRESHOLD = 0.7
+# 游戏名称向量相似度阈值：0.6 以上认为是同一游戏
+GAME_MATCH_THRESHOLD = 0.6
+# 混合检索：BM25 分数不低于最高分该比例的段落，即使余弦相似度较低也会保留（秘籍代码、指令等精确词语）
+LEXICAL_SCORE_RATIO = 0.5
+# 批量问答（/ask/batch）：单次请求最多的问题数，以及同时进行的 LLM 调用数
+BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', '5000'))
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '8'))
+# 编码批大小：微批量编码器每批最多的文本数，构建游戏目录时也按此分批编码
+ENCODER_BATCH_SIZE = int(os.getenv('ENCODER_BATCH_SIZE', '32'))
+
+# LLM 回答缓存：key 为 归一化问题 + 所选段落哈希，向量存储重建后自动失效
+answer_cache = AnswerCache(
+    maxsize=int(os.getenv('ANSWER_CACHE_SIZE', '1024')),
+    ttl=float(os.getenv('ANSWER_CACHE_TTL', '86400')),
+    db_path=os.getenv('ANSWER_CACHE_DB') or None
+)
+
+# 游戏攻略读穿透缓存：本地副本 → Supabase → LLM 生成（同一游戏并发请求只生成一次）
+guide_store = GuideStore(
+    client_provider=lambda: init_supabase(),
+    key_func=lambda name: normalize_game_title(name),
+    maxsize=int(os.getenv('GUIDE_CACHE_SIZE', '512')),
+    ttl=float(os.getenv('GUIDE_CACHE_TTL', '0')),
+    db_path=os.getenv('GUIDE_CACHE_DB') or None,
+    on_remote_call=lambda operation, seconds: STAGE_SECONDS.observe(seconds, stage=f"supabase_{operation}")
+)
+
 class QuestionRequest(BaseModel):
     question: str
     top_k: Optional[int] = 3  # 返回最相似的段落数量
 
+class BatchQuestionRequest(BaseModel):
+    questions: List[QuestionRequest]
+
 class QuestionResponse(BaseModel):
     answer: str
     relevant_chunks: List[str]
@@ -109,27 +194,61 @@ def load_game_sequence_from_guide(guide_file: str = 'guide.txt') -> list:
     
     return game_sequence
 
-def load_vectors(vector_file: str = 'guide_vectors.json'):
+def build_game_index(game_names: List[Optional[str]]) -> Dict[str, Union[slice, np.ndarray]]:
     """
-    加载预生成的向量，并为每个 chunk 标记所属游戏
-    规则：<<游戏名>> 标识符后面的所有内容都属于该游戏，直到遇到下一个 <<游戏名>>
+    构建 归一化游戏名 -> 行范围 的索引
+    <<游戏名>> 之后的 chunks 在存储中是连续的，因此通常得到 slice（检索时直接切片，不复制）；
+    同一游戏分散在多个位置时退化为预先计算好的行号数组
     """
-    global chunks, embeddings, chunk_game_names
-    
-    # 获取脚本所在目录
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    vector_path = os.path.join(script_dir, vector_file)
-    
-    if not os.path.exists(vector_path):
-        raise FileNotFoundError(
-            f"向量文件 {vector_path} 不存在。请先运行 vectorize_guide.py 生成向量。"
-        )
+    rows: Dict[str, List[int]] = {}
+    for i, game_name in enumerate(game_names):
+        if game_name:
+            rows.setdefault(normalize_game_title(game_name), []).append(i)
     
-    with open(vector_path, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    index: Dict[str, Union[slice, np.ndarray]] = {}
+    for normalized_name, positions in rows.items():
+        start, end = positions[0], positions[-1] + 1
+        if end - start == len(positions):
+            index[normalized_name] = slice(start, end)
+        else:
+            print(f"⚠️  游戏《{normalized_name}》的段落在向量存储中不连续（攻略中出现了多个同名 <<游戏名>> 段），"
+                  f"检索时需复制这些行；可在攻略中把同一游戏的内容合并到一个 <<游戏名>> 段后重新运行 vectorize_guide.py")
+            index[normalized_name] = np.asarray(positions, dtype=np.int64)
+    return index
+
+def build_game_catalog(game_names: List[Optional[str]]) -> GameCatalog:
+    """
+    构建游戏目录：所有已知游戏名称按 ENCODER_BATCH_SIZE 分批编码为归一化向量（同时写入文本向量缓存）
+    模型未加载时只构建字符串索引
+    """
+    titles = list(dict.fromkeys(name for name in game_names if name))
+    vectors = None
+    if model is not None and titles:
+        keys = [normalize_query_text(title) for title in titles]
+        raw_vectors = model.encode(keys, batch_size=ENCODER_BATCH_SIZE)
+        vectors = np.stack([_cache_query_vector(key, vector) for key, vector in zip(keys, raw_vectors)])
+    return GameCatalog(titles, vectors, key_func=normalize_game_title)
+
+def build_snapshot(vector_file: str = 'guide_vectors.npy') -> VectorSnapshot:
+    """
+    加载预生成的向量，并为每个 chunk 标记所属游戏，构建检索所需的全部索引
+    规则：<<游戏名>> 标识符后面的所有内容都属于该游戏，直到遇到下一个 <<游戏名>>
+    向量矩阵以内存映射方式加载（见 vector_store.py），不存在时回退到旧版 JSON
+    加载后的向量均已 L2 归一化，检索时只需一次点积即可得到余弦相似度
+    float16 / int8 存储直接在低精度矩阵上打分；附带 float32 向量时对候选精确重排
+    不修改任何全局状态，可以在后台线程中执行
+    """
+    chunks, raw_embeddings, meta = load_vector_store(vector_file)
+    embeddings = ensure_normalized(raw_embeddings, meta)
+    retriever = create_retriever(embeddings, vector_file, rerank_vectors=load_rerank_vectors(vector_file, meta),
+                                 store_id=meta['store_id'])
     
-    chunks = data['chunks']
-    embeddings = np.array(data['embeddings'])
+    # BM25 倒排索引（HYBRID_RETRIEVAL=0 时关闭混合检索）
+    lexical_index = None
+    if os.getenv('HYBRID_RETRIEVAL', '1') != '0':
+        start = time.perf_counter()
+        lexical_index = BM25Index(chunks)
+        print(f"✅ BM25 索引构建完成: {len(lexical_index.vocabulary)} 个词，耗时 {time.perf_counter() - start:.2f} 秒")
     
     # 为每个 chunk 识别所属游戏
     # 规则：如果 chunk 中包含 <<游戏名>>，则设置当前游戏为该游戏
@@ -149,6 +268,9 @@ def load_vectors(vector_file: str = 'guide_vectors.json'):
             # 这样可以确保 <<游戏名>> 后面的所有内容都属于该游戏
             chunk_game_names.append(current_game)
     
+    # 构建按游戏划分的行索引，检索时按游戏过滤只需一次字典查找
+    game_index = build_game_index(chunk_game_names)
+    
     # 统计游戏分布
     game_stats = {}
     for game_name in chunk_game_names:
@@ -162,12 +284,54 @@ def load_vectors(vector_file: str = 'guide_vectors.json'):
             print(f"  - {game}: {count} 个段落")
     else:
         print("⚠️  未检测到游戏名称标记，所有段落将视为通用内容")
+    
+    return VectorSnapshot(
+        chunks=chunks,
+        embeddings=embeddings,
+        chunk_game_names=chunk_game_names,
+        game_index=game_index,
+        retriever=retriever,
+        game_catalog=build_game_catalog(chunk_game_names),
+        vector_file=vector_file,
+        fingerprint=meta['fingerprint'],
+        loaded_at=time.time(),
+        lexical_index=lexical_index
+    )
+
+def install_snapshot(new_snapshot: VectorSnapshot):
+    """
+    切换到新快照（单次引用赋值）；进行中的请求继续使用它们开始时取到的旧快照
+    """
+    global snapshot
+    answer_cache.set_fingerprint(new_snapshot.fingerprint)
+    snapshot = new_snapshot
+
+def load_vectors(vector_file: str = 'guide_vectors.npy') -> VectorSnapshot:
+    """
+    同步加载向量存储并立即切换（启动时使用）
+    """
+    new_snapshot = build_snapshot(vector_file)
+    install_snapshot(new_snapshot)
+    return new_snapshot
+
+async def reload_vectors(vector_file: Optional[str] = None) -> VectorSnapshot:
+    """
+    在后台线程中构建新快照，构建完成后原子切换；构建失败时保留当前快照并抛出异常
+    """
+    async with reload_lock:
+        path = vector_file or (snapshot.vector_file if snapshot else os.getenv('VECTOR_FILE', 'guide_vectors.npy'))
+        print(f"🔄 正在热更新向量存储: {path}")
+        new_snapshot = await asyncio.to_thread(build_snapshot, path)
+        install_snapshot(new_snapshot)
+        print(f"✅ 向量存储已切换: {len(new_snapshot.chunks)} 个段落，指纹 {new_snapshot.fingerprint}")
+        return new_snapshot
 
 def init_supabase():
     """
     初始化 Supabase 客户端
+    每个 llm_generated 请求都会经 GuideStore 调用到这里，缺少配置时只在第一次输出警告
     """
-    global supabase
+    global supabase, supabase_config_warned
     if supabase is None:
         # 尝试多种环境变量名称（兼容不同的配置方式）
         supabase_url = (
@@ -181,102 +345,25 @@ def init_supabase():
         )
         
         if not supabase_url or not supabase_key:
-            print("⚠️  警告: Supabase 配置未找到，将无法保存攻略到数据库")
-            print("   请设置 SUPABASE_URL 和 SUPABASE_KEY 环境变量")
+            if not supabase_config_warned:
+                supabase_config_warned = True
+                logger.warning("⚠️  警告: Supabase 配置未找到，将无法保存攻略到数据库\n"
+                               "   请设置 SUPABASE_URL 和 SUPABASE_KEY 环境变量")
             return None
         
+        from supabase import create_client
         supabase = create_client(supabase_url, supabase_key)
-        print("✅ Supabase 客户端初始化完成")
+        logger.info("✅ Supabase 客户端初始化完成")
     
     return supabase
 
 def extract_game_name(question: str) -> Optional[str]:
     """
     从问题中提取游戏名称
-    尝试识别常见的游戏名称模式
-    """
-    # 常见模式：<<游戏名称>>、游戏名称攻略、关于游戏名称等
-    patterns = [
-        r'<<([^>>]+)>>',  # <<游戏名称>>
-        r'《([^》]+)》',    # 《游戏名称》
-        r'([^，。！？\s]+)(?:的)?攻略',  # 游戏名称攻略
-        r'关于([^，。！？\s]+)',  # 关于游戏名称
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, question)
-        if match:
-            game_name = match.group(1).strip()
-            if len(game_name) > 1:  # 至少2个字符
-                return game_name
-
-    # 提取在疑问词/关键词前出现的游戏名（优先处理）
-    # 疑问词和关键词列表
-    question_keywords = [
-        '有没有', '是什么', '怎么', '如何', '怎样', '能否', '可否', '是否',
-        '攻略', '怎么玩', '怎么打', '怎么过', '打法', '技巧', '阵容', '配装',
-        '流程', '任务', '通关', 'boss', 'BOSS', '英雄', '角色', '难度', '段位', '思路',
-        '秘籍', '作弊码', '代码', '指令', '命令'
-    ]
-    
-    # 移除开头的噪音词
-    leading_noise = r'^(关于|请问|求|想了解|帮我看看|问下|听说|求助|大神|各位|大家|请教)\s*'
-    cleaned_question = re.sub(leading_noise, '', question.strip())
-    
-    # 尝试匹配：游戏名 + 疑问词/关键词 + 其他内容
-    for keyword in question_keywords:
-        if keyword in cleaned_question:
-            # 找到关键词的位置
-            keyword_pos = cleaned_question.find(keyword)
-            if keyword_pos > 0:
-                # 提取关键词之前的部分作为游戏名候选
-                candidate = cleaned_question[:keyword_pos].strip()
-                # 清理候选名称（移除可能的标点符号）
-                candidate = candidate.strip('《》"「」『』，。！？?!；;：: ')
-                # 如果候选名称合理（长度在2-30之间，且不包含疑问词）
-                if 2 <= len(candidate) <= 30 and not any(qk in candidate for qk in question_keywords):
-                    return candidate
-    
-    # 二次启发式：如果整句较短且不含明显动作词/疑问词，直接视为游戏名
-    condensed = question.strip().strip('《》"「」『』')
-    # 检查是否包含疑问词或动作词
-    has_question_word = any(kw in condensed for kw in question_keywords)
-    if (
-        1 < len(condensed) <= 20
-        and not re.search(r'[？?！!。，,；;：:\n]', condensed)
-        and re.search(r'[\u4e00-\u9fa5A-Za-z0-9]', condensed)
-        and not has_question_word  # 不包含疑问词才视为游戏名
-    ):
-        return condensed
-
-    # 分句后尝试提取在关键词前出现的游戏名
-    segments = re.split(r'[。！？?!；;，,]', question)
-    for segment in segments:
-        seg = segment.strip()
-        if not seg:
-            continue
-        for keyword in question_keywords:
-            if keyword in seg:
-                candidate = seg.split(keyword)[0]
-                candidate = re.sub(leading_noise, '', candidate).strip('《》"「」『』 ')
-                if len(candidate) >= 2:
-                    return candidate
-
-    # 兜底：尝试抓取连续的中文/字母词组作为候选（但排除包含疑问词的情况）
-    fallback_match = re.search(r'([\u4e00-\u9fa5A-Za-z0-9][\u4e00-\u9fa5A-Za-z0-9\s]{1,20})', question)
-    if fallback_match:
-        candidate = fallback_match.group(0).strip()
-        # 检查候选是否包含疑问词，如果包含则尝试提取疑问词之前的部分
-        for keyword in question_keywords:
-            if keyword in candidate:
-                keyword_pos = candidate.find(keyword)
-                if keyword_pos > 0:
-                    candidate = candidate[:keyword_pos].strip()
-                    break
-        if len(candidate) >= 2 and not any(kw in candidate for kw in question_keywords):
-            return candidate
-
-    return None
+    规则见 game_extractor.py：提取器启动时构建一次（预编译正则 + 关键词字典树），
+    同一问题的结果会被缓存，plan_answer 与 check_game_match 先后调用只计算一次
+    """
+    return game_extractor.extract(question)
 
 def normalize_game_title(name: str) -> str:
     """
@@ -345,68 +432,67 @@ def get_current_game_name() -> Optional[str]:
     
     return None
 
-def check_game_match(question: str, rag_chunks: List[str]) -> bool:
+def match_game(game_name: Optional[str], snap: Optional[VectorSnapshot] = None) -> Optional[GameMatch]:
+    """
+    将游戏名解析到游戏目录中的某个游戏
+    先查字符串索引（精确/包含/模糊，无需模型），未命中时再用名称向量与整个目录比较
+    """
+    snap = snap or snapshot
+    game_catalog = snap.game_catalog if snap else None
+    if not game_name or not game_catalog:
+        return None
+    match = game_catalog.lookup(game_name)
+    if match is not None or model is None or not game_catalog.has_vectors:
+        return match
+    return game_catalog.nearest(encode_query(game_name))
+
+def check_game_match(question: str, rag_chunks: List[str], snap: Optional[VectorSnapshot] = None,
+                     game_match: Optional[GameMatch] = None) -> bool:
     """
     检查 RAG 内容是否适用于问题中的游戏
     返回 True 如果匹配，False 如果不匹配
+    game_match 为 plan_answer 已解析出的目录匹配结果，提供时不再重新匹配（也不会重新编码游戏名）
     """
+    snap = snap or snapshot
     # 提取问题中的游戏名称
     question_game = extract_game_name(question)
     
-    # 获取当前攻略的游戏名称
-    current_game = get_current_game_name()
-    
     # 如果问题中没有游戏名称，假设匹配
     if not question_game:
         return True
     
-    # 如果当前攻略没有游戏名称，假设不匹配
-    if not current_game:
-        return False
-    
-    # 检查游戏名称是否匹配（使用相似度判断）
-    if model:
+    # 语料中有已知游戏时，与整个游戏目录比较（多游戏语料也能路由到正确的游戏）
+    if snap and snap.game_catalog:
         try:
-            # 将游戏名称转换为向量并计算相似度
-            question_vec = model.encode([question_game])[0]
-            current_vec = model.encode([current_game])[0]
-            
-            similarity = np.dot(question_vec, current_vec) / (
-                np.linalg.norm(question_vec) * np.linalg.norm(current_vec)
-            )
-            
-            # 相似度阈值：0.6 以上认为匹配
-            is_match = similarity >= 0.6
+            match = game_match or match_game(question_game, snap)
+            is_match = match is not None and match.score >= GAME_MATCH_THRESHOLD
             
-            print(f"🎮 游戏匹配检测:")
-            print(f"   问题中的游戏: {question_game}")
-            print(f"   当前攻略游戏: {current_game}")
-            print(f"   相似度: {similarity:.4f}")
-            print(f"   匹配结果: {'✅ 匹配' if is_match else '❌ 不匹配'}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("🎮 游戏匹配检测:")
+                logger.debug(f"   问题中的游戏: {question_game}")
+                if match is not None:
+                    logger.debug(f"   最接近的攻略游戏: {match.title}（{match.method}，相似度 {match.score:.4f}）")
+                logger.debug(f"   匹配结果: {'✅ 匹配' if is_match else '❌ 不匹配'}")
             
             return is_match
         except Exception as e:
-            print(f"游戏匹配检测出错: {e}")
-            # 出错时使用简单的字符串匹配
-            return question_game.lower() in current_game.lower() or current_game.lower() in question_game.lower()
+            logger.warning(f"游戏匹配检测出错: {e}")
     
-    # 如果没有模型，使用简单的字符串匹配
+    # 没有游戏目录时，退回到与当前攻略游戏名的字符串比较
+    current_game = get_current_game_name()
+    if not current_game:
+        return False
     return question_game.lower() in current_game.lower() or current_game.lower() in question_game.lower()
 
-def generate_guide_with_llm(game_name: str, question: str) -> str:
+# 攻略生成与普通回答的 LLM 调用参数
+GUIDE_LLM_OPTIONS = {"temperature": 0.7, "max_tokens": 2000, "lane": "generate"}
+ANSWER_LLM_OPTIONS = {"temperature": 0.1, "max_tokens": 500}  # 降低温度，让回答更确定，更严格遵循攻略
+
+def build_guide_messages(game_name: str, question: str) -> List[dict]:
     """
-    使用 LLM 生成新游戏的攻略
+    构造生成新游戏攻略的对话消息
     """
-    api_key = os.getenv('DEEPSEEK_API_KEY')
-    
-    if not api_key:
-        return "无法生成攻略：未配置 DEEPSEEK_API_KEY"
-    
-    try:
-        openai.api_base = "https://api.deepseek.com/v1"
-        openai.api_key = api_key
-        
-        prompt = f"""你是一名硬核游戏攻略撰写专家。当前检测到用户询问的游戏《{game_name}》与现有 RAG 攻略库不匹配，请为这款游戏重新生成完整攻略。请参考以下结构输出 Markdown 内容，并确保用词专业、条理清晰：
+    prompt = f"""你是一名硬核游戏攻略撰写专家。当前检测到用户询问的游戏《{game_name}》与现有 RAG 攻略库不匹配，请为这款游戏重新生成完整攻略。请参考以下结构输出 Markdown 内容，并确保用词专业、条理清晰：
 
 ## 🎮 游戏概览
 - 简述游戏类型、背景、核心特色
@@ -429,78 +515,189 @@ def generate_guide_with_llm(game_name: str, question: str) -> str:
 - 保持 Markdown 结构，使用必要的加粗、列表、表情符号增强可读性
 - 中文回答"""
 
-        response = openai.ChatCompletion.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": "你是一个专业的游戏攻略撰写者，擅长撰写详细、实用的游戏攻略。"},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.7,
-            max_tokens=2000
-        )
-        
-        guide = response.choices[0].message.content.strip()
-        return guide
-    except Exception as e:
-        print(f"生成攻略时出错: {e}")
-        return f"生成攻略时出错: {str(e)}"
+    return [
+        {"role": "system", "content": "你是一个专业的游戏攻略撰写者，擅长撰写详细、实用的游戏攻略。"},
+        {"role": "user", "content": prompt}
+    ]
 
-def save_guide_to_supabase(game_name: str, guide_content: str, question: str) -> bool:
+async def try_generate_guide(game_name: str, question: str) -> Tuple[str, bool]:
     """
-    将生成的攻略保存到 Supabase
+    使用 LLM 生成新游戏的攻略
+    返回: (攻略内容或错误提示, 是否生成成功)
     """
-    global supabase
-    
-    if supabase is None:
-        supabase = init_supabase()
+    client = get_llm_client()
     
-    if supabase is None:
-        print("⚠️  Supabase 未初始化，无法保存攻略")
-        return False
+    if client is None:
+        return "无法生成攻略：未配置 DEEPSEEK_API_KEY", False
     
     try:
-        # 检查是否已存在该游戏的攻略
-        existing = supabase.table('game_guides').select('*').eq('game_name', game_name).execute()
-        
-        data = {
-            'game_name': game_name,
-            'guide_content': guide_content,
-            'question': question,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
-        
-        if existing.data and len(existing.data) > 0:
-            # 更新现有攻略
-            result = supabase.table('game_guides').update(data).eq('game_name', game_name).execute()
-            print(f"✅ 已更新游戏《{game_name}》的攻略到 Supabase")
-        else:
-            # 插入新攻略
-            result = supabase.table('game_guides').insert(data).execute()
-            print(f"✅ 已保存游戏《{game_name}》的攻略到 Supabase")
-        
-        return True
+        return await client.chat(build_guide_messages(game_name, question), **GUIDE_LLM_OPTIONS), True
     except Exception as e:
-        print(f"❌ 保存攻略到 Supabase 时出错: {e}")
-        return False
+        logger.error(f"生成攻略时出错: {e}")
+        return f"生成攻略时出错: {str(e)}", False
+
+async def generate_guide_with_llm(game_name: str, question: str) -> str:
+    """
+    使用 LLM 生成新游戏的攻略
+    """
+    guide, _ = await try_generate_guide(game_name, question)
+    return guide
+
+async def stream_guide_with_llm(game_name: str, question: str) -> AsyncIterator[str]:
+    """
+    流式生成新游戏的攻略，逐段产出增量文本；调用失败时抛出异常
+    """
+    client = get_llm_client()
+    
+    if client is None:
+        yield "无法生成攻略：未配置 DEEPSEEK_API_KEY"
+        return
+    
+    async for delta in client.stream_chat(build_guide_messages(game_name, question), **GUIDE_LLM_OPTIONS):
+        yield delta
+
+def save_guide_to_supabase(game_name: str, guide_content: str, question: str) -> bool:
+    """
+    将生成的攻略保存到 Supabase（一次 upsert，见 GuideStore.upsert_remote）
+    """
+    return guide_store.upsert_remote(game_name, guide_content, question)
 
 def load_model():
     """
-    加载 sentence-transformers 模型
+    加载 sentence-transformers 模型（模型目录与后端见 embedding_model.py）
     """
     global model
     if model is None:
         print("正在加载 sentence-transformers 模型...")
-        model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
+        model = load_embedding_model()
         print("模型加载完成")
 
-def find_similar_chunks(question: str, top_k: int = 3, similarity_threshold: float = 0.3, target_game_name: Optional[str] = None) -> Tuple[List[str], float]:
+def start_batch_encoder():
+    global batch_encoder
+    batch_encoder = BatchEncoder(
+        model,
+        max_batch_size=ENCODER_BATCH_SIZE,
+        max_wait_ms=float(os.getenv('ENCODER_BATCH_WAIT_MS', '5'))
+    )
+
+async def finish_background_model_load():
+    """
+    等待后台加载的模型就绪后启用它，并为当前快照的游戏目录补上名称向量
+    （快照在模型就绪前构建，游戏目录只有字符串索引）
+    """
+    global model
+    if not await asyncio.to_thread(model_loader.wait):
+        return
+    model = model_loader.model
+    start_batch_encoder()
+    print(f"✅ 模型已在后台加载完成（{model_loader.load_seconds:.1f} 秒），开始接收问答请求")
+    await fill_game_catalog_vectors()
+
+async def fill_game_catalog_vectors():
+    """
+    当前快照的游戏目录没有名称向量时（模型就绪前构建，或在 fork 前的父进程中构建）补上
+    """
+    async with reload_lock:
+        snap = snapshot
+        if model is not None and snap is not None and not snap.game_catalog.has_vectors:
+            game_catalog = await asyncio.to_thread(build_game_catalog, snap.chunk_game_names)
+            install_snapshot(snap._replace(game_catalog=game_catalog))
+
+def is_ready() -> bool:
+    return model is not None and snapshot is not None
+
+def ensure_ready():
+    """
+    模型或向量尚未加载完成时拒绝问答请求（503），客户端或负载均衡稍后重试
+    """
+    if is_ready():
+        return
+    if model_loader is not None and model_loader.state == 'failed':
+        raise HTTPException(status_code=503, detail=f"模型加载失败: {model_loader.error}")
+    raise HTTPException(status_code=503, detail="服务启动中，模型或向量尚未加载完成", headers={"Retry-After": "5"})
+
+def normalize_query_text(text: str) -> str:
+    """
+    归一化待编码文本：全角转半角（NFKC）、合并连续空白、去除首尾空白
+    """
+    return ' '.join(unicodedata.normalize('NFKC', text or '').split())
+
+def _cache_query_vector(key: str, raw_vector: np.ndarray) -> np.ndarray:
+    """
+    归一化模型输出的向量，设为只读后写入缓存
+    """
+    vector = np.asarray(raw_vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    if norm > 0:
+        vector = vector / norm
+    vector.setflags(write=False)
+    embedding_cache.set(key, vector)
+    return vector
+
+def encode_query(text: str) -> np.ndarray:
+    """
+    将文本编码为 L2 归一化的 float32 向量（带 LRU 缓存）
+    返回的向量只读，所有调用方共享同一份缓存结果
+    """
+    key = normalize_query_text(text)
+    vector = embedding_cache.get(key)
+    if vector is not None:
+        return vector
+    return _cache_query_vector(key, model.encode([key])[0])
+
+def encode_queries(texts: List[str]) -> np.ndarray:
+    """
+    批量版本的 encode_query：去重后未命中缓存的文本在一次 model.encode 调用中编码
+    返回 (len(texts), dim) 的矩阵，行与输入一一对应
+    """
+    keys = [normalize_query_text(text) for text in texts]
+    vectors = {}
+    for key in keys:
+        if key not in vectors:
+            vectors[key] = embedding_cache.get(key)
+    missing = [key for key, vector in vectors.items() if vector is None]
+    if missing:
+        for key, raw_vector in zip(missing, model.encode(missing)):
+            vectors[key] = _cache_query_vector(key, raw_vector)
+    return np.stack([vectors[key] for key in keys]) if keys else np.empty((0, 0), dtype=np.float32)
+
+async def encode_query_async(text: str) -> np.ndarray:
+    """
+    encode_query 的异步版本：未命中缓存时交给微批量编码器，与其他请求合并编码
+    """
+    key = normalize_query_text(text)
+    vector = embedding_cache.get(key)
+    if vector is not None:
+        return vector
+    if batch_encoder is None:
+        return await asyncio.to_thread(encode_query, key)
+    return _cache_query_vector(key, await batch_encoder.encode(key))
+
+def find_game_rows(target_game_name: Optional[str], snap: VectorSnapshot) -> Union[slice, np.ndarray, None]:
+    """
+    通过游戏索引定位目标游戏的 chunks（slice 或行号数组），未指定或未找到时返回 None（搜索所有内容）
+    """
+    if not target_game_name or not snap.game_index:
+        return None
+    game_rows = snap.game_index.get(normalize_game_title(target_game_name))
+    if game_rows is None:
+        logger.debug(f"⚠️  未找到游戏《{target_game_name}》的攻略段落，将搜索所有内容")
+    elif logger.isEnabledFor(logging.DEBUG):
+        row_count = (game_rows.stop - game_rows.start) if isinstance(game_rows, slice) else len(game_rows)
+        logger.debug(f"🎮 已过滤出 {row_count} 个《{target_game_name}》的攻略段落")
+    return game_rows
+
+def find_similar_chunks(question: str, top_k: int = 3, similarity_threshold: float = 0.3, target_game_name: Optional[str] = None,
+                        question_embedding: Optional[np.ndarray] = None,
+                        snap: Optional[VectorSnapshot] = None,
+                        vector_hits: Optional[Tuple[np.ndarray, np.ndarray]] = None) -> Tuple[List[str], float]:
     """
     在向量中搜索最相似的段落
     优化策略：
     1. 如果指定了游戏名称，只搜索该游戏的 chunks
     2. 使用更宽松的 top_k 搜索（先找更多候选）
-    3. 然后根据相似度过滤
+    3. 向量检索与 BM25 检索的候选按 RRF 融合排序（快照中没有 BM25 索引时只用向量检索）
+    4. 然后根据相似度过滤（BM25 高分段落即使相似度较低也保留）
     返回: (相关段落列表, 最高相似度分数)
     
     Args:
@@ -508,58 +705,44 @@ def find_similar_chunks(question: str, top_k: int = 3, similarity_threshold: flo
         top_k: 返回最相似的段落数量
         similarity_threshold: 相似度阈值
         target_game_name: 目标游戏名称，如果提供则只搜索该游戏的 chunks
+        question_embedding: 预先编码好的归一化问题向量（为空时在此编码）
+        snap: 使用的向量快照（为空时取当前快照）
+        vector_hits: 已完成的向量检索结果（retriever.search_batch 的一项，候选数 top_k * 2），为空时在此检索
     """
-    if model is None or chunks is None or embeddings is None:
+    snap = snap or snapshot
+    if model is None or snap is None:
         raise RuntimeError("模型或向量未加载")
+    chunks, chunk_game_names = snap.chunks, snap.chunk_game_names
     
-    # 如果指定了游戏名称，先过滤出属于该游戏的 chunks
-    valid_indices = None
-    if target_game_name and chunk_game_names:
-        normalized_target = normalize_game_title(target_game_name)
-        valid_indices = [
-            i for i, game_name in enumerate(chunk_game_names)
-            if game_name and normalize_game_title(game_name) == normalized_target
-        ]
-        
-        if not valid_indices:
-            print(f"⚠️  未找到游戏《{target_game_name}》的攻略段落，将搜索所有内容")
-            valid_indices = None
-        else:
-            print(f"🎮 已过滤出 {len(valid_indices)} 个《{target_game_name}》的攻略段落")
-    
-    # 将问题转换为向量
-    question_embedding = model.encode([question])[0]
-    
-    # 计算余弦相似度（只计算有效索引的相似度）
-    if valid_indices is not None:
-        # 只计算目标游戏的 chunks 的相似度
-        valid_embeddings = embeddings[valid_indices]
-        similarities_all = np.zeros(len(chunks))
-        valid_similarities = np.dot(valid_embeddings, question_embedding) / (
-            np.linalg.norm(valid_embeddings, axis=1) * np.linalg.norm(question_embedding)
-        )
-        # 将相似度映射回原始索引
-        for idx, orig_idx in enumerate(valid_indices):
-            similarities_all[orig_idx] = valid_similarities[idx]
-        similarities = similarities_all
-        # 只从有效索引中选择
-        candidate_indices = valid_indices
-    else:
-        # 计算所有 chunks 的相似度
-        similarities = np.dot(embeddings, question_embedding) / (
-            np.linalg.norm(embeddings, axis=1) * np.linalg.norm(question_embedding)
-        )
-        candidate_indices = list(range(len(chunks)))
+    # 如果指定了游戏名称，先通过游戏索引定位该游戏的 chunks
+    game_rows = find_game_rows(target_game_name, snap)
+    
+    # 将问题转换为归一化向量
+    if question_embedding is None:
+        question_embedding = encode_query(question)
     
-    # 先获取更多的候选（top_k * 2），然后过滤
-    candidate_count = min(top_k * 2, len(candidate_indices))
-    # 只从候选索引中选择
-    candidate_similarities = similarities[candidate_indices]
-    top_local_indices = np.argsort(candidate_similarities)[-candidate_count:][::-1]
-    top_indices = [candidate_indices[i] for i in top_local_indices]
+    # 计算余弦相似度（向量已在加载时归一化），先获取更多的候选（top_k * 2），然后过滤
+    if vector_hits is None:
+        vector_hits = snap.retriever.search(question_embedding, top_k * 2, rows=game_rows)
+    top_indices, top_scores = vector_hits
+    top_indices = top_indices.tolist()
+    score_of = {idx: float(score) for idx, score in zip(top_indices, top_scores)}
+    
+    # 混合检索：BM25 候选与向量候选按名次融合，补充精确词语的召回
+    lexical_hits = set()
+    if snap.lexical_index is not None:
+        lexical_indices, lexical_scores = snap.lexical_index.search(question, top_k * 2, rows=game_rows)
+        if len(lexical_indices) > 0:
+            lexical_hits = set(lexical_indices[lexical_scores >= lexical_scores[0] * LEXICAL_SCORE_RATIO].tolist())
+            missing = np.sort([idx for idx in lexical_indices.tolist() if idx not in score_of])
+            if len(missing) > 0:
+                # 只被 BM25 找到的段落补算余弦相似度，用于阈值判断
+                similarities = np.asarray(snap.embeddings[missing], dtype=np.float32) @ question_embedding
+                score_of.update(zip(missing.tolist(), similarities.tolist()))
+            top_indices = reciprocal_rank_fusion([top_indices, lexical_indices.tolist()])
     
     # 获取最高相似度
-    max_similarity = similarities[top_indices[0]] if len(top_indices) > 0 else 0.0
+    max_similarity = max(score_of.values()) if score_of else 0.0
     
     # 智能选择策略：
     # 1. 如果最高相似度足够高，返回 top_k 个最相似的
@@ -573,8 +756,8 @@ def find_similar_chunks(question: str, top_k: int = 3, similarity_threshold: flo
         # 计算动态阈值：最高相似度的 70%
         dynamic_threshold = max_similarity * 0.7 if max_similarity > 0 else 0.1
         
-        # 返回所有超过动态阈值的段落（至少 1 个）
-        selected_indices = [idx for idx in top_indices if similarities[idx] >= dynamic_threshold]
+        # 返回所有超过动态阈值的段落与 BM25 高分段落（至少 1 个）
+        selected_indices = [idx for idx in top_indices if score_of[idx] >= dynamic_threshold or idx in lexical_hits]
         
         if not selected_indices:
             # 如果都没有，至少返回相似度最高的 1 个
@@ -583,30 +766,31 @@ def find_similar_chunks(question: str, top_k: int = 3, similarity_threshold: flo
             # 限制数量，但至少返回 1 个
             selected_indices = selected_indices[:top_k]
     
-    # 打印调试信息
-    print(f"\n{'='*60}")
-    print(f"🔍 搜索问题: {question}")
-    if target_game_name:
-        print(f"🎮 目标游戏: {target_game_name}")
-    print(f"{'='*60}")
-    print(f"找到 {len(selected_indices)} 个相关段落:")
-    for idx, i in enumerate(selected_indices):
-        game_info = f" [{chunk_game_names[i] if chunk_game_names and i < len(chunk_game_names) else '未知'}]" if chunk_game_names else ""
-        print(f"  [{idx+1}] 相似度: {similarities[i]:.4f}{game_info}")
-        print(f"      内容: {chunks[i][:100]}..." if len(chunks[i]) > 100 else f"      内容: {chunks[i]}")
-        print()
-    print(f"最高相似度: {max_similarity:.4f} (阈值: {similarity_threshold:.4f})")
-    if max_similarity >= similarity_threshold:
-        print("✅ 相似度足够，将优先使用 RAG 内容回答")
-    else:
-        print("⚠️  相似度较低，但仍会使用找到的 RAG 内容（可能补充通用知识）")
-    print(f"{'='*60}\n")
+    # 调试信息（LOG_LEVEL=DEBUG 时才格式化与输出）
+    if logger.isEnabledFor(logging.DEBUG):
+        lines = [f"\n{'='*60}", f"🔍 搜索问题: {question}"]
+        if target_game_name:
+            lines.append(f"🎮 目标游戏: {target_game_name}")
+        lines += [f"{'='*60}", f"找到 {len(selected_indices)} 个相关段落:"]
+        for idx, i in enumerate(selected_indices):
+            game_info = f" [{chunk_game_names[i] if chunk_game_names and i < len(chunk_game_names) else '未知'}]" if chunk_game_names else ""
+            lexical_info = " [BM25]" if i in lexical_hits else ""
+            lines.append(f"  [{idx+1}] 相似度: {score_of[i]:.4f}{game_info}{lexical_info}")
+            lines.append(f"      内容: {chunks[i][:100]}..." if len(chunks[i]) > 100 else f"      内容: {chunks[i]}")
+            lines.append("")
+        lines.append(f"最高相似度: {max_similarity:.4f} (阈值: {similarity_threshold:.4f})")
+        if max_similarity >= similarity_threshold:
+            lines.append("✅ 相似度足够，将优先使用 RAG 内容回答")
+        else:
+            lines.append("⚠️  相似度较低，但仍会使用找到的 RAG 内容（可能补充通用知识）")
+        lines.append(f"{'='*60}\n")
+        logger.debug("\n".join(lines))
     
     return [chunks[i] for i in selected_indices], max_similarity
 
-def get_llm_response(question: str, context_chunks: List[str], use_rag: bool = True) -> str:
+def build_answer_messages(question: str, context_chunks: List[str], use_rag: bool = True) -> List[dict]:
     """
-    将问题和相关段落发送给 Deepseek LLM 生成回答
+    构造回答问题的对话消息
     
     Args:
         question: 用户问题
@@ -647,172 +831,683 @@ def get_llm_response(question: str, context_chunks: List[str], use_rag: bool = T
 
 请回答："""
 
-    # 使用 Deepseek API
-    api_key = os.getenv('DEEPSEEK_API_KEY')
+    return [
+        {"role": "system", "content": "你是一个游戏攻略助手。你必须严格按照用户提供的攻略内容回答问题，不能添加攻略中没有的信息。如果攻略中没有相关信息，必须明确说明。"},
+        {"role": "user", "content": prompt}
+    ]
+
+def fallback_answer(question: str, context_chunks: List[str]) -> str:
+    """
+    未配置 API 时返回的简单基于规则的回答
+    """
+    return f"根据攻略内容：{context_chunks[0] if context_chunks else '无相关内容'}，回答您的问题：{question}。\n\n（提示：请设置 DEEPSEEK_API_KEY 环境变量以使用完整的 LLM 功能）"
+
+def answer_cache_key(question: str, context_chunks: List[str], use_rag: bool) -> str:
+    return AnswerCache.make_key(
+        normalize_query_text(question),
+        context_chunks if use_rag else [],
+        "rag" if use_rag else "general"
+    )
+
+class PreparedAnswer(NamedTuple):
+    """
+    调用 LLM 之前可以提前准备好的部分：对话消息、回答缓存键与缓存中已有的回答
+    """
+    messages: List[dict]
+    cache_key: str
+    cached: Optional[str]
+
+async def prepare_answer(question: str, context_chunks: List[str], use_rag: bool = True) -> PreparedAnswer:
+    """
+    构造回答消息并查询回答缓存（参数同 build_answer_messages）
+    plan_answer 在检索完成后立即开始执行，与游戏匹配检查并行
+    """
+    cache_key = answer_cache_key(question, context_chunks, use_rag)
+    messages = build_answer_messages(question, context_chunks, use_rag)
+    return PreparedAnswer(messages, cache_key, await answer_cache.aget(cache_key))
+
+async def get_llm_response(question: str, context_chunks: List[str], use_rag: bool = True,
+                           prepared: Optional[PreparedAnswer] = None) -> str:
+    """
+    将问题和相关段落发送给 Deepseek LLM 生成回答（参数同 build_answer_messages）
+    相同问题检索到相同段落时直接返回缓存的回答（temperature=0.1，回答基本确定）
+    prepared 为 plan_answer 提前准备好的消息与缓存查询结果，未提供时在这里准备
+    """
+    # 使用 Deepseek API（异步连接池客户端）
+    client = get_llm_client()
     
-    if api_key:
-        try:
-            # 配置 Deepseek API
-            openai.api_base = "https://api.deepseek.com/v1"
-            openai.api_key = api_key
-            
-            # 使用更低的 temperature 让回答更确定，更严格遵循攻略
-            response = openai.ChatCompletion.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": "你是一个游戏攻略助手。你必须严格按照用户提供的攻略内容回答问题，不能添加攻略中没有的信息。如果攻略中没有相关信息，必须明确说明。"},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.1,  # 降低温度，让回答更确定
-                max_tokens=500
-            )
-            return response.choices[0].message.content.strip()
-        except Exception as e:
-            return f"Deepseek API 调用失败: {str(e)}。请检查 API 密钥配置。"
-    else:
+    if client is None:
         # 如果没有配置 API，返回一个简单的基于规则的回答
-        return f"根据攻略内容：{context_chunks[0] if context_chunks else '无相关内容'}，回答您的问题：{question}。\n\n（提示：请设置 DEEPSEEK_API_KEY 环境变量以使用完整的 LLM 功能）"
+        return fallback_answer(question, context_chunks)
+    
+    prepared = prepared or await prepare_answer(question, context_chunks, use_rag)
+    if prepared.cached is not None:
+        logger.debug("💾 命中回答缓存")
+        return prepared.cached
+    
+    try:
+        answer = await client.chat(prepared.messages, **ANSWER_LLM_OPTIONS)
+    except Exception as e:
+        return f"Deepseek API 调用失败: {str(e)}。请检查 API 密钥配置。"
+    
+    await answer_cache.aset(prepared.cache_key, answer)
+    return answer
+
+async def stream_llm_response(question: str, context_chunks: List[str], use_rag: bool = True,
+                              prepared: Optional[PreparedAnswer] = None) -> AsyncIterator[str]:
+    """
+    get_llm_response 的流式版本，逐段产出增量文本；调用失败时抛出异常
+    """
+    client = get_llm_client()
+    
+    if client is None:
+        yield fallback_answer(question, context_chunks)
+        return
+    
+    prepared = prepared or await prepare_answer(question, context_chunks, use_rag)
+    if prepared.cached is not None:
+        yield prepared.cached
+        return
+    
+    parts = []
+    async for delta in client.stream_chat(prepared.messages, **ANSWER_LLM_OPTIONS):
+        parts.append(delta)
+        yield delta
+    # 只有完整生成的回答才写入缓存
+    await answer_cache.aset(prepared.cache_key, "".join(parts).strip())
 
 @app.on_event("startup")
 async def startup_event():
     """
     应用启动时加载模型和向量
+    多进程部署时每个工作进程各执行一次；模型与向量已在 fork 前加载（serve.py）时直接复用
+    FAST_START=1 时模型在后台线程中加载，服务加载完向量后即开始监听，
+    模型就绪前问答接口返回 503，/health 的 ready 字段为 false
     """
-    load_model()
-    init_supabase()
-    try:
-        load_vectors()
-    except FileNotFoundError as e:
-        print(f"警告: {e}")
+    global store_watcher, model_loader, model_load_task
+    fast_start = os.getenv('FAST_START', '0') == '1'
+    if model is None and fast_start:
+        model_loader = ModelLoader(load_embedding_model)
+        model_loader.start()
+        model_load_task = asyncio.get_running_loop().create_task(finish_background_model_load())
+        print("⏳ 快速启动：模型在后台加载")
+    else:
+        load_model()
+        start_batch_encoder()
+    if not fast_start:
+        # 快速启动时 Supabase 客户端在第一次需要时才创建
+        init_supabase()
+    vector_file = os.getenv('VECTOR_FILE', 'guide_vectors.npy')
+    if snapshot is not None and snapshot.vector_file == vector_file and snapshot.is_current():
+        # serve.py 在 fork 前已加载：向量为只读内存映射，与其他工作进程共享
+        # 父进程不做编码，游戏目录的名称向量在工作进程中补上
+        print(f"♻️  使用预加载的向量存储（工作进程 {os.getpid()}）")
+        await fill_game_catalog_vectors()
+    else:
+        try:
+            load_vectors(vector_file)
+        except FileNotFoundError as e:
+            print(f"警告: {e}")
+    
+    # 监视向量存储文件，重新生成后自动热更新（无需重启服务）
+    watch_interval = float(os.getenv('VECTOR_WATCH_INTERVAL', '0'))
+    if watch_interval > 0:
+        store_watcher = StoreWatcher(vector_file, lambda: reload_vectors(vector_file), interval=watch_interval)
+        store_watcher.start()
+        print(f"👀 已启用向量存储热更新监视（每 {watch_interval:g} 秒检查一次）")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    应用关闭时停止存储监视并释放 LLM 连接池
+    """
+    if store_watcher is not None:
+        await store_watcher.stop()
+    await close_llm_client()
 
 @app.get("/")
 async def root():
     return {"message": "RAG 问答系统 API", "status": "running"}
 
-@app.post("/ask", response_model=QuestionResponse)
-async def ask_question(request: QuestionRequest):
+class AnswerPlan(BaseModel):
     """
-    接收用户问题，在向量中搜索最相似的段落，然后使用 LLM 回答
+    调用 LLM 之前的检索与路由结果，/ask 与 /ask/stream 共用
+    """
+    game_name: Optional[str] = None  # 从问题中提取的游戏名称
+    display_game_name: Optional[str] = None  # 返回给前端展示的游戏名称
+    relevant_chunks: List[str] = []
+    max_similarity: float = 0.0
+    source: str  # "rag" 或 "llm_generated" 或 "llm_general"
+    prepared: Optional[PreparedAnswer] = None  # 提前准备好的 LLM 消息与缓存查询结果（source 为 llm_generated 时为空）
+
+class GameResolution(NamedTuple):
+    game_name: Optional[str]         # 从问题中提取的游戏名称
+    current_game: Optional[str]      # guide.txt 中的当前游戏名称
+    match: Optional[GameMatch]       # 游戏目录中的匹配结果
+
+async def resolve_game(question: str, snap: Optional[VectorSnapshot],
+                       timer: Optional[StageTimer] = None) -> GameResolution:
+    """
+    提取问题中的游戏名称并解析到游戏目录（同 match_game）
+    字符串索引未命中时，游戏名交给微批量编码器，与同时提交的问题向量合并成一批编码
+    提取与目录匹配分别记录为 extract / game_match 阶段
+    """
+    timer = timer or StageTimer()
+    with timer.stage("extract"):
+        game_name = extract_game_name(question)
+        current_game = get_current_game_name()
+    game_catalog = snap.game_catalog if snap else None
+    match = None
+    if game_name and game_catalog:
+        with timer.stage("game_match"):
+            match = game_catalog.lookup(game_name)
+            if match is None and model is not None and game_catalog.has_vectors:
+                match = game_catalog.nearest(await encode_query_async(game_name))
+    return GameResolution(game_name, current_game, match)
+
+async def plan_answer(request: QuestionRequest, timer: Optional[StageTimer] = None) -> AnswerPlan:
+    """
+    提取游戏名称、检索 RAG 内容并检查游戏是否匹配，决定回答方式
     
     逻辑流程：
-    1. 提取问题中的游戏名称
-    2. 搜索 RAG 相关内容
-    3. 检查 RAG 内容是否适用于输入的游戏
-    4. 如果不适用，使用 LLM 生成新攻略并保存到 Supabase
-    5. 如果适用，使用 RAG 内容回答
+    1. 问题编码与游戏名称解析同时开始（embed / extract、game_match）
+    2. 搜索 RAG 相关内容（retrieve）
+    3. 检索完成后立即开始准备 LLM 消息并查询回答缓存（prompt），同时检查 RAG 内容是否适用于输入的游戏（game_check）
+    4. 如果不适用，使用 LLM 生成新攻略（source=llm_generated），丢弃提前准备的消息
+    5. 如果适用，使用 RAG 内容回答（source=rag），没有找到内容时使用通用知识（source=llm_general）
+    
+    各阶段耗时记录在 timer 中（括号内为阶段名）
     """
-    try:
-        # 提取游戏名称
-        game_name = extract_game_name(request.question)
-        current_game = get_current_game_name()
-        resolved_game_name = resolve_game_name(game_name, current_game)
-        print(f"\n{'='*60}")
-        print(f"🎮 检测到的游戏名称: {game_name or '未检测到'}")
-        print(f"{'='*60}")
-        
-        # 相似度阈值
-        SIMILARITY_THRESHOLD = 0.7
-        
-        # 如果检测到游戏名称，只搜索该游戏的攻略
+    timer = timer or StageTimer()
+    # 整个请求使用同一个向量快照，处理过程中发生热更新也不会看到混合的数据
+    snap = snapshot
+    
+    # 问题编码交给微批量编码器，与其他并发请求合并成一批；游戏名解析同时进行
+    question_embedding, game = await asyncio.gather(
+        timer.track("embed", encode_query_async(request.question)),
+        resolve_game(request.question, snap, timer)
+    )
+    game_name, current_game, game_match = game
+    resolved_game_name = resolve_game_name(game_name, current_game)
+    display_game_name = resolved_game_name or game_name
+    logger.debug(f"\n{'='*60}\n🎮 检测到的游戏名称: {game_name or '未检测到'}\n{'='*60}")
+    
+    # 如果检测到游戏名称，只搜索该游戏的攻略（优先使用游戏目录中匹配到的名称）
+    if game_match is not None and game_match.score >= GAME_MATCH_THRESHOLD:
+        target_game = game_match.title
+    else:
         target_game = resolved_game_name or game_name
-        
-        # 搜索最相似的段落（如果检测到游戏名称，只搜索该游戏的 chunks）
-        relevant_chunks, max_similarity = find_similar_chunks(
+    
+    # 搜索最相似的段落（如果检测到游戏名称，只搜索该游戏的 chunks）
+    # 检索在线程池中执行，大语料下的矩阵运算不阻塞事件循环
+    with timer.stage("retrieve"):
+        relevant_chunks, max_similarity = await asyncio.to_thread(
+            find_similar_chunks,
             request.question, 
             request.top_k,
             similarity_threshold=SIMILARITY_THRESHOLD,
-            target_game_name=target_game  # 传入目标游戏名称，实现按游戏过滤
+            target_game_name=target_game,  # 传入目标游戏名称，实现按游戏过滤
+            question_embedding=question_embedding,
+            snap=snap
         )
-        
-        # 判断是否使用 RAG
-        use_rag = len(relevant_chunks) > 0
-        
+    
+    # 判断是否使用 RAG
+    use_rag = len(relevant_chunks) > 0
+    
+    # 预先准备 LLM 消息并查询回答缓存，与游戏匹配检查并行；RAG 内容不适用时丢弃
+    prepare_task = asyncio.create_task(
+        timer.track("prompt", prepare_answer(request.question, relevant_chunks, use_rag))
+    )
+    # 让准备任务先开始运行：游戏匹配检查是同步的，否则任务要等到检查结束才会启动，
+    # 且在启动前被取消时 prepare_answer 协程从未执行（RuntimeWarning: never awaited）
+    await asyncio.sleep(0)
+    try:
         # 如果找到了 RAG 内容，检查游戏是否匹配
         direct_text_match = is_direct_game_match(game_name, current_game)
         skip_game_match_check = direct_text_match and max_similarity >= SIMILARITY_THRESHOLD
         
         if use_rag and game_name and not skip_game_match_check:
-            is_game_match = check_game_match(request.question, relevant_chunks)
+            with timer.stage("game_check"):
+                is_game_match = check_game_match(request.question, relevant_chunks, snap, game_match)
             
             if not is_game_match:
                 # RAG 内容不适用于输入的游戏，生成新攻略
-                print(f"\n{'='*60}")
-                print(f"⚠️  RAG 内容不适用于游戏《{game_name}》，将生成新攻略")
-                print(f"{'='*60}\n")
-                
-                # 生成新攻略
-                new_guide = generate_guide_with_llm(game_name, request.question)
-                
-                # 保存到 Supabase
-                save_success = save_guide_to_supabase(game_name, new_guide, request.question)
-                
-                if save_success:
-                    print(f"✅ 新攻略已保存到 Supabase")
-                else:
-                    print(f"⚠️  新攻略生成成功，但保存到 Supabase 失败")
-                
-                return QuestionResponse(
-                    answer=new_guide,
-                    relevant_chunks=[],
-                    source="llm_generated",
-                    game_name=resolved_game_name or game_name
+                logger.info(f"⚠️  RAG 内容不适用于游戏《{game_name}》，将生成新攻略")
+                return AnswerPlan(
+                    game_name=game_name,
+                    display_game_name=display_game_name,
+                    max_similarity=max_similarity,
+                    source="llm_generated"
                 )
         
-        # 使用 RAG 内容回答
-        if use_rag:
+        prepared = await prepare_task
+    finally:
+        prepare_task.cancel()
+    
+    if use_rag:
+        if logger.isEnabledFor(logging.DEBUG):
             if max_similarity >= SIMILARITY_THRESHOLD:
-                print(f"📝 使用 RAG 模式（高相似度 {max_similarity:.4f}）- 发送给 LLM 的上下文:")
+                header = f"📝 使用 RAG 模式（高相似度 {max_similarity:.4f}）- 发送给 LLM 的上下文:"
             else:
-                print(f"📝 使用 RAG 模式（相似度较低 {max_similarity:.4f}，但仍使用找到的内容）- 发送给 LLM 的上下文:")
-            for i, chunk in enumerate(relevant_chunks):
-                print(f"  段落 {i+1}: {chunk}")
-            print()
-            answer = get_llm_response(request.question, relevant_chunks, use_rag=True)
-            source = "rag"
+                header = f"📝 使用 RAG 模式（相似度较低 {max_similarity:.4f}，但仍使用找到的内容）- 发送给 LLM 的上下文:"
+            logger.debug("\n".join([header] + [f"  段落 {i+1}: {chunk}" for i, chunk in enumerate(relevant_chunks)]) + "\n")
+        return AnswerPlan(
+            game_name=game_name,
+            display_game_name=display_game_name,
+            relevant_chunks=relevant_chunks,
+            max_similarity=max_similarity,
+            source="rag",
+            prepared=prepared
+        )
+    
+    # 使用 LLM 通用知识回答（完全没有找到相关段落）
+    logger.debug("📝 使用 LLM 通用知识模式（未找到相关段落）\n")
+    return AnswerPlan(
+        game_name=game_name,
+        display_game_name=display_game_name,
+        max_similarity=max_similarity,
+        source="llm_general",
+        prepared=prepared
+    )
+
+def plan_answers_batch(requests: List[QuestionRequest], snap: VectorSnapshot,
+                       timer: Optional[StageTimer] = None) -> List[AnswerPlan]:
+    """
+    批量版本的 plan_answer，路由规则相同（同步执行，由 /ask/batch 放到线程池中）
+    
+    - 所有问题与字符串索引未命中、需要向量匹配的游戏名在一次 model.encode 调用中编码（embed）
+    - 向量检索用 retriever.search_batch：同一游戏的问题合并为一次矩阵-矩阵乘法，只对该游戏的段落打分（retrieve）
+    - BM25 融合与阈值过滤仍逐个问题进行（find_similar_chunks 使用已完成的向量检索结果）
+    
+    返回的计划不包含 prepared，LLM 消息在回答时准备
+    """
+    timer = timer or StageTimer()
+    questions = [request.question for request in requests]
+    with timer.stage("extract"):
+        game_names = [extract_game_name(question) for question in questions]
+        current_game = get_current_game_name()
+    
+    game_catalog = snap.game_catalog
+    matches = [game_catalog.lookup(name) if name and game_catalog else None for name in game_names]
+    unmatched_names = []
+    if game_catalog and game_catalog.has_vectors:
+        unmatched_names = sorted({name for name, match in zip(game_names, matches) if name and match is None})
+    
+    with timer.stage("embed"):
+        vectors = encode_queries(questions + unmatched_names)
+    question_vectors = vectors[:len(questions)]
+    
+    if unmatched_names:
+        with timer.stage("game_match"):
+            nearest = {name: game_catalog.nearest(vector) for name, vector in zip(unmatched_names, vectors[len(questions):])}
+            matches = [match if match is not None or not name else nearest[name] for name, match in zip(game_names, matches)]
+    
+    # 目标游戏的选择同 plan_answer：优先使用游戏目录中匹配到的名称
+    targets = []
+    for name, match in zip(game_names, matches):
+        if match is not None and match.score >= GAME_MATCH_THRESHOLD:
+            targets.append(match.title)
         else:
-            # 使用 LLM 通用知识回答（完全没有找到相关段落）
-            print(f"📝 使用 LLM 通用知识模式（未找到相关段落）")
-            print()
-            answer = get_llm_response(request.question, [], use_rag=False)
-            relevant_chunks = []
-            source = "llm_general"
+            targets.append(resolve_game_name(name, current_game) or name)
+    
+    with timer.stage("retrieve"):
+        rows_list = [find_game_rows(target, snap) for target in targets]
+        vector_hits: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * len(requests)
+        # 候选数与单个请求相同（top_k * 2），不同 top_k 的问题分开检索
+        by_top_k: Dict[int, List[int]] = {}
+        for i, request in enumerate(requests):
+            by_top_k.setdefault(request.top_k, []).append(i)
+        for top_k, positions in by_top_k.items():
+            hits = snap.retriever.search_batch(question_vectors[positions], top_k * 2, [rows_list[i] for i in positions])
+            for i, hit in zip(positions, hits):
+                vector_hits[i] = hit
+        results = [
+            find_similar_chunks(
+                request.question, request.top_k,
+                similarity_threshold=SIMILARITY_THRESHOLD,
+                target_game_name=target,
+                question_embedding=question_vectors[i],
+                snap=snap,
+                vector_hits=vector_hits[i]
+            )
+            for i, (request, target) in enumerate(zip(requests, targets))
+        ]
+    
+    plans = []
+    with timer.stage("game_check"):
+        for request, game_name, match, (relevant_chunks, max_similarity) in zip(requests, game_names, matches, results):
+            display_game_name = resolve_game_name(game_name, current_game) or game_name
+            use_rag = len(relevant_chunks) > 0
+            skip_game_match_check = is_direct_game_match(game_name, current_game) and max_similarity >= SIMILARITY_THRESHOLD
+            if (use_rag and game_name and not skip_game_match_check
+                    and not check_game_match(request.question, relevant_chunks, snap, match)):
+                plans.append(AnswerPlan(game_name=game_name, display_game_name=display_game_name,
+                                        max_similarity=max_similarity, source="llm_generated"))
+                continue
+            plans.append(AnswerPlan(
+                game_name=game_name,
+                display_game_name=display_game_name,
+                relevant_chunks=relevant_chunks if use_rag else [],
+                max_similarity=max_similarity,
+                source="rag" if use_rag else "llm_general"
+            ))
+    return plans
+
+def batch_dedupe_key(request: QuestionRequest, plan: AnswerPlan) -> str:
+    """
+    批量问答的去重键：提示词相同（归一化问题 + 所选段落 + 模式）的问题只调用一次 LLM，
+    需要生成攻略的问题按游戏去重（同一游戏只有一份攻略）
+    """
+    if plan.source == "llm_generated":
+        return f"guide:{normalize_game_title(plan.game_name)}"
+    return answer_cache_key(request.question, plan.relevant_chunks, plan.source == "rag")
+
+async def answer_plan(request: QuestionRequest, plan: AnswerPlan) -> str:
+    """
+    按路由结果生成回答：读取或生成攻略，或调用 LLM 回答（/ask 的非流式回答部分）
+    """
+    if plan.source == "llm_generated":
+        return await get_or_generate_guide(plan.game_name, request.question)
+    return await get_llm_response(request.question, plan.relevant_chunks,
+                                  use_rag=plan.source == "rag", prepared=plan.prepared)
+
+async def get_or_generate_guide(game_name: str, question: str) -> str:
+    """
+    先查已保存的攻略（本地副本 → Supabase），没有时才调用 LLM 生成并保存
+    同一游戏的并发请求只会触发一次生成
+    """
+    guide, origin = await guide_store.get_or_create(
+        game_name, question, lambda: try_generate_guide(game_name, question)
+    )
+    if origin == 'cache':
+        logger.info(f"💾 游戏《{game_name}》已有保存的攻略，直接返回")
+    elif origin == 'coalesced':
+        logger.info(f"🔗 游戏《{game_name}》的攻略正在由其他请求生成，已复用其结果")
+    return guide
+
+async def stream_or_generate_guide(game_name: str, question: str, result: dict) -> AsyncIterator[str]:
+    """
+    get_or_generate_guide 的流式版本：已有攻略时一次性产出，否则流式生成并在结束后保存
+    result['saved'] 记录本次生成的攻略是否已保存到 Supabase
+    """
+    result['saved'] = False
+    guide = await guide_store.get(game_name)
+    if guide is not None:
+        logger.info(f"💾 游戏《{game_name}》已有保存的攻略，直接返回")
+        yield guide
+        return
+    
+    flight = guide_store.join_flight(game_name)
+    if flight is not None:
+        logger.info(f"🔗 游戏《{game_name}》的攻略正在由其他请求生成，等待其结果")
+        yield await asyncio.shield(flight)
+        return
+    
+    parts = []
+    try:
+        async for delta in stream_guide_with_llm(game_name, question):
+            parts.append(delta)
+            yield delta
+    except BaseException as e:
+        guide_store.fail_flight(game_name, e)
+        raise
+    
+    guide = "".join(parts).strip()
+    ok = get_llm_client() is not None and bool(guide)
+    result['saved'] = await guide_store.finish_flight(game_name, guide, ok, question)
+
+@app.post("/ask", response_model=QuestionResponse)
+async def ask_question(request: QuestionRequest, response: Response):
+    """
+    接收用户问题，在向量中搜索最相似的段落，然后使用 LLM 回答
+    检索与路由逻辑见 plan_answer；RAG 内容不适用时生成新攻略并保存到 Supabase
+    各阶段耗时通过 Server-Timing 响应头返回，并计入 /metrics
+    """
+    ensure_ready()
+    timer = StageTimer()
+    try:
+        plan = await plan_answer(request, timer)
         
-        print(f"✅ LLM 生成的回答:")
-        print(f"   {answer}")
-        print(f"{'='*60}\n")
+        if plan.source == "llm_generated":
+            # 读取已保存的攻略，没有时生成新攻略并保存到 Supabase
+            with timer.stage("guide"):
+                new_guide = await get_or_generate_guide(plan.game_name, request.question)
+            record_timings(timer, "/ask", plan.source)
+            response.headers["Server-Timing"] = timer.header()
+            
+            return QuestionResponse(
+                answer=new_guide,
+                relevant_chunks=[],
+                source=plan.source,
+                game_name=plan.display_game_name
+            )
+        
+        with timer.stage("llm"):
+            answer = await get_llm_response(request.question, plan.relevant_chunks,
+                                            use_rag=plan.source == "rag", prepared=plan.prepared)
+        
+        logger.debug(f"✅ LLM 生成的回答:\n   {answer}")
+        record_timings(timer, "/ask", plan.source)
+        response.headers["Server-Timing"] = timer.header()
         
         return QuestionResponse(
             answer=answer,
-            relevant_chunks=relevant_chunks,
-            source=source,
-            game_name=resolved_game_name or game_name
+            relevant_chunks=plan.relevant_chunks,
+            source=plan.source,
+            game_name=plan.display_game_name
         )
     except Exception as e:
-        print(f"错误: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"错误: {str(e)}")
+        record_timings(timer, "/ask", "error")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def record_timings(timer: StageTimer, endpoint: str, source: str):
+    """
+    将一次请求的各阶段耗时与总耗时计入 Prometheus 直方图，DEBUG 级别下同时输出
+    """
+    for span in timer.spans:
+        STAGE_SECONDS.observe(span.duration_ms / 1000, stage=span.name)
+    REQUEST_SECONDS.observe(timer.elapsed_ms() / 1000, endpoint=endpoint, source=source)
+    REQUESTS_TOTAL.inc(endpoint=endpoint, source=source)
+    logger.debug(f"⏱️  阶段耗时: {timer.summary()}")
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    按 Server-Sent Events 格式编码一条事件
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/ask/stream")
+async def ask_question_stream(request: QuestionRequest):
+    """
+    流式版本的 /ask（Server-Sent Events）
+    
+    事件顺序：
+    1. meta：检索结果（relevant_chunks、source、game_name），在调用 LLM 之前发送
+    2. token：LLM 输出的增量文本（data.delta），可能有多条
+    3. done：生成结束（data.answer 为完整回答，data.saved 表示新生成的攻略是否已保存到 Supabase，
+       data.timings 为包含生成阶段在内的各阶段耗时）
+    出错时发送 error 事件（data.detail）
+    
+    响应头在生成开始前发送，Server-Timing 只包含检索与路由阶段
+    """
+    ensure_ready()
+    timer = StageTimer()
+    try:
+        plan = await plan_answer(request, timer)
+    except Exception as e:
+        logger.exception(f"错误: {str(e)}")
+        record_timings(timer, "/ask/stream", "error")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def event_stream():
+        yield format_sse("meta", {
+            "relevant_chunks": plan.relevant_chunks,
+            "source": plan.source,
+            "game_name": plan.display_game_name,
+        })
+        
+        guide_result = {"saved": False}
+        if plan.source == "llm_generated":
+            stage = "guide"
+            deltas = stream_or_generate_guide(plan.game_name, request.question, guide_result)
+        else:
+            stage = "llm"
+            deltas = stream_llm_response(request.question, plan.relevant_chunks,
+                                         use_rag=plan.source == "rag", prepared=plan.prepared)
+        
+        parts = []
+        try:
+            with timer.stage(stage):
+                async for delta in deltas:
+                    parts.append(delta)
+                    yield format_sse("token", {"delta": delta})
+        except Exception as e:
+            logger.error(f"❌ 流式生成出错: {e}")
+            record_timings(timer, "/ask/stream", "error")
+            yield format_sse("error", {"detail": str(e)})
+            return
+        
+        answer = "".join(parts).strip()
+        record_timings(timer, "/ask/stream", plan.source)
+        yield format_sse("done", {"answer": answer, "saved": guide_result["saved"], "timings": timer.as_dict()})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Server-Timing": timer.header()}
+    )
+
+@app.post("/ask/batch")
+async def ask_question_batch(batch: BatchQuestionRequest):
+    """
+    批量问答（适合离线预先回答大量常见问题），以 NDJSON 流式返回
+    
+    - 检索与路由一次完成（见 plan_answers_batch）
+    - 提示词相同的问题只调用一次 LLM（见 batch_dedupe_key），LLM 调用最多同时进行 BATCH_LLM_CONCURRENCY 个
+    - 每行一个结果，按完成顺序返回：index（在请求中的位置）、question、answer、relevant_chunks、source、game_name；
+      回答失败时为 index 与 error
+    - 最后一行为 {"summary": {...}}：问题数、去重后的 LLM 调用数、失败数与各阶段耗时
+    """
+    ensure_ready()
+    requests = batch.questions
+    if len(requests) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"单次最多 {BATCH_MAX_QUESTIONS} 个问题，收到 {len(requests)} 个")
+    timer = StageTimer()
+    try:
+        plans = await asyncio.to_thread(plan_answers_batch, requests, snapshot, timer)
+    except Exception as e:
+        logger.exception(f"错误: {str(e)}")
+        record_timings(timer, "/ask/batch", "error")
         raise HTTPException(status_code=500, detail=str(e))
+    
+    groups: Dict[str, List[int]] = {}
+    for i, (request, plan) in enumerate(zip(requests, plans)):
+        groups.setdefault(batch_dedupe_key(request, plan), []).append(i)
+    semaphore = asyncio.Semaphore(max(1, BATCH_LLM_CONCURRENCY))
+    
+    async def answer_group(positions: List[int]) -> Tuple[List[int], Optional[str], Optional[str]]:
+        async with semaphore:
+            first = positions[0]
+            try:
+                return positions, await answer_plan(requests[first], plans[first]), None
+            except Exception as e:
+                logger.error(f"❌ 批量问答第 {first} 个问题出错: {e}")
+                return positions, None, str(e)
+    
+    async def ndjson_stream():
+        tasks = [asyncio.create_task(answer_group(positions)) for positions in groups.values()]
+        failed = 0
+        try:
+            with timer.stage("llm"):
+                for next_done in asyncio.as_completed(tasks):
+                    positions, answer, error = await next_done
+                    for i in positions:
+                        if error is not None:
+                            failed += 1
+                            line = {"index": i, "error": error}
+                        else:
+                            line = {
+                                "index": i,
+                                "question": requests[i].question,
+                                "answer": answer,
+                                "relevant_chunks": plans[i].relevant_chunks,
+                                "source": plans[i].source,
+                                "game_name": plans[i].display_game_name,
+                            }
+                        yield json.dumps(line, ensure_ascii=False) + "\n"
+        finally:
+            # 客户端断开时不再继续调用 LLM
+            for task in tasks:
+                task.cancel()
+        
+        record_timings(timer, "/ask/batch", "batch")
+        summary = {"questions": len(requests), "llm_calls": len(groups), "failed": failed, "timings": timer.as_dict()}
+        yield json.dumps({"summary": summary}, ensure_ascii=False) + "\n"
+    
+    return StreamingResponse(
+        ndjson_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Server-Timing": timer.header()}
+    )
+
+@app.post("/admin/reload")
+async def admin_reload(x_admin_token: Optional[str] = Header(None)):
+    """
+    热更新向量存储：后台加载新存储并构建索引，完成后原子切换，服务不中断
+    需要设置环境变量 ADMIN_TOKEN，并在请求头 X-Admin-Token 中提供
+    """
+    admin_token = os.getenv('ADMIN_TOKEN')
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="未配置 ADMIN_TOKEN，管理接口已禁用")
+    if x_admin_token != admin_token:
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+    
+    start = time.perf_counter()
+    try:
+        new_snapshot = await reload_vectors()
+    except (FileNotFoundError, ValueError) as e:
+        raise HTTPException(status_code=500, detail=f"加载向量存储失败，继续使用当前版本: {e}")
+    return {
+        "status": "reloaded",
+        "reload_ms": round((time.perf_counter() - start) * 1000, 1),
+        **new_snapshot.summary()
+    }
+
+@app.get("/metrics")
+async def metrics():
+    """
+    Prometheus 指标（文本格式 0.0.4）：各阶段耗时、请求总耗时直方图与请求计数
+    多进程部署时只包含处理本次抓取的工作进程的数据
+    """
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/health")
 async def health_check():
     """
-    健康检查接口
+    健康检查接口：ready 为 true 时才能处理问答请求（快速启动模式下模型加载完成前为 false）
     """
+    snap = snapshot
     return {
-        "status": "healthy",
+        "status": "healthy" if is_ready() else "starting",
+        "ready": is_ready(),
+        "worker_pid": os.getpid(),
         "model_loaded": model is not None,
-        "vectors_loaded": chunks is not None and embeddings is not None,
-        "chunks_count": len(chunks) if chunks else 0
+        "model_loader": model_loader.stats() if model_loader else None,
+        "vectors_loaded": snap is not None,
+        "chunks_count": len(snap.chunks) if snap else 0,
+        "retriever": snap.retriever.name if snap else None,
+        "hybrid_retrieval": snap.lexical_index is not None if snap else False,
+        "games": snap.game_catalog.titles if snap else [],
+        "vector_store": snap.summary() if snap else None,
+        "store_watcher": store_watcher.stats() if store_watcher else None,
+        "embedding_cache": embedding_cache.stats(),
+        "batch_encoder": batch_encoder.stats() if batch_encoder else None,
+        "answer_cache": answer_cache.stats(),
+        "guide_store": guide_store.stats()
     }
 
 if __name__ == '__main__':
-    import uvicorn
-    print("\n" + "="*50)
-    print("🚀 FastAPI 服务启动中...")
-    print("="*50)
-    print(f"📖 API 文档: http://localhost:8000/docs")
-    print(f"❤️  健康检查: http://localhost:8000/health")
-    print(f"🌐 服务地址: http://localhost:8000")
-    print("="*50 + "\n")
-    # 使用导入字符串方式以支持 reload
-    uvicorn.run("index:app", host="127.0.0.1", port=8000, reload=True)
+    # 启动参数见 serve.py：--workers 多进程部署，--reload 开发模式
+    from serve import main
+    main()
@@ -0,0 +1,309 @@
+"""
+流式并行导入：把大量攻略文件（或目录）导入为一个向量存储，不需要把全部内容读入内存
+
+流程：
+1. 逐行读取每个文件，在 <<游戏名>> 处切分，以生成器逐段产出
+2. 各段在进程池中并行分块（split_text_into_chunks）
+3. chunk 按固定批大小编码，编码结果追加写入存储的临时文件
+4. 每写完一批记录检查点（已完整写入的最后一个段），中断后使用 --resume 从检查点继续
+5. 全部完成后原子替换正式存储
+
+与 vectorize_guide.py 的区别：分块以 <<游戏名>> 段为单位，不同游戏的段落不会合并进同一个 chunk。
+
+用法:
+    python ingest_guides.py guides/ --output guide_vectors.npy
+    python ingest_guides.py a.txt b.txt --workers 8 --batch-size 256
+    python ingest_guides.py guides/ --resume
+"""
+import os
+import re
+import json
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from vector_store import StoreAppender, store_paths, normalize_rows, APPEND_DTYPES
+from vectorize_guide import split_text_into_chunks, MODEL_NAME
+from embedding_model import encoder_metadata
+
+GAME_MARKER = re.compile(r'<<([^>>]+)>>')
+
+
+def iter_guide_files(paths: Iterable[str], pattern: str = '.txt') -> List[str]:
+    """
+    展开输入路径：文件原样保留，目录递归查找后缀为 pattern 的文件（按路径排序，保证顺序稳定）
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, name) for name in names if name.endswith(pattern))
+            files.extend(sorted(found))
+        elif os.path.exists(path):
+            files.append(path)
+        else:
+            raise FileNotFoundError(f"文件 {path} 不存在")
+    return files
+
+
+def iter_sections(path: str) -> Iterator[Tuple[Optional[str], str]]:
+    """
+    逐行读取攻略文件，在 <<游戏名>> 处切分，逐段产出 (游戏名, 段落文本)
+    内存中只保留当前段；第一个标记之前的内容游戏名为 None
+    """
+    game_name: Optional[str] = None
+    lines: List[str] = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            match = GAME_MARKER.search(line)
+            if match is None:
+                lines.append(line)
+                continue
+            # 标记之前的内容属于上一段
+            head = line[:match.start()]
+            if head:
+                lines.append(head)
+            if any(part.strip() for part in lines):
+                yield game_name, ''.join(lines)
+            game_name = match.group(1).strip()
+            lines = [line[match.start():]]
+    if any(part.strip() for part in lines):
+        yield game_name, ''.join(lines)
+
+
+def chunk_section(args: Tuple[str, int, int]) -> List[str]:
+    """
+    进程池中执行的分块函数
+    """
+    text, chunk_size, overlap = args
+    return split_text_into_chunks(text, chunk_size=chunk_size, overlap=overlap)
+
+
+def ordered_map(executor: Executor, func: Callable, items: Iterable, max_pending: int) -> Iterator:
+    """
+    与 executor.map 相同（结果按输入顺序产出），但最多同时提交 max_pending 个任务，
+    输入是生成器时不会被一次性读完
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def file_signature(path: str) -> dict:
+    stat = os.stat(path)
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def checkpoint_path(output_file: str) -> str:
+    return os.path.splitext(store_paths(output_file)[0])[0] + '.ingest.json'
+
+
+def write_checkpoint(output_file: str, checkpoint: dict):
+    path = checkpoint_path(output_file)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(output_file: str, files: List[str], encoder: Optional[dict] = None) -> Optional[dict]:
+    """
+    读取检查点；输入文件列表或已完成的文件内容发生变化、或编码器（见 encoder_metadata）不同时检查点无效
+    """
+    path = checkpoint_path(output_file)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    signatures = [file_signature(file) for file in files]
+    if checkpoint.get('files') != signatures:
+        print("⚠️  输入文件与检查点记录不一致，忽略检查点并重新开始")
+        return None
+    if checkpoint.get('encoder') != encoder:
+        print("⚠️  编码器与检查点记录不一致，忽略检查点并重新开始")
+        return None
+    return checkpoint
+
+
+class IngestProgress:
+    """
+    记录已完整写入存储的最后一个段，用于生成检查点
+
+    每个 chunk 携带它所属的 (文件序号, 段序号)；某个段的最后一个 chunk 写入后，
+    该段及其之前的所有段就都已完整写入。
+    """
+
+    def __init__(self, file_index: int = 0, section_index: int = -1, rows: int = 0, chunk_bytes: int = 0):
+        self.file_index = file_index
+        self.section_index = section_index
+        self.rows = rows
+        self.chunk_bytes = chunk_bytes
+
+    def advance(self, positions: List[Tuple[int, int, bool]], offsets: List[int], first_row: int):
+        """
+        positions: 本批每个 chunk 的 (文件序号, 段序号, 是否为该段最后一个 chunk)
+        offsets: 每行写入后 chunk 文本文件的字节数
+        """
+        for row, ((file_index, section_index, is_last), offset) in enumerate(zip(positions, offsets)):
+            if is_last:
+                self.file_index, self.section_index = file_index, section_index
+                self.rows = first_row + row + 1
+                self.chunk_bytes = offset
+
+
+def ingest_guides(paths: List[str], output_file: str = 'guide_vectors.npy', chunk_size: int = 200,
+                  overlap: int = 50, batch_size: int = 256, workers: Optional[int] = None,
+                  dtype: str = 'float32', resume: bool = False,
+                  encode: Optional[Callable[[List[str]], np.ndarray]] = None,
+                  executor: Optional[Executor] = None) -> Tuple[str, str]:
+    """
+    流式导入攻略文件并生成向量存储
+
+    Args:
+        paths: 攻略文件或目录
+        output_file: 输出的向量存储路径
+        chunk_size / overlap: 分块参数（与 vectorize_guide.py 相同）
+        batch_size: 每批编码的 chunk 数，同时也是检查点间隔
+        workers: 分块进程数，None 表示 CPU 核数
+        dtype: 存储精度
+        resume: 从上次中断的检查点继续
+        encode: 编码函数（默认加载 sentence-transformers 模型）
+        executor: 分块使用的执行器（默认新建进程池）
+    返回: (向量文件路径, 元数据文件路径)
+    """
+    files = iter_guide_files(paths)
+    if not files:
+        raise FileNotFoundError("没有找到需要导入的攻略文件")
+    signatures = [file_signature(file) for file in files]
+    encoder = encoder_metadata()
+    checkpoint = load_checkpoint(output_file, files, encoder) if resume else None
+
+    if encode is None:
+        from embedding_model import embedding_backend, load_embedding_model
+        print(f"🤖 正在加载 sentence-transformers 模型 {MODEL_NAME}（后端: {embedding_backend()}）...")
+        model = load_embedding_model()
+
+        def encode(texts: List[str]) -> np.ndarray:
+            return model.encode(texts, batch_size=len(texts))
+
+    progress = IngestProgress()
+    appender: Optional[StoreAppender] = None
+    if checkpoint is not None:
+        progress = IngestProgress(checkpoint['file_index'], checkpoint['section_index'],
+                                  checkpoint['rows'], checkpoint['chunk_bytes'])
+        appender = StoreAppender(output_file, checkpoint['dim'], dtype=checkpoint['dtype'],
+                                 resume_rows=progress.rows, resume_bytes=progress.chunk_bytes)
+        dtype = checkpoint['dtype']
+        print(f"♻️  从检查点继续：已完成 {progress.rows} 个 chunks（文件 {progress.file_index + 1}/{len(files)}）")
+
+    start_file, start_section = progress.file_index, progress.section_index
+
+    def sections() -> Iterator[Tuple[int, int, str]]:
+        for file_index in range(start_file, len(files)):
+            for section_index, (_, text) in enumerate(iter_sections(files[file_index])):
+                if file_index == start_file and section_index <= start_section:
+                    continue
+                yield file_index, section_index, text
+
+    def save_checkpoint():
+        appender.flush()
+        write_checkpoint(output_file, {
+            'files': signatures,
+            'file_index': progress.file_index,
+            'section_index': progress.section_index,
+            'rows': progress.rows,
+            'chunk_bytes': progress.chunk_bytes,
+            'dim': appender.dim,
+            'dtype': appender.dtype,
+            'encoder': encoder,
+        })
+
+    def flush_batch(batch: List[str], positions: List[Tuple[int, int, bool]]):
+        nonlocal appender
+        vectors = normalize_rows(encode(batch))
+        if appender is None:
+            appender = StoreAppender(output_file, vectors.shape[1], dtype=dtype)
+        first_row = appender.rows
+        offsets = appender.append(batch, vectors)
+        progress.advance(positions, offsets, first_row)
+        save_checkpoint()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    max_pending = 4 * (workers or os.cpu_count() or 1)
+    start_time = time.perf_counter()
+    encoded = 0
+    batch: List[str] = []
+    positions: List[Tuple[int, int, bool]] = []
+    try:
+        work = sections()
+        located = deque()
+
+        def tasks():
+            for file_index, section_index, text in work:
+                located.append((file_index, section_index))
+                yield text, chunk_size, overlap
+
+        for section_chunks in ordered_map(executor, chunk_section, tasks(), max_pending):
+            file_index, section_index = located.popleft()
+            for i, chunk in enumerate(section_chunks):
+                batch.append(chunk)
+                positions.append((file_index, section_index, i == len(section_chunks) - 1))
+                if len(batch) == batch_size:
+                    flush_batch(batch, positions)
+                    encoded += len(batch)
+                    batch, positions = [], []
+                    elapsed = time.perf_counter() - start_time
+                    print(f"   已写入 {appender.rows} 个 chunks（文件 {file_index + 1}/{len(files)}，"
+                          f"{encoded / elapsed:.1f} chunks/秒）")
+        if batch:
+            flush_batch(batch, positions)
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if appender is None:
+        raise ValueError("攻略文件中没有可导入的内容")
+    paths_written = appender.finalize({
+        'model': MODEL_NAME, 'encoder': encoder, 'chunk_size': chunk_size, 'overlap': overlap,
+        'sources': [signature['path'] for signature in signatures],
+    })
+    os.remove(checkpoint_path(output_file))
+    print(f"✅ 导入完成：{appender.rows} 个 chunks，耗时 {time.perf_counter() - start_time:.1f} 秒")
+    return paths_written
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='流式并行导入攻略文件，生成向量存储')
+    parser.add_argument('paths', nargs='+', help='攻略文件或目录（目录下递归查找 .txt 文件）')
+    parser.add_argument('--output', type=str, default='guide_vectors.npy',
+                        help='输出的向量存储路径 (默认: guide_vectors.npy)')
+    parser.add_argument('--chunk-size', type=int, default=200, help='每个 chunk 的字符数 (默认: 200)')
+    parser.add_argument('--overlap', type=int, default=50, help='chunks 之间的重叠字符数 (默认: 50)')
+    parser.add_argument('--batch-size', type=int, default=256, help='每批编码的 chunk 数 (默认: 256)')
+    parser.add_argument('--workers', type=int, default=None, help='分块进程数 (默认: CPU 核数)')
+    parser.add_argument('--dtype', type=str, default='float32', choices=APPEND_DTYPES,
+                        help='向量存储精度 (默认: float32)。float16 内存减半，但打分约比 float32 慢 7 倍')
+    parser.add_argument('--resume', action='store_true', help='从上次中断的检查点继续')
+
+    args = parser.parse_args()
+
+    ingest_guides(
+        args.paths,
+        output_file=args.output,
+        chunk_size=args.chunk_size,
+        overlap=args.overlap,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        dtype=args.dtype,
+        resume=args.resume
+    )
@@ -0,0 +1,139 @@
+"""
+BM25 倒排索引：补充向量检索对精确词语（秘籍代码、指令、道具名）排序不佳的问题
+
+分词（tokenize）：
+- 英文/数字按词切分并转为小写，例如 "give railgun" -> give, railgun
+- 中日韩文字按字符二元组切分，例如 "无敌模式" -> 无敌, 敌模, 模式（单个字时保留单字）
+
+索引在加载向量存储时构建：每个词的倒排表保存 (chunk 行号, 预先计算好的 BM25 分量)，
+查询时只需取出问题中各词的倒排表并按行号累加，不需要再计算 tf / idf。
+出现在大量 chunk 中的词（倒排表超过 MAX_TERM_POSTINGS）在全量检索时只取分量最高的一部分，
+使单次查询的开销与语料规模基本无关；按游戏限定范围时用二分查找截取该范围内的倒排表。
+两路结果用 RRF（Reciprocal Rank Fusion）按名次融合，不需要对两种分数做归一化。
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from retriever import top_k_indices
+
+Rows = Union[slice, np.ndarray, None]
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9_]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+')
+RRF_K = 60
+MAX_TERM_POSTINGS = 2048     # 全量检索时每个词最多使用的倒排项数（按 BM25 分量从高到低）
+DENSE_ACCUMULATE_RATIO = 8  # 倒排表总长度超过 行数 / 8 时改用稠密数组累加
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    英文/数字按词切分，中日韩文字按字符二元组切分（先做 NFKC 归一化并转小写，全角字母与半角一致）
+    """
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(unicodedata.normalize('NFKC', text).lower()):
+        run = match.group()
+        if run[0] < '\u3040' or len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class BM25Index:
+    """
+    Args:
+        chunks: chunk 文本（行号与向量存储一致）
+        k1 / b: BM25 参数
+        max_term_postings: 全量检索时每个词最多使用的倒排项数
+    """
+    name = 'bm25'
+
+    def __init__(self, chunks: Iterable[str], k1: float = 1.2, b: float = 0.75,
+                 max_term_postings: int = MAX_TERM_POSTINGS):
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths: List[int] = []
+        for chunk in chunks:
+            tokens = tokenize(chunk)
+            lengths.append(len(tokens))
+            term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+        n = len(lengths)
+        doc_lengths = np.asarray(lengths, dtype=np.float32)
+        # 以 (词, 行号) 为键统计词频，结果按词排序，每个词的倒排表是一段连续区间
+        keys = np.asarray(term_ids, dtype=np.int64) * max(n, 1) + np.repeat(np.arange(n, dtype=np.int64), lengths)
+        keys, tf = np.unique(keys, return_counts=True)
+        terms, docs = np.divmod(keys, max(n, 1))
+        df = np.bincount(terms, minlength=len(vocabulary)).astype(np.float32)
+        idf = np.log1p((n - df + 0.5) / (df + 0.5))
+        average_length = float(doc_lengths.mean()) if n and doc_lengths.sum() else 1.0
+        tf = tf.astype(np.float32)
+        norm = k1 * (1 - b + b * doc_lengths[docs] / average_length)
+
+        self.vocabulary = vocabulary
+        self.count = n
+        self.docs = docs.astype(np.int32)
+        self.weights = (idf[terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=self.offsets[1:])
+
+        # 高频词：预先选出分量最高的 max_term_postings 个倒排项的位置
+        self.top_postings: Dict[int, np.ndarray] = {}
+        for term in np.flatnonzero(df > max_term_postings):
+            start, stop = self.offsets[term], self.offsets[term + 1]
+            best = np.argpartition(self.weights[start:stop], -max_term_postings)[-max_term_postings:]
+            self.top_postings[int(term)] = np.sort(best) + start
+
+    def __len__(self) -> int:
+        return self.count
+
+    def search(self, query: str, k: int, rows: Rows = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        返回 BM25 分数最高的 k 个行号与分数（只包含至少命中一个词的行），按分数降序
+        rows 可限定检索范围（slice 或行号数组，来自 game_index）
+        """
+        term_ids = {self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary}
+        if not term_ids or k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        spans = []
+        for t in term_ids:
+            start, stop = self.offsets[t], self.offsets[t + 1]
+            if isinstance(rows, slice):
+                # 每个词的倒排表按行号排序，二分查找截取连续行范围
+                start, stop = start + np.searchsorted(self.docs[start:stop], [rows.start, rows.stop])
+                spans.append(slice(start, stop))
+            elif rows is None and t in self.top_postings:
+                spans.append(self.top_postings[t])
+            else:
+                spans.append(slice(start, stop))
+        docs = np.concatenate([self.docs[span] for span in spans])
+        weights = np.concatenate([self.weights[span] for span in spans])
+
+        if rows is not None and not isinstance(rows, slice):
+            keep = np.isin(docs, rows)
+            docs, weights = docs[keep], weights[keep]
+        if docs.shape[0] == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        if docs.shape[0] * DENSE_ACCUMULATE_RATIO > self.count:
+            scores = np.bincount(docs, weights=weights, minlength=self.count)
+            matched = np.flatnonzero(scores)
+            scores = scores[matched]
+        else:
+            matched, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights)
+        local = top_k_indices(scores, k)
+        return matched[local].astype(np.int64), scores[local].astype(np.float32)
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Iterable[int]], k: int = RRF_K,
+                           limit: Optional[int] = None) -> List[int]:
+    """
+    RRF 融合多路检索结果：每一路中排名第 r（从 1 开始）的行得分 1 / (k + r)，按总分降序返回行号
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused, key=fused.get, reverse=True)
+    return ordered[:limit] if limit is not None else ordered
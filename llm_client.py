@@ -0,0 +1,123 @@
+"""
+异步 LLM 客户端：通过 httpx 连接池调用 DeepSeek（OpenAI 兼容）的 chat/completions 接口
+
+- 复用 keep-alive 连接，避免每次请求重新握手
+- 信号量限制同时进行的 LLM 调用数；长篇攻略生成单独限流，慢请求不会占满短回答的名额
+- 连接/读取超时可配置
+
+环境变量：
+- DEEPSEEK_API_KEY: API 密钥
+- DEEPSEEK_API_BASE: 接口地址（默认 https://api.deepseek.com/v1）
+- LLM_MAX_CONCURRENCY: 普通回答的最大并发调用数（默认 16）
+- LLM_MAX_GENERATIONS: 长篇攻略生成的最大并发调用数（默认 4）
+- LLM_TIMEOUT: 单次调用超时秒数（默认 60）
+"""
+import os
+import json
+import asyncio
+from typing import AsyncIterator, List, Optional
+import httpx
+
+DEFAULT_API_BASE = "https://api.deepseek.com/v1"
+DEFAULT_MODEL = "deepseek-chat"
+
+
+class LLMClient:
+    """
+    OpenAI 兼容接口的异步客户端
+
+    transport 用于替换 httpx 的传输层（测试时传入 httpx.MockTransport 或挂载桩服务的 httpx.ASGITransport）
+    """
+
+    def __init__(self, api_key: str, api_base: str = DEFAULT_API_BASE, max_concurrency: int = 16,
+                 max_generations: int = 4, timeout: float = 60.0, connect_timeout: float = 5.0,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.api_base = api_base.rstrip('/')
+        self._semaphores = {
+            'answer': asyncio.Semaphore(max_concurrency),
+            'generate': asyncio.Semaphore(max_generations),
+        }
+        connections = max_concurrency + max_generations
+        self._client = httpx.AsyncClient(
+            base_url=self.api_base,
+            headers={"Authorization": f"Bearer {api_key}"},
+            timeout=httpx.Timeout(timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+            transport=transport,
+        )
+
+    async def chat(self, messages: List[dict], temperature: float = 0.7, max_tokens: int = 500,
+                   model: str = DEFAULT_MODEL, lane: str = 'answer') -> str:
+        """
+        调用 chat/completions，返回回答文本
+        lane: answer（普通回答）或 generate（长篇攻略生成），两类调用分别限流
+        失败时抛出 httpx.HTTPError 或 KeyError，由调用方决定如何降级
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+        async with self._semaphores[lane]:
+            response = await self._client.post("/chat/completions", json=payload)
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"].strip()
+
+    async def stream_chat(self, messages: List[dict], temperature: float = 0.7, max_tokens: int = 500,
+                          model: str = DEFAULT_MODEL, lane: str = 'answer') -> AsyncIterator[str]:
+        """
+        以流式方式调用 chat/completions（stream=True），逐段产出增量文本
+        整个流式响应期间占用一个并发名额
+        """
+        payload = {
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "stream": True,
+        }
+        async with self._semaphores[lane]:
+            async with self._client.stream("POST", "/chat/completions", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                    if delta:
+                        yield delta
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> Optional[LLMClient]:
+    """
+    返回全局 LLM 客户端；未配置 DEEPSEEK_API_KEY 时返回 None
+    """
+    global _client
+    if _client is None:
+        api_key = os.getenv('DEEPSEEK_API_KEY')
+        if not api_key:
+            return None
+        _client = LLMClient(
+            api_key,
+            api_base=os.getenv('DEEPSEEK_API_BASE', DEFAULT_API_BASE),
+            max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '16')),
+            max_generations=int(os.getenv('LLM_MAX_GENERATIONS', '4')),
+            timeout=float(os.getenv('LLM_TIMEOUT', '60')),
+        )
+    return _client
+
+
+async def close_llm_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
@@ -0,0 +1,175 @@
+"""
+ONNX Runtime 句向量编码器：CPU 上代替 PyTorch 做查询编码（动态 int8 量化）
+
+导出（只需一次，离线进行，只读取本地 Hugging Face 缓存中的模型）：
+    python onnx_encoder.py --output onnx_model
+生成的目录包含：
+- model.onnx           float32 导出
+- model_int8.onnx      动态 int8 量化（权重 int8，激活在运行时量化）
+- tokenizer.json       快速分词器（运行时只需要 tokenizers，不需要 torch / transformers）
+- encoder_config.json  最大长度、输入名、向量维度等
+
+运行时与 SentenceTransformer.encode 接口一致（mean pooling），可直接交给 BatchEncoder / vectorize_guide：
+    EMBEDDING_BACKEND=onnxruntime EMBEDDING_MODEL_PATH=onnx_model python index.py
+线程数由 ONNX_THREADS 设置（默认 0，即 ONNX Runtime 按物理核数决定）；
+多进程部署时 serve.py 按 CPU 核数 / 工作进程数为每个进程设置。
+ONNX Runtime 的线程池不能跨 fork 使用，因此该后端的模型总是在工作进程中各自加载。
+"""
+import json
+import os
+from typing import List, Optional, Union
+import numpy as np
+from embedding_model import MODEL_NAME
+
+EXPORT_DIR = 'onnx_model'
+FP32_FILE = 'model.onnx'
+INT8_FILE = 'model_int8.onnx'
+CONFIG_FILE = 'encoder_config.json'
+
+
+def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """
+    按 attention mask 对 token 向量求平均（与 sentence-transformers 的 mean pooling 一致，padding 不参与）
+    """
+    mask = attention_mask[..., None].astype(np.float32)
+    counts = np.maximum(mask.sum(axis=1), 1e-9)
+    return (hidden * mask).sum(axis=1) / counts
+
+
+class OnnxEncoder:
+    """
+    Args:
+        model_dir: export_onnx 生成的目录
+        file_name: 使用的 ONNX 文件（默认 model_int8.onnx）
+        threads: 推理线程数，0 表示由 ONNX Runtime 决定（默认读取 ONNX_THREADS）
+    """
+
+    def __init__(self, model_dir: str = EXPORT_DIR, file_name: Optional[str] = None, threads: Optional[int] = None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, CONFIG_FILE), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        self.input_names: List[str] = config['inputs']
+        self.max_seq_length: int = config['max_seq_length']
+        self.dim: int = config['dim']
+        self.normalize: bool = config.get('normalize', False)
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=self.max_seq_length)
+        self.tokenizer.enable_padding(pad_id=config['pad_token_id'], pad_token=config['pad_token'])
+
+        if threads is None:
+            threads = int(os.getenv('ONNX_THREADS', '0'))
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = max(0, threads)
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.path = os.path.join(model_dir, file_name or INT8_FILE)
+        self.session = ort.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        """
+        与 SentenceTransformer.encode 相同的调用方式（show_progress_bar 等其他参数忽略）
+        按长度排序后分批，同一批内 padding 最少
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        output = np.empty((len(texts), self.dim), dtype=np.float32)
+        order = np.argsort([-len(text) for text in texts], kind='stable')
+        for start in range(0, len(texts), max(1, batch_size)):
+            rows = order[start:start + max(1, batch_size)]
+            encodings = self.tokenizer.encode_batch([texts[i] for i in rows])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+                'attention_mask': mask,
+                'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {name: feeds[name] for name in self.input_names})[0]
+            output[rows] = mean_pool(hidden, mask)
+        if self.normalize:
+            output /= np.maximum(np.linalg.norm(output, axis=1, keepdims=True), 1e-12)
+        return output[0] if single else output
+
+
+def export_onnx(output_dir: str = EXPORT_DIR, model_name: str = MODEL_NAME, quantize: bool = True,
+                opset: int = 14) -> str:
+    """
+    从本地缓存加载 sentence-transformers 模型，导出为 ONNX 并做动态 int8 量化，返回输出目录
+    需要 torch、sentence-transformers、onnxruntime（仅导出时需要，运行时只需要 onnxruntime + tokenizers）
+    """
+    # 只使用本地缓存，不访问网络（必须在导入 huggingface_hub 之前设置）
+    os.environ.setdefault('HF_HUB_OFFLINE', '1')
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer(model_name, device='cpu')
+    transformer = st_model[0]
+    hf_model = transformer.auto_model.eval()
+    tokenizer = transformer.tokenizer
+    pooling_modes = st_model[1].get_pooling_mode_str() if len(st_model) > 1 else 'mean'
+    if pooling_modes != 'mean':
+        raise ValueError(f"只支持 mean pooling 的模型，当前为: {pooling_modes}")
+
+    sample = tokenizer(['雷神之锤2 秘籍 give railgun'], return_tensors='pt', padding=True,
+                       truncation=True, max_length=st_model.max_seq_length)
+    input_names = [name for name in ('input_ids', 'attention_mask', 'token_type_ids') if name in sample]
+
+    class HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(input_names, inputs)), return_dict=True).last_hidden_state
+
+    os.makedirs(output_dir, exist_ok=True)
+    fp32_path = os.path.join(output_dir, FP32_FILE)
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in input_names + ['last_hidden_state']}
+    with torch.no_grad():
+        torch.onnx.export(HiddenStates(hf_model), tuple(sample[name] for name in input_names), fp32_path,
+                          input_names=input_names, output_names=['last_hidden_state'],
+                          dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True)
+    print(f"✅ 已导出 float32 ONNX: {fp32_path}")
+
+    tokenizer.save_pretrained(output_dir)
+    config = {
+        'model': model_name,
+        'inputs': input_names,
+        'max_seq_length': st_model.max_seq_length,
+        'dim': st_model.get_sentence_embedding_dimension(),
+        'normalize': any(type(module).__name__ == 'Normalize' for module in st_model),
+        'pad_token': tokenizer.pad_token,
+        'pad_token_id': tokenizer.pad_token_id,
+    }
+    with open(os.path.join(output_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        int8_path = os.path.join(output_dir, INT8_FILE)
+        quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8)
+        print(f"✅ 已生成动态 int8 量化模型: {int8_path} "
+              f"({os.path.getsize(fp32_path) / 2**20:.0f} MB → {os.path.getsize(int8_path) / 2**20:.0f} MB)")
+    return output_dir
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='将句向量模型导出为 ONNX（动态 int8 量化）')
+    parser.add_argument('--output', type=str, default=EXPORT_DIR, help=f'输出目录 (默认: {EXPORT_DIR})')
+    parser.add_argument('--model', type=str, default=MODEL_NAME, help=f'模型名称或本地路径 (默认: {MODEL_NAME})')
+    parser.add_argument('--no-quantize', action='store_true', help='只导出 float32，不做 int8 量化')
+    args = parser.parse_args()
+    export_onnx(args.output, args.model, quantize=not args.no_quantize)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+低精度向量矩阵：float16 与逐行缩放的 int8
+
+- float16：直接存储半精度向量，内存减半
+- int8：每行一个缩放系数 scale = max(|v|) / 127，存储 round(v / scale)，内存为 float32 的 1/4
+
+QuantizedMatrix 按行块把低精度数据转换为 float32 再做矩阵-向量乘法，
+每块只占几百 KB，转换结果留在 CPU 缓存中，扫描时读取的内存量只有 float32 的 1/2 或 1/4。
+int8 的缩放系数对一行中所有维度相同，先用整数值打分再乘以缩放系数即可，不需要先反量化整个矩阵。
+注意 NumPy 的 float16 → float32 转换较慢，float16 主要用于节省内存；int8 打分通常比 float32 更快。
+
+QuantizedMatrix 支持 shape / 切片 / 花式索引 / np.asarray（反量化为 float32），
+可以直接作为 Retriever 的 embeddings 使用。
+"""
+from typing import Optional, Tuple
+import numpy as np
+
+QUANTIZED_DTYPES = ('float16', 'int8')
+BLOCK_ROWS = 256  # 每次转换为 float32 的行数（384 维时约 384 KB，可留在 L2 缓存中）
+
+
+def quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    逐行对称量化为 int8
+    返回: (int8 矩阵, 每行的 float32 缩放系数)；零向量的缩放系数为 0
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    scales = np.abs(matrix).max(axis=1) / 127.0 if matrix.shape[0] else np.zeros(0, dtype=np.float32)
+    safe = np.where(scales > 0, scales, 1.0).astype(np.float32)
+    quantized = np.clip(np.rint(matrix / safe[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    Args:
+        data: float16 或 int8 矩阵（可以是内存映射）
+        scales: int8 时每行的缩放系数，float16 时为 None
+        block_rows: 分块打分时每块的行数
+    """
+
+    def __init__(self, data: np.ndarray, scales: Optional[np.ndarray] = None, block_rows: int = BLOCK_ROWS):
+        if data.dtype == np.int8 and scales is None:
+            raise ValueError("int8 矩阵需要每行的缩放系数")
+        if scales is not None and scales.shape[0] != data.shape[0]:
+            raise ValueError(f"缩放系数数量 {scales.shape[0]} 与行数 {data.shape[0]} 不一致")
+        self.data = data
+        self.scales = scales
+        self.block_rows = block_rows
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        return self.data.shape
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.data.dtype
+
+    @property
+    def ndim(self) -> int:
+        return self.data.ndim
+
+    @property
+    def nbytes(self) -> int:
+        return self.data.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def __len__(self) -> int:
+        return self.data.shape[0]
+
+    def __getitem__(self, rows) -> 'QuantizedMatrix':
+        """
+        按行选取（切片返回视图，行号数组返回副本），结果仍为 QuantizedMatrix
+        """
+        if isinstance(rows, (int, np.integer)):
+            rows = slice(rows, rows + 1)
+        scales = self.scales[rows] if self.scales is not None else None
+        return QuantizedMatrix(self.data[rows], scales, self.block_rows)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        matrix = self.data.astype(np.float32)
+        if self.scales is not None:
+            matrix *= self.scales[:, None]
+        return matrix if dtype is None else matrix.astype(dtype, copy=False)
+
+    def dot(self, query_vector: np.ndarray, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        与 float32 查询向量的点积，按行块转换后计算，结果写入 out（float32）
+        query_vector 也可以是 (dim, m) 的查询矩阵，此时结果为 (n, m)
+        """
+        n = self.data.shape[0]
+        query_vector = np.asarray(query_vector, dtype=np.float32)
+        if out is None:
+            out = np.empty((n,) + query_vector.shape[1:], dtype=np.float32)
+        block = np.empty((min(self.block_rows, n), self.data.shape[1]), dtype=np.float32)
+        for start in range(0, n, self.block_rows):
+            stop = min(start + self.block_rows, n)
+            rows = block[:stop - start]
+            rows[...] = self.data[start:stop]
+            np.dot(rows, query_vector, out=out[start:stop])
+        if self.scales is not None:
+            out *= self.scales.reshape((-1,) + (1,) * (out.ndim - 1))
+        return out
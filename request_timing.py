@@ -0,0 +1,76 @@
+"""
+请求内各阶段的耗时记录，输出为 Server-Timing 响应头
+
+每个阶段记录相对请求开始的起点与耗时；并行执行的阶段（例如问题编码与游戏名解析）起点相同、区间重叠。
+Server-Timing 头可以直接在浏览器开发者工具的 Timing 面板中查看：
+    Server-Timing: embed;dur=12.4, game;dur=0.3, retrieve;dur=3.1, llm;dur=812.0, total;dur=828.6
+"""
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Iterator, List, NamedTuple, TypeVar
+
+T = TypeVar('T')
+
+
+class Span(NamedTuple):
+    name: str
+    start_ms: float     # 相对请求开始的起点
+    duration_ms: float
+
+
+class StageTimer:
+    """
+    记录一个请求的各阶段耗时（只在事件循环线程中使用，不需要加锁）
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """
+        计时一个阶段；阶段内抛出异常时同样记录耗时
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.spans.append(Span(name, (start - self.origin) * 1000, (end - start) * 1000))
+
+    async def track(self, name: str, awaitable: Awaitable[T]) -> T:
+        """
+        等待 awaitable 并计时，便于与 asyncio.gather / create_task 组合
+        """
+        with self.stage(name):
+            return await awaitable
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.origin) * 1000
+
+    def header(self) -> str:
+        """
+        Server-Timing 响应头的值：各阶段按开始顺序排列，最后附加请求至今的总耗时
+        """
+        spans = sorted(self.spans, key=lambda span: span.start_ms)
+        parts = [f"{span.name};dur={span.duration_ms:.1f}" for span in spans]
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ", ".join(parts)
+
+    def as_dict(self) -> dict:
+        return {
+            'stages': [
+                {'name': span.name, 'start_ms': round(span.start_ms, 1), 'duration_ms': round(span.duration_ms, 1)}
+                for span in sorted(self.spans, key=lambda span: span.start_ms)
+            ],
+            'total_ms': round(self.elapsed_ms(), 1),
+        }
+
+    def summary(self) -> str:
+        """
+        单行文本，用于日志：阶段名 起点+耗时
+        """
+        spans = sorted(self.spans, key=lambda span: span.start_ms)
+        stages = " | ".join(f"{span.name} @{span.start_ms:.1f} +{span.duration_ms:.1f}ms" for span in spans)
+        return f"{stages} | 总计 {self.elapsed_ms():.1f}ms"
@@ -0,0 +1,385 @@
+"""
+向量检索后端：精确检索（NumPy 暴力搜索）与近似最近邻检索（IVF 倒排索引）
+
+所有后端都假设向量已做 L2 归一化，点积即余弦相似度。
+通过环境变量选择后端：
+- RETRIEVER_BACKEND: exact（默认）或 ivf
+- IVF_NPROBE: IVF 检索时探查的聚类数（默认 8）
+- RERANK_FACTOR: 低精度存储附带 float32 向量时，先取 k × RERANK_FACTOR 个候选再精确重排（默认 4，0 表示不重排）
+"""
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from vector_store import store_paths
+from quantization import QuantizedMatrix
+
+Rows = Union[slice, np.ndarray, None]
+SearchResult = Tuple[np.ndarray, np.ndarray]
+
+# 批量检索时一次矩阵-矩阵乘法的得分矩阵最多包含的元素数（行数 × 查询数，float32 约 64 MB）
+BATCH_SCORE_ELEMENTS = 16 * 2**20
+
+_score_buffers = threading.local()
+
+
+def score_embeddings(matrix: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+    """
+    计算归一化向量矩阵与查询向量的余弦相似度（单次矩阵-向量乘法）
+    低精度矩阵（QuantizedMatrix）按行块转换后打分
+    结果写入线程内复用的缓冲区，避免每次请求按语料规模分配内存；
+    返回值在同一线程下一次调用前有效
+    """
+    n = matrix.shape[0]
+    buffer = getattr(_score_buffers, 'scores', None)
+    if buffer is None or buffer.shape[0] < n:
+        buffer = np.empty(max(n, 1), dtype=np.float32)
+        _score_buffers.scores = buffer
+    out = buffer[:n]
+    if isinstance(matrix, QuantizedMatrix):
+        return matrix.dot(query_vector, out=out)
+    np.dot(matrix, query_vector, out=out)
+    return out
+
+
+def score_embeddings_batch(matrix: np.ndarray, query_matrix: np.ndarray) -> np.ndarray:
+    """
+    计算归一化向量矩阵与一批查询向量 (m, dim) 的余弦相似度，返回 (n, m)（单次矩阵-矩阵乘法）
+    """
+    queries = np.ascontiguousarray(np.asarray(query_matrix, dtype=np.float32).T)
+    if isinstance(matrix, QuantizedMatrix):
+        return matrix.dot(queries)
+    return np.dot(matrix, queries)
+
+
+def _group_by_rows(rows_list: Sequence[Rows]) -> Dict[object, List[int]]:
+    """
+    按检索范围分组查询：同一游戏（相同 slice 或同一个行号数组）的查询共用一次矩阵乘法
+    """
+    groups: Dict[object, List[int]] = {}
+    for i, rows in enumerate(rows_list):
+        if rows is None:
+            key = None
+        elif isinstance(rows, slice):
+            key = (rows.start, rows.stop)
+        else:
+            key = id(rows)
+        groups.setdefault(key, []).append(i)
+    return groups
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    返回分数最高的 k 个位置（按分数降序），使用 argpartition 避免全量排序
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(scores, -k)[-k:]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(scores[candidates])[::-1]]
+
+
+def _row_count(rows: Rows, total: int) -> int:
+    if rows is None:
+        return total
+    if isinstance(rows, slice):
+        return rows.stop - rows.start
+    return len(rows)
+
+
+class Retriever:
+    """
+    检索后端接口
+    search 返回 (行号数组, 相似度数组)，按相似度降序排列
+    rows 可限定检索范围（slice 或行号数组，来自 game_index）
+    """
+    name = 'base'
+
+    def __init__(self, embeddings: np.ndarray):
+        self.embeddings = embeddings
+
+    def search(self, query_vector: np.ndarray, k: int, rows: Rows = None) -> Tuple[np.ndarray, np.ndarray]:
+        raise NotImplementedError
+
+    def search_batch(self, query_matrix: np.ndarray, k: int,
+                     rows_list: Optional[Sequence[Rows]] = None) -> List[SearchResult]:
+        """
+        批量检索：query_matrix 为 (m, dim) 的查询矩阵，rows_list 为每个查询各自的检索范围
+        返回与查询一一对应的 search 结果；默认逐个调用 search
+        """
+        rows_list = rows_list if rows_list is not None else [None] * len(query_matrix)
+        return [self.search(query_matrix[i], k, rows_list[i]) for i in range(len(query_matrix))]
+
+
+class ExactRetriever(Retriever):
+    """
+    精确检索：对（限定范围内的）所有向量做一次矩阵-向量乘法
+    """
+    name = 'exact'
+
+    def search(self, query_vector: np.ndarray, k: int, rows: Rows = None) -> Tuple[np.ndarray, np.ndarray]:
+        if isinstance(rows, slice):
+            # 连续行范围直接切片打分，不复制向量
+            scores = score_embeddings(self.embeddings[rows], query_vector)
+            local = top_k_indices(scores, k)
+            return local + rows.start, scores[local]
+        if rows is not None:
+            # 分散的行号数组：只取出这些行打分（与 search_batch 相同），不对整个矩阵打分
+            scores = score_embeddings(self.embeddings[rows], query_vector)
+            local = top_k_indices(scores, k)
+            return rows[local], scores[local]
+        scores = score_embeddings(self.embeddings, query_vector)
+        indices = top_k_indices(scores, k)
+        return indices, scores[indices]
+
+    def search_batch(self, query_matrix: np.ndarray, k: int,
+                     rows_list: Optional[Sequence[Rows]] = None) -> List[SearchResult]:
+        """
+        同一检索范围（游戏）的查询合并为一次矩阵-矩阵乘法，只对该游戏的行打分；
+        查询数较多时按 BATCH_SCORE_ELEMENTS 分块，限制得分矩阵的内存
+        """
+        rows_list = rows_list if rows_list is not None else [None] * len(query_matrix)
+        results: List[Optional[SearchResult]] = [None] * len(query_matrix)
+        for positions in _group_by_rows(rows_list).values():
+            rows = rows_list[positions[0]]
+            matrix = self.embeddings if rows is None else self.embeddings[rows]
+            offset = rows.start if isinstance(rows, slice) else 0
+            step = max(1, BATCH_SCORE_ELEMENTS // max(matrix.shape[0], 1))
+            for start in range(0, len(positions), step):
+                block = positions[start:start + step]
+                scores = score_embeddings_batch(matrix, query_matrix[block])
+                for column, position in enumerate(block):
+                    column_scores = scores[:, column]
+                    local = top_k_indices(column_scores, k)
+                    indices = local + offset if rows is None or isinstance(rows, slice) else rows[local]
+                    results[position] = (indices, column_scores[local])
+        return results
+
+
+class RerankRetriever(Retriever):
+    """
+    低精度检索 + 精确重排：先由内部后端在低精度矩阵上取 k × factor 个候选，
+    再用 float32 向量（通常为内存映射，只读取候选行）重新打分并取前 k 个
+
+    Args:
+        inner: 在低精度矩阵上检索的后端
+        vectors: 与 inner.embeddings 行对应的 float32 归一化向量
+        factor: 候选数相对 k 的倍数
+    """
+
+    def __init__(self, inner: Retriever, vectors: np.ndarray, factor: int = 4):
+        super().__init__(inner.embeddings)
+        if vectors.shape != inner.embeddings.shape:
+            raise ValueError(f"重排向量形状 {vectors.shape} 与检索矩阵形状 {inner.embeddings.shape} 不一致")
+        self.inner = inner
+        self.vectors = vectors
+        self.factor = factor
+        self.name = f'{inner.name}+rerank'
+
+    def search(self, query_vector: np.ndarray, k: int, rows: Rows = None) -> Tuple[np.ndarray, np.ndarray]:
+        candidates, _ = self.inner.search(query_vector, k * self.factor, rows)
+        return self._rerank(query_vector, candidates, k)
+
+    def search_batch(self, query_matrix: np.ndarray, k: int,
+                     rows_list: Optional[Sequence[Rows]] = None) -> List[SearchResult]:
+        batch = self.inner.search_batch(query_matrix, k * self.factor, rows_list)
+        return [self._rerank(query_matrix[i], candidates, k) for i, (candidates, _) in enumerate(batch)]
+
+    def _rerank(self, query_vector: np.ndarray, candidates: np.ndarray, k: int) -> SearchResult:
+        candidates = np.sort(candidates)
+        scores = np.asarray(self.vectors[candidates], dtype=np.float32) @ query_vector
+        local = top_k_indices(scores, k)
+        return candidates[local], scores[local]
+
+
+def _assign_clusters(matrix: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+    """
+    分批把向量分配到最相似的聚类中心，避免一次性生成 n × nlist 的相似度矩阵
+    """
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], batch_size):
+        block = np.asarray(matrix[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_ivf(embeddings: np.ndarray, nlist: Optional[int] = None, iterations: int = 10,
+              sample_size: int = 65536, seed: int = 0) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    训练 IVF 索引（球面 k-means）
+    返回: (聚类中心, 每个聚类在 order 中的起始偏移, 按聚类排列的行号)
+    """
+    n = embeddings.shape[0]
+    if nlist is None:
+        nlist = max(1, int(np.sqrt(n)))
+    nlist = max(1, min(nlist, n))
+
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(n, size=min(n, max(sample_size, nlist)), replace=False))
+    sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+
+    centroids = sample[rng.choice(sample.shape[0], size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        labels = _assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        counts = np.bincount(labels, minlength=nlist)
+        empty = counts == 0
+        # 空聚类重新随机取一个样本作为中心
+        if empty.any():
+            sums[empty] = sample[rng.choice(sample.shape[0], size=int(empty.sum()))]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+
+    assignments = _assign_clusters(embeddings, centroids)
+    order = np.argsort(assignments, kind='stable').astype(np.int64)
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignments, minlength=nlist), out=offsets[1:])
+    return centroids, offsets, order
+
+
+class IVFRetriever(Retriever):
+    """
+    IVF 近似检索：先与聚类中心打分，只在最相似的 nprobe 个聚类内做精确打分
+    限定范围较小时（例如单个游戏的 chunks）直接退化为精确检索
+    """
+    name = 'ivf'
+
+    def __init__(self, embeddings: np.ndarray, centroids: np.ndarray, offsets: np.ndarray,
+                 order: np.ndarray, nprobe: int = 8, exact_threshold: int = 20000):
+        super().__init__(embeddings)
+        self.centroids = centroids
+        self.offsets = offsets
+        self.order = order
+        self.nprobe = nprobe
+        self.exact_threshold = exact_threshold
+        self._exact = ExactRetriever(embeddings)
+
+    @classmethod
+    def build(cls, embeddings: np.ndarray, nlist: Optional[int] = None, **kwargs) -> 'IVFRetriever':
+        centroids, offsets, order = train_ivf(embeddings, nlist=nlist)
+        return cls(embeddings, centroids, offsets, order, **kwargs)
+
+    def _candidates(self, query_vector: np.ndarray) -> np.ndarray:
+        probe = top_k_indices(self.centroids @ query_vector, self.nprobe)
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+
+    def search(self, query_vector: np.ndarray, k: int, rows: Rows = None) -> Tuple[np.ndarray, np.ndarray]:
+        if _row_count(rows, self.embeddings.shape[0]) <= self.exact_threshold:
+            return self._exact.search(query_vector, k, rows)
+
+        candidates = self._candidates(query_vector)
+        if isinstance(rows, slice):
+            candidates = candidates[(candidates >= rows.start) & (candidates < rows.stop)]
+        elif rows is not None:
+            candidates = candidates[np.isin(candidates, rows)]
+        if candidates.shape[0] < k:
+            return self._exact.search(query_vector, k, rows)
+
+        candidates.sort()
+        scores = np.asarray(self.embeddings[candidates], dtype=np.float32) @ query_vector
+        local = top_k_indices(scores, k)
+        return candidates[local], scores[local]
+
+    def search_batch(self, query_matrix: np.ndarray, k: int,
+                     rows_list: Optional[Sequence[Rows]] = None) -> List[SearchResult]:
+        """
+        检索范围较小的查询（单个游戏）合并交给精确检索批量打分，其余逐个探查聚类
+        """
+        rows_list = rows_list if rows_list is not None else [None] * len(query_matrix)
+        total = self.embeddings.shape[0]
+        small = [i for i, rows in enumerate(rows_list) if _row_count(rows, total) <= self.exact_threshold]
+        results: List[Optional[SearchResult]] = [None] * len(query_matrix)
+        if small:
+            exact = self._exact.search_batch(query_matrix[small], k, [rows_list[i] for i in small])
+            for i, result in zip(small, exact):
+                results[i] = result
+        for i, rows in enumerate(rows_list):
+            if results[i] is None:
+                results[i] = self.search(query_matrix[i], k, rows)
+        return results
+
+    def save(self, path: str, store_id: str = ''):
+        """
+        store_id 为训练时向量存储的标识（元数据中的 store_id，见 vector_store.new_store_id），加载时据此判断索引是否过期
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, centroids=self.centroids, offsets=self.offsets, order=self.order,
+                     count=np.int64(self.embeddings.shape[0]), store_id=np.str_(store_id))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, embeddings: np.ndarray, store_id: Optional[str] = None,
+             **kwargs) -> Optional['IVFRetriever']:
+        """
+        加载持久化的 IVF 索引；与当前向量存储不一致时返回 None
+        提供 store_id 时还要求与训练时的存储标识相同：存储重建后行数与维度不变也视为过期
+        （未记录标识的旧索引同样视为过期）；复制文件等只改变修改时间的操作不影响
+        """
+        with np.load(path) as data:
+            if int(data['count']) != embeddings.shape[0] or data['centroids'].shape[1] != embeddings.shape[1]:
+                return None
+            saved_store_id = str(data['store_id']) if 'store_id' in data.files else ''
+            if store_id is not None and saved_store_id != store_id:
+                return None
+            return cls(embeddings, data['centroids'], data['offsets'], data['order'], **kwargs)
+
+
+def ann_index_path(base_path: str, backend: str = 'ivf') -> str:
+    """
+    返回与向量存储配套的 ANN 索引文件路径，例如 guide_vectors.ivf.npz
+    """
+    npy_path, _ = store_paths(base_path)
+    return os.path.splitext(npy_path)[0] + f'.{backend}.npz'
+
+
+def build_ann_index(base_path: str, embeddings: np.ndarray, nlist: Optional[int] = None,
+                    store_id: str = '') -> str:
+    """
+    训练并保存 IVF 索引（由 vectorize_guide.py 调用），store_id 为当前向量存储的标识
+    """
+    path = ann_index_path(base_path, 'ivf')
+    IVFRetriever.build(embeddings, nlist=nlist).save(path, store_id=store_id)
+    return path
+
+
+def create_retriever(embeddings: np.ndarray, base_path: str, backend: Optional[str] = None,
+                     rerank_vectors: Optional[np.ndarray] = None,
+                     store_id: Optional[str] = None) -> Retriever:
+    """
+    根据配置创建检索后端
+    ivf 后端优先加载持久化索引，不存在或已过期（行数、维度或存储标识 store_id 不一致）时在进程内重新训练
+    提供 rerank_vectors（低精度存储附带的 float32 向量）且 RERANK_FACTOR > 0 时，外层包一层精确重排
+    """
+    retriever = _create_backend(embeddings, base_path, backend, store_id)
+    factor = int(os.getenv('RERANK_FACTOR', '4'))
+    if rerank_vectors is not None and factor > 0:
+        print(f"✅ 检索结果将使用 float32 向量精确重排（候选数 k × {factor}）")
+        return RerankRetriever(retriever, rerank_vectors, factor)
+    return retriever
+
+
+def _create_backend(embeddings: np.ndarray, base_path: str, backend: Optional[str] = None,
+                    store_id: Optional[str] = None) -> Retriever:
+    backend = (backend or os.getenv('RETRIEVER_BACKEND', 'exact')).lower()
+    if backend == 'exact':
+        return ExactRetriever(embeddings)
+    if backend != 'ivf':
+        raise ValueError(f"未知的检索后端 {backend}，可选: exact, ivf")
+
+    nprobe = int(os.getenv('IVF_NPROBE', '8'))
+    path = ann_index_path(base_path, 'ivf')
+    if os.path.exists(path):
+        retriever = IVFRetriever.load(path, embeddings, store_id=store_id, nprobe=nprobe)
+        if retriever is not None:
+            print(f"✅ 已加载 IVF 索引: {path} ({retriever.centroids.shape[0]} 个聚类, nprobe={nprobe})")
+            return retriever
+        print(f"⚠️  IVF 索引 {path} 与向量存储不一致，将重新训练")
+    else:
+        print(f"⚠️  未找到 IVF 索引 {path}，将在进程内训练（可运行 vectorize_guide.py --ann ivf 预先生成）")
+    return IVFRetriever.build(embeddings, nprobe=nprobe)
@@ -0,0 +1,168 @@
+"""
+生产环境启动：多个工作进程共享同一份向量存储与模型
+
+- 父进程先加载模型和向量存储，再 fork 出工作进程；工作进程的启动事件发现已加载时直接复用
+- 向量矩阵（及 int8 缩放系数、重排向量）是只读内存映射，所有进程共享操作系统页缓存，不随进程数增加内存
+- 模型权重、BM25 索引等 numpy / torch 缓冲区在 fork 后以写时复制方式共享；加载完成后执行 gc.freeze()，
+  避免垃圾回收扫描时写入对象头、把共享页复制到每个进程
+- 父进程只加载模型、不做任何编码：PyTorch 线程池在 fork 前初始化会导致工作进程死锁
+- 每个工作进程的推理线程数（PyTorch / ONNX_THREADS）为 CPU 核数 / 工作进程数，避免线程过量
+- ONNX 后端（EMBEDDING_BACKEND=onnx / onnxruntime）的推理会话不能跨 fork 使用，模型在每个工作进程中各自加载
+- 工作进程异常退出时自动重启；父进程收到 SIGINT / SIGTERM 时通知所有工作进程优雅退出
+- 不支持 fork 的平台（Windows）退回到 uvicorn 自带的多进程模式，每个工作进程各自加载模型（向量仍为内存映射）
+
+热更新（/admin/reload、VECTOR_WATCH_INTERVAL）在每个工作进程中独立进行；
+重新加载后该进程的 BM25 索引等不再与其他进程共享，需要完全共享时重启服务即可。
+
+用法:
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+    python serve.py --reload           # 开发模式：单进程，代码改动后自动重启
+    WEB_CONCURRENCY=4 python index.py  # 工作进程数也可以用环境变量设置
+"""
+import gc
+import os
+import signal
+import time
+import traceback
+from typing import Dict
+
+MIN_RESTART_INTERVAL = 1.0  # 工作进程启动后很快退出时，等待这么久再重启，避免崩溃循环
+
+
+def preload(vector_file: str, preload_model: bool = True):
+    """
+    fork 前在父进程中加载向量存储与模型
+    先加载向量再加载模型：构建快照时模型尚未加载，游戏目录不编码名称，父进程中不会调用 model.encode；
+    名称向量由工作进程的启动事件补上
+    """
+    import index
+
+    try:
+        index.load_vectors(vector_file)
+    except FileNotFoundError as e:
+        print(f"警告: {e}")
+    if preload_model:
+        index.load_model()
+    gc.collect()
+    gc.freeze()
+
+
+def limit_torch_threads(threads: int):
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+def run_worker(config, sock, threads: int):
+    import uvicorn
+
+    limit_torch_threads(threads)
+    # ONNX Runtime 会话在工作进程的启动事件中创建，读取该环境变量
+    os.environ.setdefault('ONNX_THREADS', str(threads))
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve_forked(host: str, port: int, workers: int, vector_file: str, preload_model: bool = True):
+    """
+    预加载后 fork 出 workers 个工作进程，共享同一个监听 socket
+    """
+    import uvicorn
+    import index
+    from embedding_model import fork_safe
+
+    if preload_model and not fork_safe():
+        print("ℹ️  当前模型后端不能跨 fork 共享，模型将在每个工作进程中各自加载")
+        preload_model = False
+    preload(vector_file, preload_model)
+    config = uvicorn.Config(index.app, host=host, port=port, lifespan='on')
+    sock = config.bind_socket()
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    children: Dict[int, float] = {}  # pid -> 启动时间
+    stopping = False
+
+    def spawn():
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                run_worker(config, sock, threads)
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    for _ in range(workers):
+        spawn()
+    print(f"✅ 已启动 {workers} 个工作进程（每个进程 {threads} 个推理线程）: {', '.join(map(str, children))}")
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+        print(f"⚠️  工作进程 {pid} 已退出（退出码 {os.waitstatus_to_exitcode(status)}），正在重启")
+        elapsed = time.monotonic() - started
+        if elapsed < MIN_RESTART_INTERVAL:
+            time.sleep(MIN_RESTART_INTERVAL - elapsed)
+        spawn()
+    sock.close()
+    print("👋 所有工作进程已退出")
+
+
+def main():
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='启动 RAG 问答服务')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='监听地址 (默认: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口 (默认: 8000)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '1')),
+                        help='工作进程数 (默认: 环境变量 WEB_CONCURRENCY 或 1)')
+    parser.add_argument('--reload', action='store_true', help='开发模式：代码改动后自动重启（仅单进程）')
+    parser.add_argument('--no-preload-model', action='store_true',
+                        help='不在 fork 前加载模型，每个工作进程各自加载（也可设置 PRELOAD_MODEL=0）')
+    args = parser.parse_args()
+
+    print("\n" + "="*50)
+    print("🚀 FastAPI 服务启动中...")
+    print("="*50)
+    print(f"📖 API 文档: http://{args.host}:{args.port}/docs")
+    print(f"❤️  健康检查: http://{args.host}:{args.port}/health")
+    print(f"🌐 服务地址: http://{args.host}:{args.port}")
+    print("="*50 + "\n")
+
+    if args.reload:
+        if args.workers > 1:
+            print("⚠️  --reload 只支持单进程，已忽略 --workers")
+        # 使用导入字符串方式以支持 reload
+        uvicorn.run("index:app", host=args.host, port=args.port, reload=True)
+    elif args.workers > 1 and hasattr(os, 'fork'):
+        vector_file = os.getenv('VECTOR_FILE', 'guide_vectors.npy')
+        preload_model = not args.no_preload_model and os.getenv('PRELOAD_MODEL', '1') != '0'
+        serve_forked(args.host, args.port, args.workers, vector_file, preload_model)
+    else:
+        uvicorn.run("index:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+向量存储快照与热更新
+
+一次加载得到的所有检索数据（chunks、向量矩阵、每个 chunk 的游戏名、游戏索引、检索后端、
+游戏目录与 BM25 索引）组成一个不可变的 VectorSnapshot。服务只持有一个指向当前快照的引用：
+重新加载时在后台构建新快照，完成后替换这一个引用即可。
+每个请求开始时取一次快照并在整个处理过程中使用它，因此进行中的请求始终看到一致的数据。
+"""
+import os
+import asyncio
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Union
+import numpy as np
+from retriever import Retriever
+from game_catalog import GameCatalog
+from lexical_index import BM25Index
+from vector_store import store_paths, file_fingerprint
+from quantization import QuantizedMatrix
+
+
+class VectorSnapshot(NamedTuple):
+    chunks: List[str]
+    embeddings: Union[np.ndarray, QuantizedMatrix]          # L2 归一化的向量矩阵（通常为内存映射，可为低精度）
+    chunk_game_names: List[Optional[str]]                   # 每个 chunk 所属的游戏名称
+    game_index: Dict[str, Union[slice, np.ndarray]]         # 归一化游戏名 -> 行范围
+    retriever: Retriever
+    game_catalog: GameCatalog
+    vector_file: str
+    fingerprint: str                                        # 存储文件指纹（回答缓存以此失效）
+    loaded_at: float
+    lexical_index: Optional[BM25Index] = None               # BM25 倒排索引（关闭混合检索时为 None）
+
+    def summary(self) -> dict:
+        return {
+            'vector_file': self.vector_file,
+            'fingerprint': self.fingerprint,
+            'chunks_count': len(self.chunks),
+            'games': self.game_catalog.titles,
+            'loaded_at': self.loaded_at,
+        }
+
+    def is_current(self) -> bool:
+        """
+        存储文件自加载以来是否未被重建（旧版 JSON 存储无法比较，视为未变化）
+        fork 前预加载的快照在工作进程（重新）启动时用它判断能否直接复用
+        """
+        npy_path, meta_path = store_paths(self.vector_file)
+        if not (os.path.exists(npy_path) and os.path.exists(meta_path)):
+            return True
+        return file_fingerprint(npy_path, meta_path) == self.fingerprint
+
+
+class StoreWatcher:
+    """
+    轮询向量存储的元数据文件，指纹变化时调用 on_change
+
+    存储写入时先替换 .npy 再替换 .meta.json，元数据文件变化即表示新存储已完整写入，
+    因此只需监视元数据文件。
+
+    Args:
+        vector_file: 向量存储路径
+        on_change: 存储变化时调用的协程函数
+        interval: 轮询间隔（秒）
+    """
+
+    def __init__(self, vector_file: str, on_change: Callable[[], Awaitable[object]], interval: float = 5.0):
+        self.meta_path = store_paths(vector_file)[1]
+        self.on_change = on_change
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self._fingerprint = self._current_fingerprint()
+        self._task: Optional[asyncio.Task] = None
+
+    def _current_fingerprint(self) -> Optional[str]:
+        if not os.path.exists(self.meta_path):
+            return None
+        return file_fingerprint(self.meta_path)
+
+    async def check(self) -> bool:
+        """
+        检查一次；存储发生变化并成功触发 on_change 时返回 True
+        """
+        fingerprint = await asyncio.to_thread(self._current_fingerprint)
+        if fingerprint is None or fingerprint == self._fingerprint:
+            return False
+        try:
+            await self.on_change()
+        except Exception as e:
+            # 新存储无法加载时保留旧快照继续服务，下次轮询不再重复尝试同一版本
+            self.errors += 1
+            print(f"❌ 向量存储热更新失败，继续使用当前版本: {e}")
+            self._fingerprint = fingerprint
+            return False
+        self._fingerprint = fingerprint
+        self.reloads += 1
+        return True
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval,
+            'reloads': self.reloads,
+            'errors': self.errors,
+            'running': self._task is not None,
+        }
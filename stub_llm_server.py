@@ -0,0 +1,75 @@
+"""
+本地 LLM 桩服务：模拟 DeepSeek 的 chat/completions 接口，用于评测（不消耗真实 API）
+
+max_tokens >= 1000 的请求（长篇攻略生成）按慢请求处理，其余为快请求。
+stream=True 时按 SSE 格式分段返回，总耗时与非流式相同，首段在一个快请求延迟后到达。
+
+用法:
+    python stub_llm_server.py --port 8765 --fast-ms 20 --slow-s 5
+"""
+import asyncio
+import json
+import threading
+import time
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+
+def create_stub_app(fast_ms: float = 20.0, slow_s: float = 5.0) -> FastAPI:
+    app = FastAPI(title="LLM 桩服务")
+
+    async def stream_tokens(content: str, delay: float):
+        await asyncio.sleep(fast_ms / 1000)
+        for char in content:
+            chunk = {"choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+            await asyncio.sleep(max(0.0, delay - fast_ms / 1000) / len(content))
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        slow = payload.get('max_tokens', 0) >= 1000
+        delay = slow_s if slow else fast_ms / 1000
+        content = "（桩服务）长篇攻略" if slow else "（桩服务）回答"
+
+        if payload.get('stream'):
+            return StreamingResponse(stream_tokens(content, delay), media_type="text/event-stream")
+
+        await asyncio.sleep(delay)
+        return {
+            "id": "stub",
+            "object": "chat.completion",
+            "model": payload.get('model'),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        }
+
+    return app
+
+
+def start_stub_server(port: int = 8765, fast_ms: float = 20.0, slow_s: float = 5.0) -> str:
+    """
+    在后台线程启动桩服务，返回可用作 DEEPSEEK_API_BASE 的地址
+    """
+    import uvicorn
+
+    config = uvicorn.Config(create_stub_app(fast_ms, slow_s), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}/v1"
+
+
+if __name__ == '__main__':
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='本地 LLM 桩服务')
+    parser.add_argument('--port', type=int, default=8765, help='监听端口 (默认: 8765)')
+    parser.add_argument('--fast-ms', type=float, default=20.0, help='快请求延迟，毫秒 (默认: 20)')
+    parser.add_argument('--slow-s', type=float, default=5.0, help='慢请求延迟，秒 (默认: 5)')
+    args = parser.parse_args()
+
+    uvicorn.run(create_stub_app(args.fast_ms, args.slow_s), host="127.0.0.1", port=args.port)
@@ -0,0 +1,76 @@
+"""
+AnswerCache 测试：存储指纹失效、TTL 过期、SQLite 命中后提升到内存 LRU
+
+运行: python -m pytest test_answer_cache.py -q
+"""
+import time
+import pytest
+from answer_cache import AnswerCache
+
+
+class FakeClock:
+    """
+    同时替换 time.time（磁盘层过期时间）与 time.monotonic（内存层过期时间）
+    """
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(time, 'time', lambda: self.now)
+        monkeypatch.setattr(time, 'monotonic', lambda: self.now)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+
+def make_cache(tmp_path, fingerprint='v1', **kwargs):
+    cache = AnswerCache(db_path=str(tmp_path / 'answers.db'), **kwargs)
+    cache.set_fingerprint(fingerprint)
+    return cache
+
+
+def test_fingerprint_change_invalidates_memory_and_disk(tmp_path):
+    key = AnswerCache.make_key('塞尔达怎么打', ['段落一', '段落二'], 'rag')
+    cache = make_cache(tmp_path)
+    cache.set(key, '回答')
+    assert cache.get(key) == '回答'
+
+    cache.set_fingerprint('v2')
+    assert len(cache.memory) == 0
+    assert cache.get(key) is None
+    # 旧存储的条目已从磁盘删除，切换回旧指纹也不会复活
+    cache.set_fingerprint('v1')
+    assert cache.get(key) is None
+    assert make_cache(tmp_path, 'v1').get(key) is None
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    cache = make_cache(tmp_path, ttl=10)
+    cache.set('k', '回答')
+    clock.advance(5)
+    assert cache.get('k') == '回答'
+    clock.advance(6)
+    assert cache.get('k') is None
+    # 另一个进程读取同一个 SQLite 文件也视为过期
+    assert make_cache(tmp_path, ttl=10).get('k') is None
+
+
+def test_disk_hit_is_promoted_to_memory_with_remaining_ttl(tmp_path, clock):
+    make_cache(tmp_path, ttl=10).set('k', '回答')
+    clock.advance(4)
+
+    cache = make_cache(tmp_path, ttl=10)  # 例如另一个工作进程，内存层为空
+    assert len(cache.memory) == 0
+    assert cache.get('k') == '回答'
+    assert cache.get('k') == '回答'
+    stats = cache.stats()
+    assert (stats['hits'], stats['disk_hits'], stats['misses']) == (2, 1, 0)
+    assert stats['memory']['hits'] == 1
+
+    # 提升到内存层的条目保留磁盘层剩余的 6 秒，而不是重新计算完整 TTL
+    clock.advance(7)
+    assert cache.get('k') is None
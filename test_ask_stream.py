@@ -0,0 +1,124 @@
+"""
+/ask/stream 测试：SSE 事件顺序 meta → token* → done，LLM 流式调用中途出错时以 error 事件结束（桩模型与桩 LLM 客户端）
+
+运行: python -m pytest test_ask_stream.py -q
+"""
+import asyncio
+import json
+import httpx
+import numpy as np
+import pytest
+from vector_store import save_vector_store
+
+pytest.importorskip('dotenv')
+index = pytest.importorskip('index')
+from answer_cache import AnswerCache
+
+
+class OnesModel:
+    def encode(self, texts, batch_size=32, **kwargs):
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+class StubLLMClient:
+    """
+    stream_chat 逐段产出 deltas；fail_after 不为 None 时产出这么多段后抛出异常
+    """
+
+    def __init__(self, deltas, fail_after=None):
+        self.deltas = deltas
+        self.fail_after = fail_after
+        self.calls = []
+
+    async def stream_chat(self, messages, **kwargs):
+        self.calls.append(messages)
+        for i, delta in enumerate(self.deltas):
+            if i == self.fail_after:
+                raise RuntimeError('LLM 连接中断')
+            yield delta
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    base = tmp_path / 'vectors'
+    chunks = ['<<塞尔达传说>> 第一章', '神庙在初始台地', '滑翔伞在第四座神庙后获得']
+    save_vector_store(str(base), chunks, np.ones((3, 4), dtype=np.float32))
+    monkeypatch.setattr(index, 'model', OnesModel())
+    monkeypatch.setattr(index, 'snapshot', None)
+    monkeypatch.setattr(index, 'batch_encoder', None)
+    monkeypatch.setattr(index, 'answer_cache', AnswerCache())
+    index.load_vectors(str(base) + '.npy')
+
+
+def post(path, payload):
+    """
+    通过 httpx.ASGITransport 在进程内调用应用（不触发 startup 事件，不加载真实模型）
+    fastapi 0.104 自带的 starlette TestClient 与 httpx 0.28 不兼容，这里直接使用它底层的 ASGI 传输层
+    """
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=index.app), base_url='http://test') as client:
+            return await client.post(path, json=payload)
+
+    return asyncio.run(run())
+
+
+def read_events(response):
+    events = []
+    for block in response.text.split('\n\n'):
+        if not block.strip():
+            continue
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def test_stream_sends_meta_then_tokens_then_done(store, monkeypatch):
+    llm = StubLLMClient(['神庙', '在初始', '台地。'])
+    monkeypatch.setattr(index, 'get_llm_client', lambda: llm)
+
+    response = post('/ask/stream', {'question': '塞尔达传说的神庙在哪里'})
+    assert response.status_code == 200
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = read_events(response)
+
+    names = [name for name, _ in events]
+    assert names == ['meta', 'token', 'token', 'token', 'done']
+    meta = events[0][1]
+    assert meta['source'] == 'rag' and meta['relevant_chunks']
+    assert [data['delta'] for name, data in events if name == 'token'] == llm.deltas
+    done = events[-1][1]
+    assert done['answer'] == '神庙在初始台地。'
+    assert done['saved'] is False
+    assert 'llm' in [stage['name'] for stage in done['timings']['stages']]
+    assert len(llm.calls) == 1
+
+    # 完整生成的回答写入缓存：相同问题直接以一条 token 返回，不再调用 LLM
+    events = read_events(post('/ask/stream', {'question': '塞尔达传说的神庙在哪里'}))
+    assert [name for name, _ in events] == ['meta', 'token', 'done']
+    assert events[-1][1]['answer'] == '神庙在初始台地。'
+    assert len(llm.calls) == 1
+
+
+def test_stream_ends_with_error_event_when_llm_fails(store, monkeypatch):
+    llm = StubLLMClient(['神庙', '在初始', '台地。'], fail_after=1)
+    monkeypatch.setattr(index, 'get_llm_client', lambda: llm)
+
+    response = post('/ask/stream', {'question': '塞尔达传说的滑翔伞怎么拿'})
+    assert response.status_code == 200
+    events = read_events(response)
+    assert [name for name, _ in events] == ['meta', 'token', 'error']
+    assert events[1][1] == {'delta': '神庙'}
+    assert 'LLM 连接中断' in events[-1][1]['detail']
+
+    # 中途失败的回答不写入缓存，重试时重新调用 LLM
+    llm.fail_after = None
+    events = read_events(post('/ask/stream', {'question': '塞尔达传说的滑翔伞怎么拿'}))
+    assert [name for name, _ in events][-1] == 'done'
+    assert len(llm.calls) == 2
+
+
+def test_stream_rejects_requests_before_ready(monkeypatch):
+    monkeypatch.setattr(index, 'model', None)
+    monkeypatch.setattr(index, 'model_loader', None)
+    response = post('/ask/stream', {'question': '塞尔达传说的神庙在哪里'})
+    assert response.status_code == 503
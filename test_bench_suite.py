@@ -0,0 +1,43 @@
+"""
+离线评测套件的数据构造测试：标注问题集与合成语料（不需要模型）
+
+运行: python -m pytest test_bench_suite.py -q
+"""
+import numpy as np
+from bench_suite import build_labelled_questions, gold_chunks, write_corpus, latency_summary
+from vector_store import load_vector_store, normalize_rows
+from vectorize_guide import load_guide_file, split_text_into_chunks
+
+
+def test_labelled_questions_point_at_guide_chunks():
+    text = load_guide_file()
+    chunks = split_text_into_chunks(text)
+    questions = build_labelled_questions(text)
+    assert {q.game for q in questions} == {'雷神之锤2', '合金装备'}
+    assert any(q.question == '雷神之锤2 穿墙模式的秘籍是什么' and q.answer_line == 'noclip =穿墙模式' for q in questions)
+    gold = gold_chunks(questions, chunks)
+    # 绝大多数问题都能找到包含答案的 chunk，且答案 chunk 属于问题所属游戏的段落
+    assert sum(1 for expected in gold if expected) >= 0.8 * len(questions)
+    assert all('noclip =穿墙模式' in chunk for chunk in gold[[q.answer_line for q in questions].index('noclip =穿墙模式')])
+    assert len(build_labelled_questions(text, limit=10)) == 10
+
+
+def test_synthetic_corpus_keeps_real_chunks_and_adds_games(tmp_path):
+    real_chunks = ['<<雷神之锤2>>\ngod =无敌\nnoclip =穿墙模式', 'give all =所有物品全满', '<<合金装备>>\n方向键 移动']
+    real_vectors = normalize_rows(np.random.default_rng(0).standard_normal((3, 16)).astype(np.float32))
+    npy_path = write_corpus(str(tmp_path / 'corpus'), real_chunks, real_vectors, total=53, chunks_per_game=10, noise=1.0)
+
+    chunks, embeddings, _ = load_vector_store(npy_path)
+    assert chunks[:3] == real_chunks and embeddings.shape == (53, 16)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1.0, atol=1e-5)
+    # 合成段落不含原游戏标记，每 10 个段落一个新游戏
+    markers = [chunk.split('\n', 1)[0] for chunk in chunks[3:] if chunk.startswith('<<')]
+    assert markers == [f'<<合成游戏 {g}>>' for g in range(5)]
+    assert not any('<<雷神之锤2>>' in chunk or '<<合金装备>>' in chunk for chunk in chunks[3:])
+
+
+def test_latency_summary():
+    summary = latency_summary([1.0, 2.0, 3.0, 4.0])
+    assert summary['count'] == 4 and summary['p50_ms'] == 2.5 and summary['max_ms'] == 4.0
+    assert summary['qps'] == 400.0
+    assert latency_summary([10.0, 10.0], wall_seconds=0.01)['qps'] == 200.0
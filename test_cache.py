@@ -0,0 +1,86 @@
+"""
+LRUCache 测试：淘汰顺序、TTL 过期、命中/未命中/淘汰/过期计数
+
+运行: python -m pytest test_cache.py -q
+"""
+import time
+import pytest
+from cache import LRUCache
+
+
+class FakeClock:
+    """
+    替换 time.monotonic（LRUCache 的过期时间）
+    """
+
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr(time, 'monotonic', lambda: self.now)
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    return FakeClock(monkeypatch)
+
+
+def test_least_recently_used_entry_is_evicted_first():
+    cache = LRUCache(maxsize=3)
+    for key in 'abc':
+        cache.set(key, key.upper())
+    assert cache.get('a') == 'A'  # a 变为最近使用，b 成为最久未使用
+
+    cache.set('d', 'D')
+    assert cache.get('b') is None
+    assert [cache.get(key) for key in 'acd'] == ['A', 'C', 'D']
+
+    # 覆盖已有键不会淘汰其它条目，但会把它移到最近使用的位置
+    cache.set('a', 'A2')
+    cache.set('e', 'E')
+    assert len(cache) == 3
+    assert cache.get('c') is None
+    assert [cache.get(key) for key in 'ade'] == ['A2', 'D', 'E']
+    assert cache.stats()['evictions'] == 2
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = LRUCache(maxsize=10, ttl=10)
+    cache.set('k', '向量')
+    cache.set('short', '向量', ttl=2)
+    cache.set('forever', '向量', ttl=0)
+
+    clock.advance(5)
+    assert cache.get('short') is None
+    assert cache.get('k') == '向量'
+    clock.advance(6)
+    assert cache.get('k') is None
+    assert cache.get('forever') == '向量'
+    assert len(cache) == 1
+
+    stats = cache.stats()
+    assert (stats['expirations'], stats['evictions']) == (2, 0)
+
+
+def test_hit_and_miss_counters(clock):
+    cache = LRUCache(maxsize=2, ttl=10)
+    assert cache.get('k', 'default') == 'default'
+    cache.set('k', 1)
+    assert cache.get('k') == 1
+    assert cache.get('k') == 1
+    clock.advance(11)
+    assert cache.get('k') is None  # 过期同时计为未命中
+
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['expirations']) == (2, 2, 1)
+    assert stats['hit_rate'] == 0.5
+    assert (stats['size'], stats['maxsize'], stats['ttl']) == (0, 2, 10)
+
+
+def test_non_positive_maxsize_disables_cache():
+    cache = LRUCache(maxsize=0)
+    cache.set('k', 1)
+    assert cache.get('k') is None
+    assert len(cache) == 0
+    assert cache.stats()['hit_rate'] == 0.0
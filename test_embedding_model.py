@@ -0,0 +1,74 @@
+"""
+模型加载测试：后端选择与后台加载状态（桩 sentence_transformers，不需要真实模型）
+
+运行: python -m pytest test_embedding_model.py -q
+"""
+import sys
+import threading
+import types
+import pytest
+from embedding_model import ModelLoader, encoder_metadata, load_embedding_model, MODEL_NAME
+
+
+@pytest.fixture
+def fake_sentence_transformers(monkeypatch):
+    calls = []
+
+    def SentenceTransformer(path, **kwargs):
+        calls.append((path, kwargs))
+        return object()
+
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', types.SimpleNamespace(SentenceTransformer=SentenceTransformer))
+    monkeypatch.delenv('EMBEDDING_MODEL_PATH', raising=False)
+    monkeypatch.delenv('EMBEDDING_BACKEND', raising=False)
+    monkeypatch.delenv('EMBEDDING_ONNX_FILE', raising=False)
+    return calls
+
+
+def test_backend_and_path_from_environment(fake_sentence_transformers, monkeypatch):
+    load_embedding_model()
+    monkeypatch.setenv('EMBEDDING_MODEL_PATH', '/models/minilm')
+    monkeypatch.setenv('EMBEDDING_BACKEND', 'onnx')
+    monkeypatch.setenv('EMBEDDING_ONNX_FILE', 'onnx/model_qint8_avx2.onnx')
+    load_embedding_model()
+    assert fake_sentence_transformers == [
+        (MODEL_NAME, {}),
+        ('/models/minilm', {'backend': 'onnx', 'model_kwargs': {'file_name': 'onnx/model_qint8_avx2.onnx'}}),
+    ]
+    with pytest.raises(ValueError):
+        load_embedding_model(backend='tensorrt')
+
+
+def test_encoder_metadata_distinguishes_backends(fake_sentence_transformers, monkeypatch):
+    assert encoder_metadata() == {'backend': 'torch', 'path': MODEL_NAME, 'onnx_file': None, 'quantization': 'float32'}
+    assert encoder_metadata(backend='onnxruntime')['quantization'] == 'int8'
+    monkeypatch.setenv('EMBEDDING_BACKEND', 'onnx')
+    monkeypatch.setenv('EMBEDDING_ONNX_FILE', 'onnx/model_qint8_avx2.onnx')
+    assert encoder_metadata() == {'backend': 'onnx', 'path': MODEL_NAME,
+                                  'onnx_file': 'onnx/model_qint8_avx2.onnx', 'quantization': 'int8'}
+
+
+def test_loader_reports_loading_then_ready():
+    release = threading.Event()
+    model = object()
+
+    def load():
+        release.wait()
+        return model
+
+    loader = ModelLoader(load)
+    loader.start()
+    assert loader.state == 'loading' and not loader.wait(timeout=0.01)
+    release.set()
+    assert loader.wait(timeout=5)
+    assert loader.model is model and loader.stats()['state'] == 'ready'
+
+
+def test_loader_reports_failure():
+    def load():
+        raise OSError('模型目录不存在')
+
+    loader = ModelLoader(load)
+    loader.start()
+    assert not loader.wait(timeout=5)
+    assert loader.state == 'failed' and '模型目录不存在' in loader.error
@@ -0,0 +1,67 @@
+"""
+BatchEncoder 测试：并发请求合并为一次 model.encode，结果回到各自的调用方
+
+运行: python -m pytest test_encoder.py -q
+"""
+import asyncio
+import threading
+import numpy as np
+import pytest
+from encoder import BatchEncoder
+
+
+class CountingModel:
+    """
+    记录每次 encode 收到的批次；文本 'q7' 编码为 [7, 7]，便于核对结果归属
+    """
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self._lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        with self._lock:
+            self.batches.append(list(texts))
+        if self.fail:
+            raise RuntimeError('模型出错')
+        return np.array([[float(text[1:])] * 2 for text in texts], dtype=np.float32)
+
+
+def test_concurrent_calls_merge_into_one_model_call():
+    model = CountingModel()
+    encoder = BatchEncoder(model, max_batch_size=32, max_wait_ms=50)
+    texts = [f'q{i}' for i in range(8)]
+
+    async def run():
+        return await asyncio.gather(*(encoder.encode(text) for text in reversed(texts)))
+
+    results = asyncio.run(run())
+    assert len(model.batches) == 1
+    assert sorted(model.batches[0]) == sorted(texts)
+    assert [int(vector[0]) for vector in results] == list(reversed(range(8)))
+    assert encoder.stats()['batches'] == 1 and encoder.stats()['items'] == 8
+
+
+def test_batches_are_capped_and_duplicates_encoded_once():
+    model = CountingModel()
+    encoder = BatchEncoder(model, max_batch_size=4, max_wait_ms=50)
+    texts = [f'q{i % 6}' for i in range(12)]
+
+    results = asyncio.run(encoder.encode_many(texts))
+    assert [int(vector[0]) for vector in results] == [i % 6 for i in range(12)]
+    assert all(len(batch) <= 4 for batch in model.batches)
+    assert all(len(set(batch)) == len(batch) for batch in model.batches)
+    assert encoder.stats()['items'] == 12
+
+
+def test_model_error_reaches_every_caller():
+    encoder = BatchEncoder(CountingModel(fail=True), max_batch_size=32, max_wait_ms=50)
+
+    async def run():
+        return await asyncio.gather(*(encoder.encode(f'q{i}') for i in range(3)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        asyncio.run(encoder.encode('q9'))
@@ -0,0 +1,53 @@
+"""
+GameCatalog 测试：字符串索引（精确/包含/模糊）与名称向量检索
+
+运行: python -m pytest test_game_catalog.py -q
+"""
+import re
+import numpy as np
+from game_catalog import GameCatalog
+
+
+def normalize(name):
+    return re.sub(r'[《》<>「」『』\s]+', '', name or '').lower()
+
+
+def make_catalog(vectors=None):
+    titles = ['雷神之锤2', '合金装备', 'Elden Ring', '合金装备', None]
+    return GameCatalog(titles, vectors, key_func=normalize)
+
+
+def test_titles_are_deduplicated_in_order():
+    assert make_catalog().titles == ['雷神之锤2', '合金装备', 'Elden Ring']
+
+
+def test_string_index_resolves_without_vectors():
+    catalog = make_catalog()
+    assert catalog.lookup('《合金装备》') == ('合金装备', 1.0, 'exact')
+    assert catalog.lookup('elden ring') == ('Elden Ring', 1.0, 'exact')
+    assert catalog.lookup('合金装备1') == ('合金装备', 1.0, 'contains')
+    assert catalog.lookup('雷神之锤') == ('雷神之锤2', 1.0, 'contains')
+    fuzzy = catalog.lookup('Elden Rinh')
+    assert fuzzy.title == 'Elden Ring' and fuzzy.method == 'fuzzy' and fuzzy.score >= 0.6
+    assert catalog.lookup('原神') is None
+    assert catalog.lookup('') is None
+    assert catalog.nearest(np.ones(3)) is None
+
+
+def test_nearest_uses_one_similarity_over_catalog():
+    vectors = np.eye(3, dtype=np.float32)
+    catalog = make_catalog(vectors)
+    query = np.array([0.1, 0.8, 0.6], dtype=np.float32)
+    query /= np.linalg.norm(query)
+    match = catalog.nearest(query)
+    assert match.title == '合金装备' and match.method == 'embedding'
+    assert abs(match.score - float(query[1])) < 1e-6
+
+
+def test_vector_count_must_match_titles():
+    try:
+        make_catalog(np.eye(2, 3, dtype=np.float32))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('应当拒绝数量不一致的名称向量')
@@ -0,0 +1,53 @@
+"""
+GameNameExtractor 测试：黄金用例保证与原 extract_game_name 输出完全一致
+
+运行: python -m pytest test_game_extractor.py -q
+"""
+import os
+import json
+import random
+from game_extractor import GameNameExtractor, KeywordTrie, QUESTION_KEYWORDS
+from bench_game_extractor import legacy_extract_game_name
+
+GOLDEN_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'golden_game_names.json')
+
+
+def test_matches_golden_corpus():
+    with open(GOLDEN_FILE, 'r', encoding='utf-8') as f:
+        golden = json.load(f)
+    extractor = GameNameExtractor()
+    mismatches = [
+        (case['question'], case['expected'], extractor.extract(case['question']))
+        for case in golden
+        if extractor.extract(case['question']) != case['expected']
+    ]
+    assert len(golden) > 200
+    assert mismatches == []
+
+
+def test_matches_legacy_on_random_questions():
+    # 随机拼接关键词、噪音词、标点与游戏名，覆盖重叠关键词与子串边界
+    fragments = QUESTION_KEYWORDS + [
+        '雷神之锤2', '合金装备', 'Elden Ring', '关于', '请问', '求', '大神', '的', '第三关', '，', '。', '？', '!',
+        ' ', '《', '》', '「', '」', '<<', '>>', 'a', '怎', '么', '\n',
+    ]
+    rng = random.Random(0)
+    extractor = GameNameExtractor(cache_size=0)
+    for _ in range(3000):
+        question = ''.join(rng.choice(fragments) for _ in range(rng.randint(0, 8)))
+        assert extractor.extract(question) == legacy_extract_game_name(question), question
+
+
+def test_keyword_trie_reports_overlapping_matches():
+    trie = KeywordTrie(['怎么', '怎么玩', '么玩', 'boss'])
+    assert trie.find_all('怎么玩boss') == [(0, 0), (0, 1), (1, 2), (3, 3)]
+    assert trie.find_all('攻略') == []
+
+
+def test_results_are_cached():
+    extractor = GameNameExtractor()
+    assert extractor.extract('怎么玩') is None
+    assert extractor.extract('怎么玩') is None
+    assert extractor.extract('合金装备怎么打boss') == '合金装备'
+    assert extractor.extract('合金装备怎么打boss') == '合金装备'
+    assert extractor._cache.stats()['hits'] == 2
@@ -0,0 +1,162 @@
+"""
+GuideStore 测试：使用本地桩 Supabase 客户端，不需要网络
+
+运行: python -m pytest test_guide_store.py -q
+"""
+import asyncio
+from guide_store import GuideStore
+
+
+class StubResult:
+    def __init__(self, data):
+        self.data = data
+
+
+class StubQuery:
+    def __init__(self, client, table):
+        self.client = client
+        self.table = table
+        self.filters = {}
+        self.action = None
+        self.payload = None
+
+    def select(self, columns):
+        self.action = 'select'
+        return self
+
+    def eq(self, column, value):
+        self.filters[column] = value
+        return self
+
+    def limit(self, count):
+        return self
+
+    def upsert(self, data, on_conflict=''):
+        self.action = 'upsert'
+        self.payload = (data, on_conflict)
+        return self
+
+    def execute(self):
+        self.client.calls.append(self.action)
+        rows = self.client.tables.setdefault(self.table, {})
+        if self.action == 'select':
+            row = rows.get(self.filters.get('game_name'))
+            return StubResult([row] if row else [])
+        data, on_conflict = self.payload
+        assert on_conflict == 'game_name'
+        rows[data['game_name']] = dict(data)
+        return StubResult([data])
+
+
+class StubSupabase:
+    """
+    只实现 GuideStore 用到的 table().select().eq().limit().execute() 与 table().upsert().execute()
+    """
+
+    def __init__(self):
+        self.tables = {}
+        self.calls = []
+
+    def table(self, name):
+        return StubQuery(self, name)
+
+
+def make_store(client):
+    return GuideStore(client_provider=lambda: client, key_func=lambda name: name.strip().lower())
+
+
+def test_reads_through_to_supabase_and_caches_locally():
+    client = StubSupabase()
+    client.tables['game_guides'] = {'Elden Ring': {'game_name': 'Elden Ring', 'guide_content': '已保存的攻略'}}
+    store = make_store(client)
+
+    async def run():
+        first = await store.get('Elden Ring')
+        second = await store.get('elden ring ')
+        return first, second
+
+    assert asyncio.run(run()) == ('已保存的攻略', '已保存的攻略')
+    assert client.calls == ['select']
+    assert store.stats()['remote_hits'] == 1
+    assert store.stats()['local_hits'] == 1
+
+
+def test_concurrent_requests_generate_once_and_upsert_once():
+    client = StubSupabase()
+    store = make_store(client)
+    generations = []
+
+    async def create():
+        generations.append(1)
+        await asyncio.sleep(0.05)
+        return '新攻略', True
+
+    async def run():
+        return await asyncio.gather(*(store.get_or_create('Hades', '攻略', create) for _ in range(10)))
+
+    results = asyncio.run(run())
+    assert [content for content, _ in results] == ['新攻略'] * 10
+    assert sorted(origin for _, origin in results).count('generated') == 1
+    assert len(generations) == 1
+    assert client.calls.count('upsert') == 1
+    assert client.tables['game_guides']['Hades']['guide_content'] == '新攻略'
+
+    # 再次请求直接命中本地副本，不再访问 Supabase
+    content, origin = asyncio.run(store.get_or_create('Hades', '攻略', create))
+    assert (content, origin) == ('新攻略', 'cache')
+    assert len(generations) == 1
+
+
+def test_failed_generation_is_not_saved():
+    client = StubSupabase()
+    store = make_store(client)
+
+    async def create():
+        return '生成攻略时出错: timeout', False
+
+    content, origin = asyncio.run(store.get_or_create('Celeste', '攻略', create))
+    assert (content, origin) == ('生成攻略时出错: timeout', 'generated')
+    assert 'upsert' not in client.calls
+    assert asyncio.run(store.get('Celeste')) is None
+
+
+def test_generation_error_propagates_to_waiters():
+    store = make_store(StubSupabase())
+
+    async def create():
+        await asyncio.sleep(0.01)
+        raise RuntimeError('LLM 不可用')
+
+    async def run():
+        return await asyncio.gather(*(store.get_or_create('Inside', '攻略', create) for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert store.stats()['inflight'] == 0
+
+
+def test_remote_calls_are_timed():
+    client = StubSupabase()
+    timings = []
+    store = GuideStore(client_provider=lambda: client, on_remote_call=lambda op, seconds: timings.append((op, seconds)))
+
+    async def run():
+        await store.get('Hades')
+        await store.put('Hades', '新攻略', '怎么打')
+
+    asyncio.run(run())
+    assert [op for op, _ in timings] == ['read', 'write']
+    assert all(seconds >= 0 for _, seconds in timings)
+
+
+def test_remote_errors_are_logged_as_warnings(caplog):
+    class FailingSupabase(StubSupabase):
+        def table(self, name):
+            raise ConnectionError('网络不可用')
+
+    store = make_store(FailingSupabase())
+    caplog.set_level('DEBUG', logger='rag')
+    assert store.fetch_remote('Hades') is None
+    assert store.upsert_remote('Hades', '攻略', '怎么打') is False
+    assert [record.levelname for record in caplog.records] == ['WARNING', 'WARNING']
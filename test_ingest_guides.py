@@ -0,0 +1,125 @@
+"""
+流式导入测试：按 <<游戏名>> 切分、进程池分块、分批追加写入与断点续传（使用假编码函数）
+
+运行: python -m pytest test_ingest_guides.py -q
+"""
+import os
+import numpy as np
+from ingest_guides import ingest_guides as ingest, iter_sections, checkpoint_path
+from vector_store import load_vector_store
+from vectorize_guide import split_text_into_chunks
+
+FILES = {
+    'a.txt': "前言\n\n<<游戏甲>>\n\n甲的第一段内容\n\n甲的第二段内容\n\n甲的第三段内容\n",
+    'b.txt': "<<游戏乙>>\n\n乙的秘籍一\n\n乙的秘籍二\n\n乙的秘籍三\n\n乙的秘籍四\n",
+}
+
+
+def fake_encode(texts):
+    return np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(8) for text in texts])
+
+
+def make_guides(tmp_path):
+    directory = tmp_path / 'guides'
+    directory.mkdir()
+    for name, text in FILES.items():
+        (directory / name).write_text(text, encoding='utf-8')
+    return directory
+
+
+def expected_chunks(directory):
+    chunks = []
+    for name in sorted(FILES):
+        for _, text in iter_sections(str(directory / name)):
+            chunks.extend(split_text_into_chunks(text, chunk_size=10, overlap=0))
+    return chunks
+
+
+def test_iter_sections_splits_at_game_markers(tmp_path):
+    path = tmp_path / 'guide.txt'
+    path.write_text("前言\n结尾前<<游戏甲>>甲的内容\n\n<<游戏乙>>\n乙\n", encoding='utf-8')
+    assert list(iter_sections(str(path))) == [
+        (None, "前言\n结尾前"), ('游戏甲', "<<游戏甲>>甲的内容\n\n"), ('游戏乙', "<<游戏乙>>\n乙\n")
+    ]
+
+
+def test_ingest_directory_with_process_pool(tmp_path):
+    directory = make_guides(tmp_path)
+    output = str(tmp_path / 'vectors.npy')
+    ingest([str(directory)], output, chunk_size=10, overlap=0, batch_size=3, workers=2, encode=fake_encode)
+
+    chunks, embeddings, meta = load_vector_store(output)
+    assert chunks == expected_chunks(directory)
+    np.testing.assert_allclose(embeddings, fake_encode(chunks) / np.linalg.norm(fake_encode(chunks), axis=1, keepdims=True),
+                               rtol=1e-5)
+    assert meta['count'] == len(chunks) and meta['normalized']
+    assert not os.path.exists(checkpoint_path(output))
+
+
+def test_resume_after_interruption_encodes_only_remaining_chunks(tmp_path):
+    directory = make_guides(tmp_path)
+    output = str(tmp_path / 'vectors.npy')
+    calls = []
+
+    def failing_encode(texts):
+        if len(calls) == 2:
+            raise RuntimeError('模拟中断')
+        calls.append(list(texts))
+        return fake_encode(texts)
+
+    try:
+        ingest([str(directory)], output, chunk_size=10, overlap=0, batch_size=2, workers=1, encode=failing_encode)
+    except RuntimeError:
+        pass
+    else:
+        raise AssertionError('应当中断')
+    assert os.path.exists(checkpoint_path(output))
+    assert not os.path.exists(output)
+
+    resumed = []
+
+    def counting_encode(texts):
+        resumed.extend(texts)
+        return fake_encode(texts)
+
+    ingest([str(directory)], output, chunk_size=10, overlap=0, batch_size=2, workers=1,
+           encode=counting_encode, resume=True)
+    chunks, embeddings, _ = load_vector_store(output)
+    assert chunks == expected_chunks(directory)
+    # 检查点之前已完整写入的段不会重新编码
+    assert len(resumed) < len(chunks)
+    assert resumed == chunks[len(chunks) - len(resumed):]
+    np.testing.assert_allclose(np.linalg.norm(embeddings, axis=1), 1.0, rtol=1e-5)
+
+
+def test_resume_with_different_encoder_starts_over(tmp_path, monkeypatch):
+    directory = make_guides(tmp_path)
+    output = str(tmp_path / 'vectors.npy')
+    monkeypatch.delenv('EMBEDDING_MODEL_PATH', raising=False)
+    calls = []
+
+    def failing_encode(texts):
+        if len(calls) == 2:
+            raise RuntimeError('模拟中断')
+        calls.append(list(texts))
+        return fake_encode(texts)
+
+    try:
+        ingest([str(directory)], output, chunk_size=10, overlap=0, batch_size=2, workers=1, encode=failing_encode)
+    except RuntimeError:
+        pass
+    assert os.path.exists(checkpoint_path(output))
+
+    # 换了编码器：检查点之前写入的向量不能与新向量混用，从头开始
+    monkeypatch.setenv('EMBEDDING_MODEL_PATH', '/models/finetuned')
+    resumed = []
+
+    def counting_encode(texts):
+        resumed.extend(texts)
+        return fake_encode(texts)
+
+    ingest([str(directory)], output, chunk_size=10, overlap=0, batch_size=2, workers=1,
+           encode=counting_encode, resume=True)
+    chunks, _, meta = load_vector_store(output)
+    assert resumed == chunks == expected_chunks(directory)
+    assert meta['encoder']['path'] == '/models/finetuned'
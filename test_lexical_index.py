@@ -0,0 +1,52 @@
+"""
+BM25 索引测试：中日韩二元组分词、精确词语检索、范围限定与 RRF 融合
+
+运行: python -m pytest test_lexical_index.py -q
+"""
+import numpy as np
+from lexical_index import BM25Index, tokenize, reciprocal_rank_fusion
+
+CHUNKS = [
+    '<<雷神之锤2>>\n控制台指令：noclip =穿墙模式\ngive railgun = Railgun',
+    'give ammo =弹药全满\ngive armor =护甲全满',
+    '<<合金装备>>\n空格键 出拳攻击/使用物品',
+    '水坑会发出声音，引来敌人',
+    '击败守卫后门会自动打开，记得提前存档',
+]
+
+
+def test_tokenize_splits_words_and_cjk_bigrams():
+    assert tokenize('Give RAILGUN，无敌模式') == ['give', 'railgun', '无敌', '敌模', '模式']
+    assert tokenize('ｎｏｃｌｉｐ 门') == ['noclip', '门']
+    assert tokenize('？！ ') == []
+
+
+def test_exact_tokens_rank_first():
+    index = BM25Index(CHUNKS)
+    assert index.search('give railgun', 3)[0][0] == 0
+    assert index.search('noclip 怎么用', 3)[0].tolist() == [0]
+    assert index.search('give ammo', 3)[0][0] == 1
+    assert index.search('水坑怎么过', 3)[0].tolist() == [3]
+    indices, scores = index.search('完全无关', 3)
+    assert len(indices) == 0 and len(scores) == 0
+
+
+def test_rows_restrict_results():
+    index = BM25Index(CHUNKS)
+    assert index.search('give', 5, rows=slice(1, 3))[0].tolist() == [1]
+    assert index.search('give', 5, rows=np.array([0, 4]))[0].tolist() == [0]
+    assert index.search('give', 5, rows=slice(2, 5))[0].tolist() == []
+
+
+def test_frequent_terms_use_top_postings_only_for_full_search():
+    chunks = [f'boss 第{i}关' for i in range(50)] + ['boss boss 隐藏关']
+    index = BM25Index(chunks, max_term_postings=4)
+    assert len(index.top_postings[index.vocabulary['boss']]) == 4
+    assert index.search('boss', 1)[0].tolist() == [50]
+    # 限定范围时使用完整倒排表
+    assert index.search('boss', 10, rows=slice(10, 20))[0].shape[0] == 10
+
+
+def test_reciprocal_rank_fusion():
+    assert reciprocal_rank_fusion([[1, 2, 3], [3, 4]]) == [3, 1, 2, 4]
+    assert reciprocal_rank_fusion([[1, 2], []], limit=1) == [1]
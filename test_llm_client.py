@@ -0,0 +1,161 @@
+"""
+LLMClient 测试：对接本地桩服务的普通/流式回答、SSE 分段解析、两类调用分别限流、错误映射
+
+运行: python -m pytest test_llm_client.py -q
+"""
+import asyncio
+import json
+import httpx
+import pytest
+from llm_client import LLMClient
+
+pytest.importorskip('fastapi')
+from stub_llm_server import create_stub_app
+
+MESSAGES = [{"role": "user", "content": "塞尔达怎么打"}]
+
+
+def make_client(transport, **kwargs):
+    return LLMClient('test-key', api_base='http://llm.test/v1', transport=transport, **kwargs)
+
+
+def sse(*events):
+    return ''.join(f"{event}\n\n" for event in events).encode('utf-8')
+
+
+def delta(content=None, role=None):
+    body = {}
+    if role is not None:
+        body['role'] = role
+    if content is not None:
+        body['content'] = content
+    return "data: " + json.dumps({"choices": [{"index": 0, "delta": body}]}, ensure_ascii=False)
+
+
+async def collect(stream):
+    return [piece async for piece in stream]
+
+
+def test_chat_and_stream_against_stub_server():
+    client = make_client(httpx.ASGITransport(app=create_stub_app(fast_ms=1, slow_s=0.01)))
+
+    async def run():
+        try:
+            answer = await client.chat(MESSAGES)
+            guide = await client.chat(MESSAGES, max_tokens=2000, lane='generate')
+            pieces = await collect(client.stream_chat(MESSAGES))
+            return answer, guide, pieces
+        finally:
+            await client.aclose()
+
+    answer, guide, pieces = asyncio.run(run())
+    assert answer == '（桩服务）回答'
+    assert guide == '（桩服务）长篇攻略'
+    assert pieces == list('（桩服务）回答')
+
+
+def test_stream_parsing_skips_non_data_lines_and_stops_at_done():
+    body = sse(
+        ": keep-alive",
+        delta(role='assistant'),
+        delta('第一段'),
+        "event: ping",
+        delta(''),
+        delta('第二段'),
+        "data: [DONE]",
+        delta('不应出现'),
+    )
+    requests = []
+
+    def handler(request):
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=body, headers={'content-type': 'text/event-stream'})
+
+    client = make_client(httpx.MockTransport(handler))
+    pieces = asyncio.run(collect(client.stream_chat(MESSAGES, max_tokens=50)))
+    assert pieces == ['第一段', '第二段']
+    assert requests[0]['stream'] is True and requests[0]['max_tokens'] == 50
+
+
+def test_lanes_are_limited_separately():
+    in_flight = {'answer': 0, 'generate': 0}
+    peak = {'answer': 0, 'generate': 0}
+
+    async def handler(request):
+        lane = 'generate' if json.loads(request.content)['max_tokens'] >= 1000 else 'answer'
+        in_flight[lane] += 1
+        peak[lane] = max(peak[lane], in_flight[lane])
+        await asyncio.sleep(0.02)
+        in_flight[lane] -= 1
+        return httpx.Response(200, json={"choices": [{"message": {"content": f" {lane} "}}]})
+
+    client = make_client(httpx.MockTransport(handler), max_concurrency=2, max_generations=1)
+
+    async def run():
+        return await asyncio.gather(
+            *(client.chat(MESSAGES, max_tokens=2000, lane='generate') for _ in range(3)),
+            *(client.chat(MESSAGES) for _ in range(6)),
+        )
+
+    results = asyncio.run(run())
+    assert results == ['generate'] * 3 + ['answer'] * 6
+    assert peak == {'answer': 2, 'generate': 1}
+
+
+def test_stream_holds_its_slot_until_finished():
+    calls = []
+
+    def handler(request):
+        calls.append(json.loads(request.content).get('stream', False))
+        if calls[-1]:
+            return httpx.Response(200, content=sse(delta('甲'), delta('乙'), "data: [DONE]"))
+        return httpx.Response(200, json={"choices": [{"message": {"content": "回答"}}]})
+
+    client = make_client(httpx.MockTransport(handler), max_concurrency=1)
+
+    async def run():
+        stream = client.stream_chat(MESSAGES)
+        first = await stream.__anext__()
+        waiting = asyncio.create_task(client.chat(MESSAGES))
+        await asyncio.sleep(0.05)
+        blocked = not waiting.done() and calls == [True]
+        rest = await collect(stream)
+        return first, rest, blocked, await waiting
+
+    first, rest, blocked, answer = asyncio.run(run())
+    assert (first, rest) == ('甲', ['乙'])
+    assert blocked
+    assert answer == '回答' and calls == [True, False]
+
+
+def test_errors_are_raised_and_release_the_slot():
+    responses = [
+        httpx.Response(503, json={"error": "overloaded"}),
+        httpx.Response(200, json={"error": {"message": "bad request"}}),
+        httpx.Response(429, text='rate limited'),
+        httpx.Response(200, json={"choices": [{"message": {"content": "恢复"}}]}),
+    ]
+
+    client = make_client(httpx.MockTransport(lambda request: responses.pop(0)), max_concurrency=1)
+
+    async def run():
+        with pytest.raises(httpx.HTTPStatusError) as status_error:
+            await client.chat(MESSAGES)
+        assert status_error.value.response.status_code == 503
+        with pytest.raises(KeyError):
+            await client.chat(MESSAGES)
+        with pytest.raises(httpx.HTTPStatusError):
+            await collect(client.stream_chat(MESSAGES))
+        # 失败的调用不占用名额：并发上限为 1 时下一次调用仍能完成
+        return await asyncio.wait_for(client.chat(MESSAGES), timeout=1)
+
+    assert asyncio.run(run()) == '恢复'
+
+
+def test_transport_errors_surface_as_httpx_errors():
+    def handler(request):
+        raise httpx.ConnectError('connection refused', request=request)
+
+    client = make_client(httpx.MockTransport(handler))
+    with pytest.raises(httpx.HTTPError):
+        asyncio.run(client.chat(MESSAGES))
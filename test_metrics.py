@@ -0,0 +1,41 @@
+"""
+Prometheus 文本格式测试
+
+运行: python -m pytest test_metrics.py -q
+"""
+from metrics import MetricsRegistry
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('rag_stage_duration_seconds', 'Stage duration', ['stage'], buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.01, 0.05, 2.0):
+        histogram.observe(value, stage='embed')
+    histogram.observe(0.2, stage='retrieve')
+
+    lines = registry.render().splitlines()
+    assert lines[:2] == ['# HELP rag_stage_duration_seconds Stage duration',
+                         '# TYPE rag_stage_duration_seconds histogram']
+    assert 'rag_stage_duration_seconds_bucket{stage="embed",le="0.01"} 2' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="embed",le="0.1"} 3' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="embed",le="1"} 3' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="embed",le="+Inf"} 4' in lines
+    assert 'rag_stage_duration_seconds_count{stage="embed"} 4' in lines
+    assert 'rag_stage_duration_seconds_sum{stage="embed"} 2.065' in lines
+    assert 'rag_stage_duration_seconds_bucket{stage="retrieve",le="0.1"} 0' in lines
+    assert histogram.count(stage='embed') == 4
+
+
+def test_counter_and_label_escaping():
+    registry = MetricsRegistry()
+    counter = registry.counter('rag_requests_total', 'Handled requests', ['endpoint', 'source'])
+    counter.inc(endpoint='/ask', source='rag')
+    counter.inc(2, endpoint='/ask', source='rag')
+    counter.inc(endpoint='/ask', source='say "hi"\n')
+
+    text = registry.render()
+    assert '# TYPE rag_requests_total counter' in text
+    assert 'rag_requests_total{endpoint="/ask",source="rag"} 3' in text
+    assert 'rag_requests_total{endpoint="/ask",source="say \\"hi\\"\\n"} 1' in text
+    assert text.endswith('\n')
+    assert counter.value(endpoint='/ask', source='rag') == 3
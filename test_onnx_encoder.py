@@ -0,0 +1,116 @@
+"""
+ONNX 编码器测试：mean pooling 与 PyTorch 后端的一致性
+
+一致性测试需要 torch、sentence-transformers、onnxruntime、tokenizers 以及本地缓存中的模型，
+缺少任何一项时跳过。已导出的目录可通过 ONNX_MODEL_DIR 指定，否则导出到临时目录。
+
+运行: python -m pytest test_onnx_encoder.py -q
+"""
+import os
+import numpy as np
+import pytest
+from onnx_encoder import mean_pool, export_onnx, OnnxEncoder, FP32_FILE, INT8_FILE
+
+PARITY_TEXTS = [
+    '雷神之锤2 秘籍', '雷神之锤2 怎么无敌', 'give railgun 是什么', 'noclip 怎么用',
+    '合金装备 怎么对付闭路电视', '合金装备 水坑怎么过', '合金装备 boss 打法', '如何开始游戏？',
+    'How do I beat the final boss in Metal Gear?', '塞尔达传说 旷野之息 神庙位置',
+]
+
+
+def test_mean_pool_ignores_padding():
+    hidden = np.array([[[1.0, 2.0], [3.0, 4.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    assert np.allclose(mean_pool(hidden, mask), [[2.0, 3.0]])
+    # 全部为 padding 时不除以零
+    assert np.allclose(mean_pool(hidden, np.zeros((1, 3), dtype=np.int64)), 0.0)
+
+
+class StubEncoding:
+    def __init__(self, length: int, padded: int):
+        self.ids = list(range(1, length + 1)) + [0] * (padded - length)
+        self.attention_mask = [1] * length + [0] * (padded - length)
+        self.type_ids = [0] * padded
+
+
+class StubTokenizer:
+    """每个字符一个 token，按批内最长文本补齐"""
+
+    def encode_batch(self, texts):
+        padded = max(len(text) for text in texts)
+        return [StubEncoding(len(text), padded) for text in texts]
+
+
+class StubSession:
+    """token 向量为 [token id, 1]，mean pooling 后第一维等于 (长度 + 1) / 2"""
+
+    def run(self, outputs, feeds):
+        ids = feeds['input_ids'].astype(np.float32)
+        return [np.stack([ids, np.ones_like(ids)], axis=-1)]
+
+
+def test_batches_sorted_by_length_keep_input_order():
+    encoder = OnnxEncoder.__new__(OnnxEncoder)
+    encoder.input_names = ['input_ids', 'attention_mask']
+    encoder.dim = 2
+    encoder.normalize = False
+    encoder.tokenizer = StubTokenizer()
+    encoder.session = StubSession()
+    texts = ['a', 'abcde', 'abc', 'ab', 'abcdefg']
+    vectors = encoder.encode(texts, batch_size=2)
+    assert np.allclose(vectors[:, 0], [(len(text) + 1) / 2 for text in texts])
+    assert np.allclose(encoder.encode('abc'), [2.0, 1.0])
+
+
+@pytest.fixture(scope='module')
+def backends(tmp_path_factory):
+    pytest.importorskip('onnxruntime')
+    pytest.importorskip('tokenizers')
+    pytest.importorskip('torch')
+    sentence_transformers = pytest.importorskip('sentence_transformers')
+    model_dir = os.getenv('ONNX_MODEL_DIR')
+    try:
+        reference = sentence_transformers.SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2', device='cpu')
+        if not model_dir:
+            model_dir = export_onnx(str(tmp_path_factory.mktemp('onnx_model')))
+    except OSError as e:
+        pytest.skip(f"本地缓存中没有模型: {e}")
+    return reference, model_dir
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def guide_texts():
+    from vectorize_guide import split_text_into_chunks
+
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'guide.txt'), 'r', encoding='utf-8') as f:
+        return split_text_into_chunks(f.read())
+
+
+@pytest.mark.parametrize('file_name, min_cosine', [(FP32_FILE, 0.9999), (INT8_FILE, 0.98)])
+def test_onnx_matches_pytorch(backends, file_name, min_cosine):
+    reference, model_dir = backends
+    texts = PARITY_TEXTS + guide_texts()
+    expected = reference.encode(texts, batch_size=16)
+    actual = OnnxEncoder(model_dir, file_name=file_name).encode(texts, batch_size=16)
+    cosine = cosine_rows(expected, actual)
+    assert cosine.min() >= min_cosine
+    assert cosine.mean() >= (min_cosine + 1) / 2
+
+    # 检索结果一致：每个问题在攻略段落中的最近邻相同
+    chunks = slice(len(PARITY_TEXTS), None)
+    expected_top = np.argmax(expected[:len(PARITY_TEXTS)] @ expected[chunks].T, axis=1)
+    actual_top = np.argmax(actual[:len(PARITY_TEXTS)] @ actual[chunks].T, axis=1)
+    assert np.mean(expected_top == actual_top) >= 0.9
+
+
+def test_single_sentence_returns_vector(backends):
+    _, model_dir = backends
+    encoder = OnnxEncoder(model_dir)
+    vector = encoder.encode('雷神之锤2 秘籍')
+    assert vector.shape == (encoder.dim,)
+    assert np.allclose(vector, encoder.encode(['雷神之锤2 秘籍'])[0], atol=1e-5)
@@ -0,0 +1,74 @@
+"""
+低精度存储测试：int8 量化误差、分块打分、存储读写、float32 精确重排与批量检索
+
+运行: python -m pytest test_quantization.py -q
+"""
+import numpy as np
+from quantization import QuantizedMatrix, quantize_int8
+from retriever import ExactRetriever, IVFRetriever, RerankRetriever, create_retriever
+from vector_store import save_vector_store, load_vector_store, ensure_normalized, load_rerank_vectors, sidecar_path
+from bench_retriever import make_synthetic_corpus, make_queries
+
+
+def test_int8_round_trip_error_is_bounded_by_half_a_step():
+    matrix = make_synthetic_corpus(500, 64)
+    matrix[3] = 0.0
+    data, scales = quantize_int8(matrix)
+    restored = np.asarray(QuantizedMatrix(data, scales))
+    assert data.dtype == np.int8 and scales[3] == 0.0
+    assert np.all(np.abs(restored - matrix) <= scales[:, None] / 2 + 1e-7)
+
+
+def test_blocked_dot_matches_dequantized_matrix():
+    matrix = make_synthetic_corpus(1000, 32)
+    query = matrix[7]
+    for quantized in (QuantizedMatrix(matrix.astype(np.float16), block_rows=64),
+                      QuantizedMatrix(*quantize_int8(matrix), block_rows=64)):
+        expected = np.asarray(quantized) @ query
+        assert np.allclose(quantized.dot(query), expected, atol=1e-5)
+        # 切片与花式索引保持为低精度矩阵
+        assert np.allclose(quantized[100:200].dot(query), expected[100:200], atol=1e-5)
+        assert np.allclose(np.asarray(quantized[np.array([5, 1])]) @ query, expected[[5, 1]], atol=1e-5)
+
+
+def test_int8_store_with_rerank_recovers_exact_top_k(tmp_path):
+    embeddings = make_synthetic_corpus(3000, 48)
+    chunks = [f'chunk {i}' for i in range(len(embeddings))]
+    base = str(tmp_path / 'vectors')
+    save_vector_store(base, chunks, embeddings, dtype='int8', rerank_copy=True)
+
+    _, raw, meta = load_vector_store(base)
+    quantized = ensure_normalized(raw, meta)
+    assert isinstance(quantized, QuantizedMatrix) and quantized.dtype == np.int8
+    retriever = create_retriever(quantized, base, backend='exact', rerank_vectors=load_rerank_vectors(base, meta))
+    assert isinstance(retriever, RerankRetriever)
+
+    exact = ExactRetriever(embeddings)
+    rows = slice(1000, 2000)
+    for query in make_queries(embeddings, 20):
+        assert retriever.search(query, 5)[0].tolist() == exact.search(query, 5)[0].tolist()
+        assert retriever.search(query, 5, rows)[0].tolist() == exact.search(query, 5, rows)[0].tolist()
+
+    # 改为 float32 保存后，不再使用的附加文件被删除
+    save_vector_store(base, chunks, embeddings)
+    _, raw, meta = load_vector_store(base)
+    assert raw.dtype == np.float32 and load_rerank_vectors(base, meta) is None
+    assert not (tmp_path / 'vectors.scales.npy').exists() and sidecar_path(base, 'rerank').endswith('vectors.rerank.npy')
+
+
+def test_search_batch_matches_single_queries():
+    embeddings = make_synthetic_corpus(4000, 32)
+    queries = make_queries(embeddings, 12)
+    # 每个查询各自的检索范围：全部、连续的游戏段落、分散的游戏段落
+    rows_list = [None, slice(500, 1500), np.arange(0, 4000, 9)] * 4
+    retrievers = [
+        ExactRetriever(embeddings),
+        RerankRetriever(ExactRetriever(QuantizedMatrix(*quantize_int8(embeddings), block_rows=256)), embeddings),
+        IVFRetriever.build(embeddings, exact_threshold=1000),
+    ]
+    for retriever in retrievers:
+        batch = retriever.search_batch(queries, 5, rows_list)
+        for query, rows, (indices, scores) in zip(queries, rows_list, batch):
+            expected_indices, expected_scores = retriever.search(query, 5, rows)
+            assert indices.tolist() == expected_indices.tolist()
+            assert np.allclose(scores, expected_scores, atol=1e-5)
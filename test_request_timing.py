@@ -0,0 +1,46 @@
+"""
+StageTimer 测试：并行阶段的区间重叠，Server-Timing 头按开始顺序输出
+
+运行: python -m pytest test_request_timing.py -q
+"""
+import asyncio
+import pytest
+from request_timing import StageTimer
+
+
+def test_parallel_stages_overlap():
+    timer = StageTimer()
+
+    async def run():
+        return await asyncio.gather(
+            timer.track('embed', asyncio.sleep(0.05, result='vector')),
+            timer.track('game', asyncio.sleep(0.02, result='game')),
+        )
+
+    assert asyncio.run(run()) == ['vector', 'game']
+    spans = {span.name: span for span in timer.spans}
+    assert abs(spans['embed'].start_ms - spans['game'].start_ms) < 20
+    assert spans['embed'].duration_ms >= 45
+    # 两个阶段并行执行，总耗时接近较长的一个而不是两者之和
+    assert timer.elapsed_ms() < spans['embed'].duration_ms + spans['game'].duration_ms
+
+
+def test_header_orders_stages_and_appends_total():
+    timer = StageTimer()
+    with timer.stage('retrieve'):
+        pass
+    with timer.stage('llm'):
+        pass
+    header = timer.header()
+    names = [part.split(';')[0] for part in header.split(', ')]
+    assert names == ['retrieve', 'llm', 'total']
+    assert all(';dur=' in part for part in header.split(', '))
+    assert [stage['name'] for stage in timer.as_dict()['stages']] == ['retrieve', 'llm']
+
+
+def test_failed_stage_is_still_recorded():
+    timer = StageTimer()
+    with pytest.raises(ValueError):
+        with timer.stage('retrieve'):
+            raise ValueError('boom')
+    assert [span.name for span in timer.spans] == ['retrieve']
@@ -0,0 +1,67 @@
+"""
+检索后端测试：IVF 索引过期检测（存储重建 / 只改变修改时间的复制），精确检索在分散行上的打分范围
+
+运行: python -m pytest test_retriever.py -q
+"""
+import os
+import shutil
+import numpy as np
+from retriever import ExactRetriever, IVFRetriever, build_ann_index, create_retriever
+from vector_store import save_vector_store, load_vector_store, ensure_normalized, store_paths
+from bench_retriever import make_synthetic_corpus
+
+
+def load(base):
+    _, raw, meta = load_vector_store(str(base))
+    return ensure_normalized(raw, meta), meta['store_id']
+
+
+def test_ivf_sidecar_is_stale_after_store_rebuild(tmp_path, monkeypatch):
+    monkeypatch.setenv('RERANK_FACTOR', '0')
+    base = tmp_path / 'vectors'
+    chunks = [f'段落{i}' for i in range(200)]
+    save_vector_store(str(base), chunks, make_synthetic_corpus(200, 16, seed=1))
+    embeddings, store_id = load(base)
+    path = build_ann_index(str(base), embeddings, nlist=8, store_id=store_id)
+
+    assert IVFRetriever.load(path, embeddings, store_id=store_id) is not None
+    retriever = create_retriever(embeddings, str(base), backend='ivf', store_id=store_id)
+    assert np.array_equal(retriever.centroids, np.load(path)['centroids'])
+
+    # 相同行数与维度、不同内容的存储：旧索引必须视为过期
+    save_vector_store(str(base), chunks, make_synthetic_corpus(200, 16, seed=2))
+    embeddings, new_store_id = load(base)
+    assert new_store_id != store_id
+    assert IVFRetriever.load(path, embeddings, store_id=new_store_id) is None
+    assert IVFRetriever.load(path, embeddings) is not None
+
+
+def test_ivf_sidecar_survives_copy_with_new_mtime(tmp_path):
+    base = tmp_path / 'vectors'
+    save_vector_store(str(base), [f'段落{i}' for i in range(100)], make_synthetic_corpus(100, 16))
+    embeddings, store_id = load(base)
+    build_ann_index(str(base), embeddings, nlist=4, store_id=store_id)
+
+    # 例如部署时 cp / git checkout / 重建镜像：文件内容不变，修改时间变化
+    copy = tmp_path / 'deploy' / 'vectors'
+    copy.parent.mkdir()
+    for path in [*store_paths(str(base)), str(base) + '.ivf.npz']:
+        target = os.path.join(copy.parent, os.path.basename(path))
+        shutil.copyfile(path, target)
+        os.utime(target, ns=(0, 0))
+    copied_embeddings, copied_store_id = load(copy)
+    assert copied_store_id == store_id
+    assert IVFRetriever.load(str(copy) + '.ivf.npz', copied_embeddings, store_id=copied_store_id) is not None
+
+
+def test_exact_search_on_scattered_rows_matches_batch():
+    embeddings = make_synthetic_corpus(500, 16)
+    rows = np.arange(3, 500, 7, dtype=np.int64)
+    query = embeddings[10]
+    retriever = ExactRetriever(embeddings)
+    indices, scores = retriever.search(query, 5, rows)
+    batch_indices, batch_scores = retriever.search_batch(query[None, :], 5, [rows])[0]
+    np.testing.assert_array_equal(indices, batch_indices)
+    np.testing.assert_allclose(scores, batch_scores, rtol=1e-6)
+    expected = rows[np.argsort(-(embeddings[rows] @ query))[:5]]
+    np.testing.assert_array_equal(indices, expected)
@@ -0,0 +1,60 @@
+"""
+serve.preload 测试：fork 前父进程不调用 model.encode，游戏目录的名称向量在工作进程中按固定批大小补上
+
+运行: python -m pytest test_serve.py -q
+"""
+import asyncio
+import gc
+import numpy as np
+import pytest
+from vector_store import save_vector_store
+
+pytest.importorskip('dotenv')
+index = pytest.importorskip('index')
+import serve
+
+
+class CountingModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        self.calls.append(list(texts))
+        return np.ones((len(texts), 4), dtype=np.float32)
+
+
+def test_preload_does_not_encode_before_fork(tmp_path, monkeypatch):
+    base = tmp_path / 'vectors'
+    chunks = ['<<塞尔达传说>> 第一章', '神庙位置', '<<空洞骑士>> 开局']
+    save_vector_store(str(base), chunks, np.eye(3, 4, dtype=np.float32))
+    stub = CountingModel()
+    monkeypatch.setattr(index, 'model', None)
+    monkeypatch.setattr(index, 'snapshot', None)
+    monkeypatch.setattr(index, 'load_embedding_model', lambda: stub)
+
+    try:
+        serve.preload(str(base) + '.npy')
+    finally:
+        gc.unfreeze()
+
+    assert stub.calls == []
+    assert index.model is stub
+    assert not index.snapshot.game_catalog.has_vectors
+
+    # 工作进程启动时补上名称向量
+    asyncio.run(index.fill_game_catalog_vectors())
+    assert index.snapshot.game_catalog.has_vectors
+    assert sum(len(batch) for batch in stub.calls) == 2
+
+
+def test_game_catalog_is_encoded_in_fixed_size_batches(monkeypatch):
+    class BatchSizeModel(CountingModel):
+        def encode(self, texts, batch_size=32, **kwargs):
+            self.calls.append(batch_size)
+            return np.ones((len(texts), 4), dtype=np.float32)
+
+    stub = BatchSizeModel()
+    monkeypatch.setattr(index, 'model', stub)
+    catalog = index.build_game_catalog([f'游戏{i}' for i in range(100)])
+    assert catalog.has_vectors
+    assert stub.calls == [index.ENCODER_BATCH_SIZE]
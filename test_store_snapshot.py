@@ -0,0 +1,90 @@
+"""
+StoreWatcher 测试：元数据文件变化时触发热更新，加载失败时保留当前版本
+
+运行: python -m pytest test_store_snapshot.py -q
+"""
+import asyncio
+import numpy as np
+from store_snapshot import StoreWatcher, VectorSnapshot
+from vector_store import save_vector_store, load_vector_store
+
+
+def save(path, chunks):
+    save_vector_store(str(path), chunks, np.eye(len(chunks), 4, dtype=np.float32))
+
+
+def test_reload_triggered_only_when_store_changes(tmp_path):
+    base = tmp_path / 'vectors'
+    save(base, ['a', 'b'])
+    reloads = []
+
+    async def on_change():
+        reloads.append(1)
+
+    async def run():
+        watcher = StoreWatcher(str(base), on_change, interval=0.01)
+        unchanged = await watcher.check()
+        save(base, ['a', 'b', 'c'])
+        changed = await watcher.check()
+        again = await watcher.check()
+        return unchanged, changed, again, watcher.stats()
+
+    unchanged, changed, again, stats = asyncio.run(run())
+    assert (unchanged, changed, again) == (False, True, False)
+    assert reloads == [1]
+    assert stats['reloads'] == 1
+
+
+def test_failed_reload_is_not_retried_for_same_version(tmp_path):
+    base = tmp_path / 'vectors'
+    calls = []
+
+    async def on_change():
+        calls.append(1)
+        raise ValueError('存储损坏')
+
+    async def run():
+        # 启动时存储尚不存在，之后出现也会触发加载
+        watcher = StoreWatcher(str(base), on_change, interval=0.01)
+        assert await watcher.check() is False
+        save(base, ['a'])
+        first = await watcher.check()
+        second = await watcher.check()
+        return first, second, watcher.stats()
+
+    first, second, stats = asyncio.run(run())
+    assert (first, second) == (False, False)
+    assert calls == [1]
+    assert stats['errors'] == 1
+
+
+def test_background_task_polls_until_stopped(tmp_path):
+    base = tmp_path / 'vectors'
+    save(base, ['a'])
+
+    async def run():
+        done = asyncio.Event()
+
+        async def on_change():
+            done.set()
+
+        watcher = StoreWatcher(str(base), on_change, interval=0.01)
+        watcher.start()
+        save(base, ['a', 'b'])
+        await asyncio.wait_for(done.wait(), timeout=2)
+        await watcher.stop()
+        return watcher.stats()
+
+    stats = asyncio.run(run())
+    assert stats['reloads'] == 1 and stats['running'] is False
+
+
+def test_preloaded_snapshot_is_current_until_store_rebuilt(tmp_path):
+    base = tmp_path / 'vectors'
+    save(base, ['a', 'b'])
+    chunks, embeddings, meta = load_vector_store(str(base))
+    snap = VectorSnapshot(chunks, embeddings, [None, None], {}, None, None,
+                          str(base), meta['fingerprint'], 0.0)
+    assert snap.is_current()
+    save(base, ['a', 'b', 'c'])
+    assert not snap.is_current()
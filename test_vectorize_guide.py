@@ -0,0 +1,129 @@
+"""
+增量向量化测试：只对新增/修改的 chunk 重新编码（使用假模型，不需要下载模型）；分块与原实现输出一致
+
+运行: python -m pytest test_vectorize_guide.py -q
+"""
+import sys
+import types
+import random
+import numpy as np
+import vectorize_guide
+from vector_store import load_vector_store
+
+
+class FakeModel:
+    """
+    按文本内容生成确定性的向量，并记录每次被编码的文本
+    """
+    encoded = []
+
+    def __init__(self, name):
+        pass
+
+    def encode(self, texts, show_progress_bar=False):
+        FakeModel.encoded.extend(texts)
+        return np.stack([np.random.default_rng(sum(map(ord, text))).standard_normal(8) for text in texts])
+
+
+GUIDE = "<<游戏甲>>\n\n甲的第一段\n\n甲的第二段\n\n<<游戏乙>>\n\n乙的秘籍\n"
+
+
+def run(tmp_path, monkeypatch, text, dtype='float32'):
+    monkeypatch.setitem(sys.modules, 'sentence_transformers', types.SimpleNamespace(SentenceTransformer=FakeModel))
+    for name in ('EMBEDDING_BACKEND', 'EMBEDDING_ONNX_FILE'):
+        monkeypatch.delenv(name, raising=False)
+    guide = tmp_path / 'guide.txt'
+    guide.write_text(text, encoding='utf-8')
+    FakeModel.encoded = []
+    vectorize_guide.vectorize_guide(str(guide), str(tmp_path / 'vectors.npy'), chunk_size=12, overlap=0, dtype=dtype)
+    return FakeModel.encoded
+
+
+def test_only_changed_chunks_are_reencoded(tmp_path, monkeypatch):
+    first = run(tmp_path, monkeypatch, GUIDE)
+    chunks, embeddings, meta = load_vector_store(str(tmp_path / 'vectors.npy'))
+    assert first == chunks
+    assert set(meta['sections']) == {'游戏甲', '游戏乙'}
+
+    # 内容不变：不加载模型、不重写存储
+    assert run(tmp_path, monkeypatch, GUIDE) == []
+
+    # 只修改游戏乙的一个 chunk
+    second = run(tmp_path, monkeypatch, GUIDE.replace('乙的秘籍', '乙的新秘籍'))
+    assert second == ['乙的新秘籍']
+    new_chunks, new_embeddings, new_meta = load_vector_store(str(tmp_path / 'vectors.npy'))
+    assert new_chunks[:-1] == chunks[:-1]
+    np.testing.assert_allclose(new_embeddings[:-1], embeddings[:-1])
+    assert new_meta['sections']['游戏甲'] == meta['sections']['游戏甲']
+    assert new_meta['sections']['游戏乙'] != meta['sections']['游戏乙']
+
+
+def test_quantized_store_is_not_reused_for_float32(tmp_path, monkeypatch):
+    run(tmp_path, monkeypatch, GUIDE, dtype='int8')
+    # int8 存储没有 float32 副本：改为 float32 时所有 chunks 重新编码，不带入量化误差
+    encoded = run(tmp_path, monkeypatch, GUIDE.replace('乙的秘籍', '乙的新秘籍'), dtype='float32')
+    chunks, embeddings, meta = load_vector_store(str(tmp_path / 'vectors.npy'))
+    assert meta['dtype'] == 'float32'
+    assert encoded == chunks
+    expected = vectorize_guide.normalize_rows(FakeModel(None).encode(chunks))
+    np.testing.assert_allclose(embeddings, expected, rtol=1e-6)
+
+
+def test_encoder_change_forces_full_reencode(tmp_path, monkeypatch):
+    monkeypatch.delenv('EMBEDDING_MODEL_PATH', raising=False)
+    run(tmp_path, monkeypatch, GUIDE)
+    monkeypatch.setenv('EMBEDDING_MODEL_PATH', '/models/finetuned')
+    # 只改了一个 chunk，但编码器换了：旧向量不能与新向量混用
+    encoded = run(tmp_path, monkeypatch, GUIDE.replace('乙的秘籍', '乙的新秘籍'))
+    chunks, _, meta = load_vector_store(str(tmp_path / 'vectors.npy'))
+    assert encoded == chunks
+    assert meta['encoder']['path'] == '/models/finetuned'
+    # 同一编码器再次运行：内容未变，无需编码
+    assert run(tmp_path, monkeypatch, GUIDE.replace('乙的秘籍', '乙的新秘籍')) == []
+
+
+def test_reuse_embeddings_encodes_duplicates_once():
+    encoded = []
+
+    def encode(texts):
+        encoded.extend(texts)
+        return np.ones((len(texts), 4))
+
+    chunks = ['a', 'b', 'a']
+    hashes = [vectorize_guide.content_hash(chunk) for chunk in chunks]
+    matrix, count = vectorize_guide.reuse_embeddings(chunks, hashes, None, encode)
+    assert (encoded, count) == (['a', 'b'], 2)
+    assert matrix.shape == (3, 4)
+    np.testing.assert_allclose(np.linalg.norm(matrix, axis=1), 1.0, rtol=1e-6)
+
+
+def random_guide(rng, size):
+    # 随机拼接段落、句末标点、多余空白与连续空行，覆盖超长句子与只有标点的段落
+    words = ['秘籍', 'boss', '先拿钥匙', 'Use the railgun', '水坑', '存档点在左边', 'x' * 30, '第二阶段' * 20]
+    separators = ['。', '！', '？', '.', '! ', '?  ', '。\n', ' ', '\n', '\n\n', '\n\n\n', '  \n\n ', '\t']
+    return ''.join(rng.choice(words if rng.random() < 0.6 else separators) for _ in range(size))
+
+
+def test_chunker_matches_legacy_on_random_text():
+    from bench_chunker import legacy_split_text_into_chunks
+    rng = random.Random(0)
+    for _ in range(500):
+        text = random_guide(rng, rng.randint(0, 300))
+        chunk_size = rng.choice([10, 30, 80, 200])
+        overlap = rng.choice([0, 5, 50])
+        expected = legacy_split_text_into_chunks(text, chunk_size=chunk_size, overlap=overlap)
+        assert vectorize_guide.split_text_into_chunks(text, chunk_size=chunk_size, overlap=overlap) == expected
+
+
+def test_chunk_offsets_point_into_source():
+    rng = random.Random(1)
+    for _ in range(200):
+        text = random_guide(rng, 200)
+        previous_end = 0
+        for chunk in vectorize_guide.iter_chunks(text, chunk_size=40, overlap=0):
+            assert previous_end <= chunk.start < chunk.end <= len(text)
+            # 去掉句末标点与空白后，原文区间与 chunk 文本的首尾一致
+            assert text[chunk.start] == chunk.text[0] and text[chunk.end - 1] == chunk.text[-1]
+            if '\n\n' not in text[chunk.start:chunk.end] and ' ' not in chunk.text:
+                assert text[chunk.start:chunk.end] == chunk.text
+            previous_end = chunk.end
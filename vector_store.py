@@ -0,0 +1,402 @@
+"""
+向量存储：二进制格式的读写与旧版 JSON 转换
+
+存储格式（以 guide_vectors 为例）：
+- guide_vectors.npy        向量矩阵（float32 / float16 / int8），可直接内存映射
+- guide_vectors.meta.json  chunk 文本与元数据（版本、维度、数据类型等）
+- guide_vectors.scales.npy int8 存储每行的缩放系数（见 quantization.py）
+- guide_vectors.rerank.npy 可选：低精度存储附带的 float32 向量，只用于对候选精确重排
+
+加载时使用 np.load(mmap_mode='r')，不会解析或复制向量数据，
+多个 worker 进程可以共享同一份操作系统页缓存。
+"""
+import os
+import json
+import struct
+import hashlib
+import uuid
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+from quantization import QuantizedMatrix, quantize_int8
+
+STORE_VERSION = 1
+SUPPORTED_DTYPES = ('float32', 'float16', 'int8')
+APPEND_DTYPES = ('float32', 'float16')  # 流式追加写入支持的精度（int8 需要整行缩放系数，不支持）
+NPY_HEADER_SIZE = 128  # 追加写入时预留的 .npy 头长度（固定长度，完成后原地改写行数）
+
+
+def resolve_path(path: str) -> str:
+    """
+    相对路径按脚本所在目录解析
+    """
+    if os.path.isabs(path):
+        return path
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(script_dir, path)
+
+
+def store_paths(base_path: str) -> Tuple[str, str]:
+    """
+    根据存储路径（可带 .npy / .json 后缀）返回 (向量文件路径, 元数据文件路径)
+    """
+    root, ext = os.path.splitext(resolve_path(base_path))
+    if ext not in ('.npy', '.json'):
+        root = root + ext
+    return root + '.npy', root + '.meta.json'
+
+
+def sidecar_path(base_path: str, name: str) -> str:
+    """
+    返回与向量存储配套的附加文件路径，例如 guide_vectors.scales.npy
+    """
+    npy_path, _ = store_paths(base_path)
+    return os.path.splitext(npy_path)[0] + f'.{name}.npy'
+
+
+def file_fingerprint(*paths: str) -> str:
+    """
+    根据文件大小与修改时间生成指纹，存储重建后指纹随之变化（用于让缓存失效）
+    """
+    digest = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        digest.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def new_store_id() -> str:
+    """
+    每次写入存储时生成的随机标识，记录在元数据中
+    与 file_fingerprint 不同，复制、git checkout 或重建镜像改变修改时间后仍保持不变，
+    配套文件（例如 IVF 索引）以它判断是否属于当前存储
+    """
+    return uuid.uuid4().hex[:16]
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    对向量矩阵逐行做 L2 归一化，返回新的 float32 矩阵（零向量保持为零）
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return np.ascontiguousarray(matrix / norms, dtype=np.float32)
+
+
+def ensure_normalized(embeddings: np.ndarray, metadata: dict) -> np.ndarray:
+    """
+    返回可直接用于点积打分的 L2 归一化矩阵
+    已归一化的 float32 存储与低精度存储（QuantizedMatrix）原样返回（保持内存映射、不复制）；
+    否则在加载时归一化一次，得到 float32 矩阵
+    """
+    if metadata.get('normalized') and (embeddings.dtype == np.float32 or isinstance(embeddings, QuantizedMatrix)):
+        return embeddings
+    return normalize_rows(embeddings)
+
+
+def _atomic_write_json(path: str, data: dict):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _atomic_save_npy(path: str, array: np.ndarray):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+def save_vector_store(base_path: str, chunks: List[str], embeddings: np.ndarray,
+                      dtype: str = 'float32', metadata: Optional[dict] = None,
+                      normalize: bool = True, rerank_copy: bool = False) -> Tuple[str, str]:
+    """
+    保存向量矩阵与 chunk 文本/元数据
+    默认先做 L2 归一化再保存，加载后可直接用点积计算余弦相似度
+
+    Args:
+        base_path: 存储路径（例如 guide_vectors 或 guide_vectors.npy）
+        chunks: chunk 文本列表
+        embeddings: 形状为 (len(chunks), dim) 的向量矩阵
+        dtype: 存储精度，float32、float16 或 int8（逐行缩放）
+        metadata: 额外写入元数据文件的信息（例如模型名称）
+        normalize: 是否在保存前对向量做 L2 归一化
+        rerank_copy: 低精度存储时另存一份 float32 向量，供检索后对候选精确重排
+    返回: (向量文件路径, 元数据文件路径)
+    """
+    if dtype not in SUPPORTED_DTYPES:
+        raise ValueError(f"不支持的数据类型 {dtype}，可选: {', '.join(SUPPORTED_DTYPES)}")
+
+    if normalize:
+        embeddings = normalize_rows(embeddings)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(chunks):
+        raise ValueError(
+            f"向量矩阵形状 {embeddings.shape} 与 chunks 数量 {len(chunks)} 不一致"
+        )
+    sidecars = {}
+    if dtype == 'int8':
+        matrix, sidecars['scales'] = quantize_int8(embeddings)
+    else:
+        matrix = np.ascontiguousarray(embeddings, dtype=dtype)
+    if rerank_copy and dtype != 'float32':
+        sidecars['rerank'] = np.ascontiguousarray(embeddings)
+
+    npy_path, meta_path = store_paths(base_path)
+    meta = dict(metadata or {})
+    meta.update({
+        'version': STORE_VERSION,
+        'count': int(matrix.shape[0]),
+        'dim': int(matrix.shape[1]),
+        'dtype': dtype,
+        'normalized': bool(normalize),
+        'sidecars': sorted(sidecars),
+        'store_id': new_store_id(),
+        'chunks': list(chunks),
+    })
+
+    # 先写附加文件与向量，最后写元数据：元数据文件存在即表示存储完整
+    for name, array in sidecars.items():
+        _atomic_save_npy(sidecar_path(base_path, name), array)
+    _atomic_save_npy(npy_path, matrix)
+    _atomic_write_json(meta_path, meta)
+    # 删除旧存储遗留、本次不再使用的附加文件
+    for name in ('scales', 'rerank'):
+        if name not in sidecars and os.path.exists(sidecar_path(base_path, name)):
+            os.remove(sidecar_path(base_path, name))
+    return npy_path, meta_path
+
+
+def _npy_header(count: int, dim: int, dtype: str) -> bytes:
+    """
+    生成固定长度（NPY_HEADER_SIZE 字节）的 .npy 1.0 格式文件头
+    """
+    magic = b'\x93NUMPY\x01\x00'
+    header_len = NPY_HEADER_SIZE - len(magic) - 2
+    header = "{'descr': %r, 'fortran_order': False, 'shape': (%d, %d), }" % (np.dtype(dtype).str, count, dim)
+    if len(header) >= header_len:
+        raise ValueError(f"向量数量 {count} 过大，超出预留的文件头长度")
+    header = header.ljust(header_len - 1) + '\n'
+    return magic + struct.pack('<H', header_len) + header.encode('latin1')
+
+
+def write_meta_streaming(meta_path: str, meta: dict, chunks: Iterable[str]):
+    """
+    逐条写入 chunk 文本生成元数据文件（不需要把所有 chunk 同时放在内存中），写完后原子替换
+    """
+    tmp_path = meta_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps(meta, ensure_ascii=False)[:-1])
+        f.write(', "chunks": [' if meta else '"chunks": [')
+        for i, chunk in enumerate(chunks):
+            if i:
+                f.write(', ')
+            f.write(json.dumps(chunk, ensure_ascii=False))
+        f.write(']}')
+    os.replace(tmp_path, meta_path)
+
+
+class StoreAppender:
+    """
+    向量存储的追加写入器（用于流式导入）
+
+    向量写入 <存储>.npy.partial，chunk 文本逐行写入 <存储>.chunks.partial.jsonl；
+    finalize 时改写 .npy 文件头中的行数并原子替换正式存储，在此之前正式存储保持不变。
+    支持从检查点恢复：把两个临时文件截断到上次记录的行数/字节数后继续追加。
+
+    Args:
+        base_path: 存储路径（例如 guide_vectors 或 guide_vectors.npy）
+        dim: 向量维度
+        dtype: 存储精度，float32 或 float16
+        resume_rows: 从检查点恢复时已写入的行数，0 表示重新开始
+        resume_bytes: 从检查点恢复时 chunk 文本文件的字节数
+    """
+
+    def __init__(self, base_path: str, dim: int, dtype: str = 'float32',
+                 resume_rows: int = 0, resume_bytes: int = 0):
+        if dtype not in APPEND_DTYPES:
+            raise ValueError(f"流式写入不支持数据类型 {dtype}，可选: {', '.join(APPEND_DTYPES)}")
+        self.npy_path, self.meta_path = store_paths(base_path)
+        self.partial_path = self.npy_path + '.partial'
+        self.chunks_path = os.path.splitext(self.npy_path)[0] + '.chunks.partial.jsonl'
+        self.dim = dim
+        self.dtype = dtype
+        self.row_bytes = dim * np.dtype(dtype).itemsize
+        self.rows = resume_rows
+
+        if resume_rows or resume_bytes:
+            self._vectors = open(self.partial_path, 'r+b')
+            self._vectors.truncate(NPY_HEADER_SIZE + resume_rows * self.row_bytes)
+            self._vectors.seek(0, os.SEEK_END)
+            self._chunks = open(self.chunks_path, 'r+b')
+            self._chunks.truncate(resume_bytes)
+            self._chunks.seek(0, os.SEEK_END)
+        else:
+            self._vectors = open(self.partial_path, 'wb')
+            self._vectors.write(_npy_header(0, dim, dtype))
+            self._chunks = open(self.chunks_path, 'wb')
+        self.chunk_bytes = self._chunks.tell()
+
+    def append(self, chunks: List[str], vectors: np.ndarray) -> List[int]:
+        """
+        追加一批 chunk 与对应向量（应已归一化）
+        返回每一行写入后 chunk 文本文件的字节数（用于记录检查点）
+        """
+        matrix = np.ascontiguousarray(vectors, dtype=self.dtype)
+        if matrix.shape != (len(chunks), self.dim):
+            raise ValueError(f"向量矩阵形状 {matrix.shape} 与 chunks 数量 {len(chunks)} / 维度 {self.dim} 不一致")
+        self._vectors.write(matrix.tobytes())
+        offsets = []
+        for chunk in chunks:
+            line = (json.dumps(chunk, ensure_ascii=False) + '\n').encode('utf-8')
+            self._chunks.write(line)
+            self.chunk_bytes += len(line)
+            offsets.append(self.chunk_bytes)
+        self.rows += len(chunks)
+        return offsets
+
+    def flush(self):
+        """
+        把已追加的数据写到磁盘（记录检查点之前调用）
+        """
+        for f in (self._vectors, self._chunks):
+            f.flush()
+            os.fsync(f.fileno())
+
+    def iter_chunks(self):
+        with open(self.chunks_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield json.loads(line)
+
+    def finalize(self, metadata: Optional[dict] = None) -> Tuple[str, str]:
+        """
+        写入最终行数并原子替换正式存储（先向量后元数据），删除临时文件
+        """
+        self._vectors.seek(0)
+        self._vectors.write(_npy_header(self.rows, self.dim, self.dtype))
+        self.flush()
+        self._vectors.close()
+        self._chunks.close()
+        os.replace(self.partial_path, self.npy_path)
+
+        meta = dict(metadata or {})
+        meta.update({
+            'version': STORE_VERSION,
+            'count': self.rows,
+            'dim': self.dim,
+            'dtype': self.dtype,
+            'normalized': True,
+            'store_id': new_store_id(),
+        })
+        write_meta_streaming(self.meta_path, meta, self.iter_chunks())
+        os.remove(self.chunks_path)
+        return self.npy_path, self.meta_path
+
+    def close(self):
+        self._vectors.close()
+        self._chunks.close()
+
+
+def _load_json_store(json_path: str) -> Tuple[List[str], np.ndarray, dict]:
+    with open(json_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    chunks = data['chunks']
+    embeddings = np.asarray(data['embeddings'], dtype=np.float32)
+    meta = {
+        'version': 0,
+        'count': len(chunks),
+        'dim': int(embeddings.shape[1]) if embeddings.ndim == 2 else 0,
+        'dtype': 'float32',
+        'normalized': False,
+        'format': 'json',
+    }
+    return chunks, embeddings, meta
+
+
+def load_vector_store(base_path: str, mmap: bool = True) -> Tuple[List[str], np.ndarray, dict]:
+    """
+    加载向量存储
+
+    优先加载二进制存储（内存映射，不复制数据）；
+    若只存在旧版 JSON 文件（同名 .json），则回退为 JSON 解析。
+    float16 / int8 存储返回 QuantizedMatrix（打分时分块转换，不会整体转换为 float32）
+    返回: (chunks, embeddings, metadata)，metadata['fingerprint'] 标识本次加载的存储文件版本（大小与修改时间），
+    metadata['store_id'] 为写入时生成的存储标识（没有记录标识的旧存储取 fingerprint）
+    """
+    npy_path, meta_path = store_paths(base_path)
+
+    if os.path.exists(npy_path) and os.path.exists(meta_path):
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        chunks = meta.pop('chunks')
+        embeddings = np.load(npy_path, mmap_mode='r' if mmap else None)
+        if embeddings.shape[0] != len(chunks):
+            raise ValueError(
+                f"向量文件 {npy_path} 与元数据 {meta_path} 不一致："
+                f"{embeddings.shape[0]} 个向量 / {len(chunks)} 个 chunks"
+            )
+        if meta.get('dtype') == 'int8':
+            embeddings = QuantizedMatrix(embeddings, np.load(sidecar_path(base_path, 'scales'),
+                                                             mmap_mode='r' if mmap else None))
+        elif meta.get('dtype') == 'float16':
+            embeddings = QuantizedMatrix(embeddings)
+        meta['format'] = 'npy'
+        meta['fingerprint'] = file_fingerprint(npy_path, meta_path)
+        meta.setdefault('store_id', meta['fingerprint'])
+        return chunks, embeddings, meta
+
+    json_path = os.path.splitext(npy_path)[0] + '.json'
+    if os.path.exists(json_path):
+        print(f"⚠️  未找到二进制向量存储，回退为解析 JSON: {json_path}")
+        print(f"   建议运行: python vector_store.py {os.path.basename(json_path)}")
+        chunks, embeddings, meta = _load_json_store(json_path)
+        meta['fingerprint'] = meta['store_id'] = file_fingerprint(json_path)
+        return chunks, embeddings, meta
+
+    raise FileNotFoundError(
+        f"向量文件 {npy_path} 不存在。请先运行 vectorize_guide.py 生成向量。"
+    )
+
+
+def load_rerank_vectors(base_path: str, metadata: dict, mmap: bool = True) -> Optional[np.ndarray]:
+    """
+    加载低精度存储附带的 float32 向量（内存映射，只有被重排的候选行会被读入内存），没有时返回 None
+    """
+    if 'rerank' not in (metadata.get('sidecars') or ()):
+        return None
+    return np.load(sidecar_path(base_path, 'rerank'), mmap_mode='r' if mmap else None)
+
+
+def convert_json_store(json_path: str, base_path: Optional[str] = None,
+                       dtype: str = 'float32') -> Tuple[str, str]:
+    """
+    将旧版 guide_vectors.json 转换为二进制存储
+    """
+    json_path = resolve_path(json_path)
+    if not os.path.exists(json_path):
+        raise FileNotFoundError(f"文件 {json_path} 不存在")
+
+    chunks, embeddings, _ = _load_json_store(json_path)
+    target = base_path or os.path.splitext(json_path)[0]
+    return save_vector_store(target, chunks, embeddings, dtype=dtype,
+                             metadata={'source': os.path.basename(json_path)})
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='将 JSON 向量文件转换为二进制向量存储')
+    parser.add_argument('json_file', type=str, nargs='?', default='guide_vectors.json',
+                        help='旧版 JSON 向量文件 (默认: guide_vectors.json)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='输出存储路径，不含后缀 (默认: 与输入同名)')
+    parser.add_argument('--dtype', type=str, default='float32', choices=SUPPORTED_DTYPES,
+                        help='向量存储精度 (默认: float32)')
+
+    args = parser.parse_args()
+
+    npy_path, meta_path = convert_json_store(args.json_file, args.output, dtype=args.dtype)
+    print(f"✅ 已转换: {npy_path}")
+    print(f"   元数据: {meta_path}")
+    print(f"   向量文件大小: {os.path.getsize(npy_path) / 1024 / 1024:.2f} MB")
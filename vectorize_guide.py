@@ -1,84 +1,149 @@
 """
-将 guide.txt 文件向量化，生成 guide_vectors.json
+将 guide.txt 文件向量化，生成二进制向量存储 guide_vectors.npy + guide_vectors.meta.json
+
+增量模式（默认）：元数据中保存每个 chunk 与每个 <<游戏名>> 段的内容哈希，
+再次运行时只对新增或修改过的 chunk 重新编码，其余向量直接复用已有存储。
 """
 import os
 import json
 import re
-from sentence_transformers import SentenceTransformer
+import hashlib
+from functools import partial
+from itertools import accumulate
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
 import numpy as np
+from vector_store import (save_vector_store, store_paths, load_vector_store, ensure_normalized,
+                          normalize_rows, load_rerank_vectors, SUPPORTED_DTYPES)
+from retriever import build_ann_index
+from embedding_model import MODEL_NAME, embedding_backend, encoder_metadata, load_embedding_model
 
-def split_text_into_chunks(text: str, chunk_size: int = 200, overlap: int = 50) -> list:
+
+class Chunk(NamedTuple):
+    text: str
+    start: int   # chunk 自身内容在原文中的起始位置（不含从上一个 chunk 复制的重叠部分）
+    end: int     # chunk 自身内容在原文中的结束位置（不含）
+
+
+# 句末标点：长段落先把它们统一替换为 "。" 再按 "。" 拆分（str.replace / str.split 比正则拆分快得多）
+SENTENCE_ENDS = '！？.!?'
+
+
+def split_sentences(para: str) -> List[str]:
     """
-    将文本分割成 chunks
-    chunk_size: 每个 chunk 的字符数
-    overlap: chunks 之间的重叠字符数
+    按句末标点拆分段落，每个标点占一个字符，因此第 i 个片段的起点 = 前面片段长度之和 + i
+    片段去除首尾空白后与 re.split(r'[。！？.!?]\\s*', para) 的结果相同（空片段除外）
     """
-    chunks = []
-    
-    # 按段落分割（保留换行符）
-    paragraphs = text.split('\n\n')
-    
-    current_chunk = ""
-    for para in paragraphs:
-        para = para.strip()
+    for mark in SENTENCE_ENDS:
+        para = para.replace(mark, '。')
+    return para.split('。')
+
+
+def iter_chunks(text: str, chunk_size: int = 200, overlap: int = 50) -> Iterator[Chunk]:
+    """
+    一次扫描原文，逐个产出 chunk 及其在原文中的位置（规则见 _iter_chunk_tuples）
+    """
+    # tuple.__new__ 直接构造 Chunk，不经过 Python 层的 Chunk.__new__
+    return map(partial(tuple.__new__, Chunk), _iter_chunk_tuples(text, chunk_size, overlap))
+
+
+def _iter_chunk_tuples(text: str, chunk_size: int, overlap: int) -> Iterator[Tuple[str, int, int]]:
+    """
+    逐个产出 (chunk 文本, 起点, 终点)；不构造 Chunk，只需要文本的 split_text_into_chunks 直接使用
+
+    当前 chunk 只保存片段列表与累计长度，产出时一次 join 生成文本，不会反复拼接字符串；
+    长段落中句子的位置只在 chunk 的起点与终点处计算。
+    分块规则与原实现完全一致：
+    - 段落（以空行分隔，去除首尾空白）依次合并，合并后不超过 chunk_size 时用空行连接
+    - 超过 chunk_size 的长段落按句末标点拆成句子（标点不保留），句子用空格连接
+    - overlap > 0 时，每个 chunk 前加上上一个 chunk 的最后 overlap 个字符和一个空格
+    """
+    pieces: List[str] = []      # 当前 chunk 的片段（除第一个外都带有连接符）
+    length = 0                  # 当前 chunk 的长度
+    chunk_start = chunk_end = 0
+    previous: Optional[str] = None
+
+    position = 0
+    text_length = len(text)
+    find = text.find
+    while position <= text_length:
+        # 与 text.split('\n\n') 相同的切分，但不会一次生成所有段落
+        separator = find('\n\n', position)
+        if separator < 0:
+            separator = text_length
+        raw = text[position:separator]
+        para_start = position
+        position = separator + 2
+        para = raw.strip()
         if not para:
             continue
-        
-        # 如果当前 chunk 加上新段落不超过 chunk_size，则添加
-        if len(current_chunk) + len(para) + 2 <= chunk_size:
-            if current_chunk:
-                current_chunk += "\n\n" + para
-            else:
-                current_chunk = para
-        else:
-            # 如果当前 chunk 不为空，保存它
-            if current_chunk:
-                chunks.append(current_chunk)
-            
-            # 如果新段落本身就很长，需要进一步分割
-            if len(para) > chunk_size:
-                # 按句子分割长段落
-                sentences = re.split(r'[。！？.!?]\s*', para)
-                current_chunk = ""
-                for sentence in sentences:
-                    sentence = sentence.strip()
-                    if not sentence:
-                        continue
-                    
-                    if len(current_chunk) + len(sentence) + 1 <= chunk_size:
-                        if current_chunk:
-                            current_chunk += " " + sentence
-                        else:
-                            current_chunk = sentence
-                    else:
-                        if current_chunk:
-                            chunks.append(current_chunk)
-                        current_chunk = sentence
+        para_length = len(para)
+        if para_length != len(raw):
+            para_start += len(raw) - len(raw.lstrip())
+
+        if length + para_length + 2 <= chunk_size:
+            if pieces:
+                pieces.append("\n\n" + para)
+                length += para_length + 2
             else:
-                current_chunk = para
-    
-    # 添加最后一个 chunk
-    if current_chunk:
-        chunks.append(current_chunk)
-    
-    # 应用重叠策略：如果 chunks 之间有重叠，可以保留更多上下文
-    if overlap > 0 and len(chunks) > 1:
-        overlapped_chunks = [chunks[0]]
-        for i in range(1, len(chunks)):
-            prev_chunk = chunks[i-1]
-            current_chunk = chunks[i]
-            
-            # 取前一个 chunk 的最后 overlap 个字符
-            if len(prev_chunk) > overlap:
-                overlap_text = prev_chunk[-overlap:]
-                overlapped_chunk = overlap_text + " " + current_chunk
+                pieces.append(para)
+                length = para_length
+                chunk_start = para_start
+            chunk_end = para_start + para_length
+            continue
+
+        if pieces:
+            core = ''.join(pieces)
+            yield (previous[-overlap:] + " " + core if overlap > 0 and previous is not None and len(previous) > overlap
+                   else core), chunk_start, chunk_end
+            previous = core
+        if para_length <= chunk_size:
+            pieces = [para]
+            length = para_length
+            chunk_start, chunk_end = para_start, para_start + para_length
+            continue
+
+        # 长段落按句子拆分：part_starts[i] + i 是第 i 个片段在原文中的起点
+        parts = split_sentences(para)
+        part_starts = list(accumulate(map(len, parts), initial=para_start))
+        pieces = []
+        length = 0
+        last = -1               # 当前 chunk 最后一个句子的片段序号
+        for index, part in enumerate(parts):
+            sentence = part.strip()
+            if not sentence:
+                continue
+            sentence_length = len(sentence)
+            if pieces and length + sentence_length + 1 > chunk_size:
+                core = ''.join(pieces)
+                chunk_end = part_starts[last] + last + len(parts[last].rstrip())
+                yield (previous[-overlap:] + " " + core if overlap > 0 and previous is not None and len(previous) > overlap
+                       else core), chunk_start, chunk_end
+                previous = core
+                pieces = []
+            if pieces:
+                pieces.append(" " + sentence)
+                length += sentence_length + 1
             else:
-                overlapped_chunk = current_chunk
-            
-            overlapped_chunks.append(overlapped_chunk)
-        chunks = overlapped_chunks
-    
-    return chunks
+                pieces.append(sentence)
+                length = sentence_length
+                chunk_start = part_starts[index] + index + len(part) - len(part.lstrip())
+            last = index
+        if last >= 0:
+            chunk_end = part_starts[last] + last + len(parts[last].rstrip())
+
+    if pieces:
+        core = ''.join(pieces)
+        yield (previous[-overlap:] + " " + core if overlap > 0 and previous is not None and len(previous) > overlap
+               else core), chunk_start, chunk_end
+
+
+def split_text_into_chunks(text: str, chunk_size: int = 200, overlap: int = 50) -> list:
+    """
+    将文本分割成 chunks（规则见 iter_chunks）
+    chunk_size: 每个 chunk 的字符数
+    overlap: chunks 之间的重叠字符数
+    """
+    return [chunk_text for chunk_text, _, _ in _iter_chunk_tuples(text, chunk_size, overlap)]
 
 def load_guide_file(guide_file: str = 'guide.txt') -> str:
     """
@@ -95,16 +160,128 @@ def load_guide_file(guide_file: str = 'guide.txt') -> str:
     
     return content
 
-def vectorize_guide(guide_file: str = 'guide.txt', output_file: str = 'guide_vectors.json', 
-                    chunk_size: int = 200, overlap: int = 50):
+def content_hash(text: str) -> str:
+    """
+    chunk / 段落内容的哈希，用于判断内容是否变化
+    """
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """
+    按 <<游戏名>> 标记把攻略分成若干段，返回 [(游戏名, 段落文本)]
+    第一个标记之前的内容归入游戏名为空字符串的段
+    """
+    markers = list(re.finditer(r'<<([^>>]+)>>', text))
+    if not markers:
+        return [('', text)]
+    sections = []
+    if markers[0].start() > 0:
+        sections.append(('', text[:markers[0].start()]))
+    for i, marker in enumerate(markers):
+        end = markers[i + 1].start() if i + 1 < len(markers) else len(text)
+        sections.append((marker.group(1).strip(), text[marker.start():end]))
+    return sections
+
+def section_manifest(text: str) -> Dict[str, str]:
+    """
+    每个 <<游戏名>> 段的内容哈希（同名游戏出现多次时合并计算）
+    """
+    digests = {}
+    for game_name, section in split_sections(text):
+        digests.setdefault(game_name, hashlib.sha1()).update(section.encode('utf-8'))
+    return {game_name: digest.hexdigest() for game_name, digest in digests.items()}
+
+def load_previous_store(output_file: str, encoder: Optional[dict] = None) -> Optional[Tuple[List[str], Optional[np.ndarray], dict]]:
+    """
+    读取上一次生成的向量存储用于增量更新；不存在或由其他编码器生成时返回 None
+    encoder 为当前编码器的标识（见 embedding_model.encoder_metadata，默认按环境变量计算），
+    模型、后端、模型目录或量化方式任一不同都不能复用，否则同一存储中会混有两种编码器的向量
+    低精度存储附带 float32 向量时返回 float32 向量，复用时不损失精度；
+    没有 float32 副本时向量部分为 None：量化误差会被复用进新存储且永远不会消失，
+    此时只用元数据判断内容是否变化，所有 chunks 重新编码
+    """
+    try:
+        chunks, embeddings, meta = load_vector_store(output_file)
+    except (FileNotFoundError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            print(f"⚠️  已有向量存储无法复用，将全量重建: {e}")
+        return None
+    if meta.get('format') != 'npy' or meta.get('model') != MODEL_NAME:
+        return None
+    encoder = encoder or encoder_metadata()
+    if meta.get('encoder') != encoder:
+        print(f"⚠️  已有向量存储由其他编码器生成（{meta.get('encoder')} → {encoder}），将全量重新编码")
+        return None
+    rerank_vectors = load_rerank_vectors(output_file, meta)
+    if rerank_vectors is not None:
+        return chunks, rerank_vectors, meta
+    if meta.get('dtype', 'float32') != 'float32':
+        return chunks, None, meta
+    return chunks, embeddings, meta
+
+def reuse_embeddings(chunks: List[str], chunk_hashes: List[str],
+                     previous: Optional[Tuple[List[str], Optional[np.ndarray], dict]],
+                     encode: Callable[[List[str]], np.ndarray]) -> Tuple[np.ndarray, int]:
+    """
+    为 chunks 组装归一化向量矩阵：内容哈希在已有存储中出现过的 chunk 直接复用向量，
+    其余 chunk（去重后）调用 encode 编码；已有存储没有可复用的向量（见 load_previous_store）时全部编码
+    返回: (向量矩阵, 实际编码的 chunk 数)
+    """
+    previous_rows: Dict[str, int] = {}
+    if previous is not None and previous[1] is not None:
+        previous_chunks, _, previous_meta = previous
+        previous_hashes = previous_meta.get('chunk_hashes') or [content_hash(chunk) for chunk in previous_chunks]
+        for row, chunk_hash in enumerate(previous_hashes):
+            previous_rows.setdefault(chunk_hash, row)
+
+    reused = [(i, previous_rows[h]) for i, h in enumerate(chunk_hashes) if h in previous_rows]
+    pending: Dict[str, List[int]] = {}
+    for i, chunk_hash in enumerate(chunk_hashes):
+        if chunk_hash not in previous_rows:
+            pending.setdefault(chunk_hash, []).append(i)
+
+    encoded = None
+    if pending:
+        texts = [chunks[positions[0]] for positions in pending.values()]
+        encoded = normalize_rows(encode(texts))
+
+    if previous is not None and reused:
+        dim = previous[1].shape[1]
+    elif encoded is not None:
+        dim = encoded.shape[1]
+    else:
+        return np.zeros((0, 0), dtype=np.float32), 0
+
+    result = np.empty((len(chunks), dim), dtype=np.float32)
+    if reused:
+        positions, rows = zip(*reused)
+        # 花式索引会复制数据：写入新存储前不再依赖旧文件的内存映射
+        result[list(positions)] = np.asarray(ensure_normalized(previous[1][list(rows)], previous[2]))
+    if encoded is not None:
+        if encoded.shape[1] != dim:
+            raise ValueError(f"新编码向量维度 {encoded.shape[1]} 与已有存储维度 {dim} 不一致")
+        for vector, positions in zip(encoded, pending.values()):
+            result[positions] = vector
+    return result, len(pending)
+
+def vectorize_guide(guide_file: str = 'guide.txt', output_file: str = 'guide_vectors.npy', 
+                    chunk_size: int = 200, overlap: int = 50, output_format: str = 'npy',
+                    dtype: str = 'float32', ann: Optional[str] = None, nlist: Optional[int] = None,
+                    incremental: bool = True, rerank: bool = False):
     """
-    将 guide.txt 向量化并保存到 guide_vectors.json
+    将 guide.txt 向量化并保存为向量存储
     
     Args:
         guide_file: 输入的攻略文件路径
         output_file: 输出的向量文件路径
         chunk_size: 每个 chunk 的字符数
         overlap: chunks 之间的重叠字符数
+        output_format: npy（二进制，可内存映射）或 json（旧版格式）
+        dtype: 二进制存储的向量精度，float32、float16 或 int8（逐行缩放）
+        ann: 额外生成的近似检索索引类型（目前支持 ivf），None 表示不生成
+        nlist: IVF 聚类数，None 表示取 sqrt(chunks 数)
+        incremental: 复用已有存储中内容未变的 chunk 向量，只编码新增/修改的 chunk（仅 npy 格式）
+        rerank: 低精度存储时另存一份 float32 向量，检索时对候选精确重排
     """
     print("=" * 60)
     print("🚀 开始向量化攻略文件...")
@@ -117,7 +294,9 @@ def vectorize_guide(guide_file: str = 'guide.txt', output_file: str = 'guide_vec
     
     # 2. 分割成 chunks
     print(f"\n📝 正在将文本分割成 chunks (chunk_size={chunk_size}, overlap={overlap})...")
-    chunks = split_text_into_chunks(text, chunk_size=chunk_size, overlap=overlap)
+    spans = list(iter_chunks(text, chunk_size=chunk_size, overlap=overlap))
+    chunks = [span.text for span in spans]
+    chunk_offsets = [[span.start, span.end] for span in spans]
     print(f"✅ 已分割成 {len(chunks)} 个 chunks")
     
     # 显示前几个 chunks 的预览
@@ -125,30 +304,75 @@ def vectorize_guide(guide_file: str = 'guide.txt', output_file: str = 'guide_vec
     for i, chunk in enumerate(chunks[:3]):
         print(f"  [{i+1}] {chunk[:100]}..." if len(chunk) > 100 else f"  [{i+1}] {chunk}")
     
-    # 3. 加载模型
-    print(f"\n🤖 正在加载 sentence-transformers 模型...")
-    model = SentenceTransformer('paraphrase-multilingual-MiniLM-L12-v2')
-    print("✅ 模型加载完成")
+    # 3. 计算内容哈希，与已有存储比较
+    chunk_hashes = [content_hash(chunk) for chunk in chunks]
+    sections = section_manifest(text)
+    previous = load_previous_store(output_file) if incremental and output_format == 'npy' else None
+    if previous is not None:
+        previous_meta = previous[2]
+        if (previous_meta.get('chunk_hashes') == chunk_hashes and previous_meta.get('dtype') == dtype
+                and previous_meta.get('chunk_offsets') == chunk_offsets and ann is None
+                and ('rerank' in (previous_meta.get('sidecars') or ())) == (rerank and dtype != 'float32')):
+            print("\n✅ 攻略内容未变化，向量存储已是最新，无需重新生成")
+            return
+        previous_sections = previous_meta.get('sections') or {}
+        changed = [name or '(无游戏名)' for name, digest in sections.items() if previous_sections.get(name) != digest]
+        removed = [name or '(无游戏名)' for name in previous_sections if name not in sections]
+        print(f"\n🔍 增量更新：变化的段落 {changed or '无'}，删除的段落 {removed or '无'}")
+        if previous[1] is None:
+            print(f"⚠️  已有存储为 {previous_meta.get('dtype')} 且没有 float32 副本，复用会保留量化误差，将全部重新编码")
     
-    # 4. 生成向量
-    print(f"\n🔢 正在为 {len(chunks)} 个 chunks 生成向量...")
-    embeddings = model.encode(chunks, show_progress_bar=True)
-    print(f"✅ 向量生成完成，向量维度: {embeddings.shape}")
-    
-    # 5. 保存到 JSON 文件
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    output_path = os.path.join(script_dir, output_file)
+    # 4. 生成向量（只有需要编码时才加载模型）
+    model = None
     
-    print(f"\n💾 正在保存到 {output_path}...")
+    def encode(texts: List[str]) -> np.ndarray:
+        nonlocal model
+        if model is None:
+            print(f"\n🤖 正在加载 sentence-transformers 模型（后端: {embedding_backend()}）...")
+            model = load_embedding_model()
+            print("✅ 模型加载完成")
+        print(f"\n🔢 正在为 {len(texts)} 个 chunks 生成向量...")
+        return model.encode(texts, show_progress_bar=True)
     
-    # 将 numpy 数组转换为列表（JSON 可序列化）
-    data = {
-        'chunks': chunks,
-        'embeddings': embeddings.tolist()
-    }
+    if output_format == 'json':
+        embeddings = encode(chunks)
+    else:
+        embeddings, encoded_count = reuse_embeddings(chunks, chunk_hashes, previous, encode)
+        print(f"♻️  复用 {len(chunks) - encoded_count} 个已有向量，新编码 {encoded_count} 个 chunks")
+    print(f"✅ 向量生成完成，向量维度: {embeddings.shape}")
     
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # 5. 保存向量存储
+    if output_format == 'json':
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        output_path = os.path.join(script_dir, output_file)
+        
+        print(f"\n💾 正在保存到 {output_path}...")
+        
+        # 将 numpy 数组转换为列表（JSON 可序列化）
+        data = {
+            'chunks': chunks,
+            'embeddings': embeddings.tolist()
+        }
+        
+        with open(output_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    else:
+        output_path, meta_path = store_paths(output_file)
+        print(f"\n💾 正在保存到 {output_path} ({dtype})...")
+        save_vector_store(output_file, chunks, embeddings, dtype=dtype,
+                          metadata={'model': MODEL_NAME, 'encoder': encoder_metadata(),
+                                    'chunk_size': chunk_size, 'overlap': overlap,
+                                    'chunk_hashes': chunk_hashes, 'chunk_offsets': chunk_offsets,
+                                    'sections': sections},
+                          rerank_copy=rerank)
+        print(f"   元数据: {meta_path}")
+        
+        if ann == 'ivf':
+            print(f"\n🧭 正在训练 IVF 近似检索索引...")
+            _, stored_embeddings, meta = load_vector_store(output_file)
+            ann_path = build_ann_index(output_file, ensure_normalized(stored_embeddings, meta), nlist=nlist,
+                                       store_id=meta['store_id'])
+            print(f"   IVF 索引: {ann_path}")
     
     print(f"✅ 已保存到 {output_path}")
     print(f"\n📊 统计信息:")
@@ -165,8 +389,21 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='将 guide.txt 向量化')
     parser.add_argument('--guide', type=str, default='guide.txt', 
                        help='输入的攻略文件路径 (默认: guide.txt)')
-    parser.add_argument('--output', type=str, default='guide_vectors.json',
-                       help='输出的向量文件路径 (默认: guide_vectors.json)')
+    parser.add_argument('--output', type=str, default=None,
+                       help='输出的向量文件路径 (默认: guide_vectors.npy，json 格式为 guide_vectors.json)')
+    parser.add_argument('--format', type=str, default='npy', choices=['npy', 'json'],
+                       help='输出格式：npy 为可内存映射的二进制存储，json 为旧版格式 (默认: npy)')
+    parser.add_argument('--dtype', type=str, default='float32', choices=SUPPORTED_DTYPES,
+                       help='二进制存储的向量精度 (默认: float32)。float16 只省内存：NumPy 半精度转换较慢，'
+                            '打分约比 float32 慢 7 倍；int8 内存为 1/4 且打分不慢于 float32')
+    parser.add_argument('--rerank', action='store_true',
+                       help='float16 / int8 存储时另存 float32 向量，检索时对候选精确重排')
+    parser.add_argument('--ann', type=str, default=None, choices=['ivf'],
+                       help='同时生成近似检索索引 (RETRIEVER_BACKEND=ivf 时使用)')
+    parser.add_argument('--nlist', type=int, default=None,
+                       help='IVF 聚类数 (默认: sqrt(chunks 数))')
+    parser.add_argument('--full', action='store_true',
+                       help='忽略已有存储，全量重新编码所有 chunks')
     parser.add_argument('--chunk-size', type=int, default=200,
                        help='每个 chunk 的字符数 (默认: 200)')
     parser.add_argument('--overlap', type=int, default=50,
@@ -176,8 +413,14 @@ if __name__ == '__main__':
     
     vectorize_guide(
         guide_file=args.guide,
-        output_file=args.output,
+        output_file=args.output or ('guide_vectors.json' if args.format == 'json' else 'guide_vectors.npy'),
         chunk_size=args.chunk_size,
-        overlap=args.overlap
+        overlap=args.overlap,
+        output_format=args.format,
+        dtype=args.dtype,
+        ann=args.ann,
+        nlist=args.nlist,
+        incremental=not args.full,
+        rerank=args.rerank
     )
 